@@ -1,9 +1,14 @@
 import streamlit as st
 # --- IMPORTS UPDATED FOR STANDARD PROJECT STRUCTURE ---
 from src.config.config import GeminiConfig, AppConfig
+from src.models.history import HistoryManager
+from src.models.embeddings import LegalEmbedder
 from src.models.llm import GeminiClient
+from src.models.response_cache import ResponseCache
 from src.utils.file_processor import FileProcessor
-from src.utils.retrieval import VectorRetriever, DocumentProcessor
+from src.utils.ingest import IngestWorker
+from src.utils.context import context_gatherer
+from src.utils.retrieval import VectorRetriever
 from src.utils.websearch import WebSearcher
 from src.utils.tts import autoplay_audio
 from src.config.modes import CHAT_MODES
@@ -26,35 +31,82 @@ def init_session():
         "chats": {}, "active_chat": None, "uploaded_files": [],
         "file_processor": FileProcessor(), "model_initialized": False, "gemini_client": None,
         "retriever": VectorRetriever(), "rag_index_ready": False,
-        "web_searcher": WebSearcher()
+        "web_searcher": WebSearcher(), "history_manager": HistoryManager()
     }
     for key, value in default_state.items():
         if key not in st.session_state:
             st.session_state[key] = value
+    if "ingest_worker" not in st.session_state:
+        st.session_state.ingest_worker = IngestWorker(st.session_state.file_processor, st.session_state.retriever)
 
-def build_rag_index():
-    """Builds the RAG index from ALL uploaded documents."""
-    if st.session_state.uploaded_files:
-        with st.spinner("Analyzing and indexing documents..."):
-            try:
-                all_chunks = []
-                doc_processor = DocumentProcessor()
-                for file_info in st.session_state.uploaded_files:
-                    text = file_info['data'].get('text', '')
-                    if text:
-                        chunks = doc_processor.process(text, {"name": file_info['file'].name})
-                        all_chunks.extend(chunks)
-                
-                if all_chunks:
-                    st.session_state.retriever.build_index(all_chunks)
-                    st.session_state.rag_index_ready = True
-                else:
-                    st.session_state.rag_index_ready = False
-            except Exception as e:
-                st.error(f"Failed to build document index: {e}")
-                st.session_state.rag_index_ready = False
+@st.cache_resource
+def shared_response_cache() -> ResponseCache:
+    """
+    One response cache for the whole process, so every session reuses answers to
+    the same question about the same documents. Near-duplicates are matched with
+    the shared embedding model, which the retrievers have already loaded.
+    """
+    return ResponseCache(embedder=LegalEmbedder())
+
+def file_doc_id(file) -> str:
+    """Stable document ID for an uploaded file, shared by the upload list and the RAG index."""
+    return f"{file.name}-{file.size}"
+
+def queue_file(file) -> dict:
+    """
+    Hands an uploaded file to the session's background ingestion worker.
+
+    Returns the file's entry for `uploaded_files`; its "data" is filled in with the
+    extraction result once the worker finishes. The worker drops its reference to
+    the upload once extraction ends, but the bytes stay in memory while the file is
+    listed in the uploader: Streamlit keeps its UploadedFile, and the widget is not
+    reset because `remove_missing_files` tracks removals against its contents.
+    """
+    doc_id = file_doc_id(file)
+    entry = {"id": doc_id, "name": file.name, "data": {}}
+    if file.size > AppConfig.MAX_FILE_SIZE_MB * 1024 * 1024:
+        error = f"File exceeds the {AppConfig.MAX_FILE_SIZE_MB}MB limit."
+        st.error(f"Failed to process {file.name}: {error}")
+        entry["data"] = {"name": file.name, "status": "error", "error": error}
     else:
-        st.session_state.rag_index_ready = False
+        st.session_state.ingest_worker.submit(doc_id, file.name, file)
+    return entry
+
+def sync_ingestion():
+    """Collects finished ingestion results; RAG switches on as soon as any document is indexed."""
+    worker = st.session_state.ingest_worker
+    for file_info in st.session_state.uploaded_files:
+        job = worker.job(file_info['id'])
+        if job is not None and job.finished and not file_info["data"]:
+            file_info["data"] = job.result
+    st.session_state.rag_index_ready = any(job.status == "done" for job in worker.jobs)
+
+def show_ingestion_progress():
+    """Per-file ingestion status; reruns the app once the last queued file is done."""
+    sync_ingestion()
+    worker = st.session_state.ingest_worker
+    icons = {"queued": "⏳", "running": "🔄", "done": "✅", "error": "❌", "cancelled": "🚫"}
+    for file_info in st.session_state.uploaded_files:
+        job = worker.job(file_info['id'])
+        if job is None:
+            st.caption(f"❌ {file_info['name']}: {file_info['data'].get('error', 'not processed')}")
+        else:
+            st.caption(f"{icons[job.status]} {file_info['name']}: {job.describe()}")
+    if st.session_state.get("ingestion_polling") and not worker.busy:
+        st.session_state.ingestion_polling = False
+        st.rerun()
+
+def remove_missing_files(current_files) -> bool:
+    """Drops files the user removed from the uploader, without rebuilding the index."""
+    current_ids = {file_doc_id(f) for f in current_files}
+    removed = [f for f in st.session_state.uploaded_files if f['id'] not in current_ids]
+    for file_info in removed:
+        st.session_state.uploaded_files.remove(file_info)
+        st.session_state.ingest_worker.cancel(file_info['id'])
+        st.session_state.retriever.remove_document(file_info['id'])
+    if removed:
+        sync_ingestion()
+    return bool(removed)
 
 def handle_time_query(prompt: str) -> Optional[str]:
     """Checks for and handles time-related queries directly."""
@@ -65,6 +117,7 @@ def handle_time_query(prompt: str) -> Optional[str]:
 # --- Main Application Logic ---
 
 init_session()
+sync_ingestion()
 
 st.set_page_config(page_title="BusinAI", page_icon="💼", layout="wide")
 
@@ -78,22 +131,21 @@ with st.sidebar:
         accept_multiple_files=True, help=f"Max size: {AppConfig.MAX_FILE_SIZE_MB}MB"
     )
     
+    if remove_missing_files(uploaded_files or []):
+        st.rerun()
+
     if uploaded_files:
-        new_files_uploaded = False
-        existing_files = {f"{f['file'].name}-{f['file'].size}" for f in st.session_state.uploaded_files}
+        existing_files = {f['id'] for f in st.session_state.uploaded_files}
         for file in uploaded_files:
-            file_id = f"{file.name}-{file.size}"
-            if file_id not in existing_files:
-                st.session_state.uploaded_files.append({"file": file, "data": {}})
-                new_files_uploaded = True
-        
-        if new_files_uploaded:
-            with st.spinner("Processing files..."):
-                for file_info in st.session_state.uploaded_files:
-                    if not file_info["data"]:
-                        file_info["data"] = st.session_state.file_processor.process_uploaded_file(file_info["file"])
-            build_rag_index()
-            st.rerun()
+            if file_doc_id(file) not in existing_files:
+                st.session_state.uploaded_files.append(queue_file(file))
+
+    # Files are processed in the background; chat keeps working against what is already indexed.
+    if st.session_state.ingest_worker.busy:
+        st.session_state.ingestion_polling = True
+        st.experimental_fragment(run_every=1)(show_ingestion_progress)()
+    else:
+        show_ingestion_progress()
 
     st.subheader("Chat History")
     sorted_chats = sorted(st.session_state.chats.items(), key=lambda i: i[1].get('starred', False), reverse=True)
@@ -103,6 +155,17 @@ with st.sidebar:
             st.session_state.active_chat = chat_id
             st.rerun()
 
+    history_stats = st.session_state.history_manager.stats()
+    if history_stats["tokens_saved"]:
+        st.caption(f"History summaries saved ~{history_stats['tokens_saved']:,} tokens this session.")
+    if st.session_state.gemini_client is not None and st.session_state.gemini_client.response_cache is not None:
+        cache_stats = st.session_state.gemini_client.response_cache.stats()
+        if cache_stats["exact_hits"] or cache_stats["semantic_hits"]:
+            st.caption(
+                f"Response cache: {cache_stats['hit_rate']:.0%} hit rate, "
+                f"~{cache_stats['saved_seconds']:.1f}s of generation saved."
+            )
+
 # --- Main Chat Area UI ---
 col1, col2 = st.columns([0.8, 0.2])
 with col1:
@@ -117,7 +180,8 @@ with col2:
 if not st.session_state.get("model_initialized"):
     with st.spinner("Initializing AI model..."):
         try:
-            st.session_state.gemini_client = GeminiClient()
+            # Repeated questions are answered from the process-wide cache.
+            st.session_state.gemini_client = GeminiClient(response_cache=shared_response_cache())
             st.session_state.model_initialized = True
         except Exception as e:
             st.error(f"Fatal Error: Failed to initialize AI model: {e}")
@@ -136,6 +200,8 @@ else:
             st.rerun()
     with header_cols[2]:
         if st.button("🗑️ Delete Chat", use_container_width=True):
+            st.session_state.history_manager.forget(st.session_state.active_chat)
+            st.session_state.gemini_client.sessions.pop(st.session_state.active_chat)
             del st.session_state.chats[st.session_state.active_chat]
             st.session_state.active_chat = None
             st.rerun()
@@ -160,30 +226,41 @@ else:
         current_chat["messages"].append({"role": "user", "content": prompt})
         
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                response = handle_time_query(prompt)
-                if not response:
+            response = handle_time_query(prompt)
+            if response:
+                st.markdown(response)
+            else:
+                with st.spinner("Thinking..."):
                     # --- PASS NEW CONTEXT TO AI ---
                     context = {
-                        "response_mode_instruction": RESPONSE_MODES[response_mode]["instruction"]
+                        "response_mode_instruction": RESPONSE_MODES[response_mode]["instruction"],
+                        # Cached answers are only reused against the same indexed documents, so
+                        # sessions that uploaded the same files share them.
+                        "corpus_version": st.session_state.retriever.fingerprint(),
                     }
                     
-                    if st.session_state.rag_index_ready:
-                        retrieved_docs = st.session_state.retriever.retrieve(prompt)
-                        if retrieved_docs:
-                            context["retrieved_context"] = "\n\n".join([r[0] for r in retrieved_docs])
+                    # Document retrieval and web search run concurrently, each with its own timeout.
+                    gathered = context_gatherer.gather(
+                        prompt,
+                        retriever=st.session_state.retriever if st.session_state.rag_index_ready else None,
+                        web_searcher=st.session_state.web_searcher,
+                    )
+                    retrieved_context = context_gatherer.format_context(gathered)
+                    if retrieved_context:
+                        context["retrieved_context"] = retrieved_context
                     
-                    search_results = st.session_state.web_searcher.search(prompt)
-                    if search_results:
-                        web_context = "Based on a web search:\n" + "\n".join([f"- {res['snippet']}" for res in search_results])
-                        if "retrieved_context" in context:
-                            context["retrieved_context"] += "\n\n" + web_context
-                        else:
-                            context["retrieved_context"] = web_context
-                    
-                    history = [{"role": "model" if m["role"] == "assistant" else "user", "parts": [{"text": m["content"]}]} for m in current_chat["messages"][:-1]]
-                    response = st.session_state.gemini_client.generate(prompt=prompt, history=history, context=context)
-                
-                st.markdown(response)
-                current_chat["messages"].append({"role": "assistant", "content": response})
+                    # Recent turns go verbatim; older ones are folded into a rolling summary.
+                    turn_history = st.session_state.history_manager.build(
+                        st.session_state.active_chat, current_chat["messages"][:-1]
+                    )
+                    history = turn_history["history"]
+                    if turn_history["summary"]:
+                        context["conversation_summary"] = turn_history["summary"]
+                # The answer is rendered token by token as it streams in.
+                response = st.write_stream(
+                    st.session_state.gemini_client.generate_stream(
+                        prompt=prompt, history=history, context=context, chat_id=st.session_state.active_chat
+                    )
+                )
+            current_chat["messages"].append({"role": "assistant", "content": response})
         st.rerun()
\ No newline at end of file
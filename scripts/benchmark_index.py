@@ -0,0 +1,73 @@
+"""
+Recall-vs-latency benchmark for the FAISS backends built by `make_index`.
+
+Exact inner-product search (flat) is the ground truth; HNSW and IVF are swept
+over their search-time knobs. Vectors are synthetic, clustered and normalized
+like sentence embeddings, so no model download is needed.
+
+Usage: python scripts/benchmark_index.py --vectors 100000 --queries 500
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from src.utils.retrieval import make_index  # noqa: E402
+
+def synthetic_embeddings(n: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """Normalized vectors scattered around random topic centroids."""
+    centroids = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centroids[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def timed_search(index, queries: np.ndarray, k: int):
+    start = time.perf_counter()
+    _, ids = index.search(queries, k)
+    return ids, (time.perf_counter() - start) / len(queries) * 1000
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found.tolist(), truth.tolist()))
+    return hits / truth.size
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=384)  # all-MiniLM-L6-v2
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vectors = synthetic_embeddings(args.vectors + args.queries, args.dim, clusters=200, rng=rng)
+    corpus, queries = vectors[:args.vectors], vectors[args.vectors:]
+    ids = np.arange(len(corpus), dtype=np.int64)
+
+    print(f"{args.vectors} vectors, {args.queries} queries, dim={args.dim}, k={args.k}\n")
+    print(f"{'backend':<22}{'build s':>10}{'recall@k':>10}{'ms/query':>10}")
+
+    truth = None
+    for kind, knob, values in [("flat", None, [None]), ("hnsw", "efSearch", [16, 32, 64, 128, 256]), ("ivf", "nprobe", [1, 4, 16, 64])]:
+        start = time.perf_counter()
+        index = make_index(args.dim, kind, training_vectors=corpus)
+        index.add_with_ids(corpus, ids)
+        build_seconds = time.perf_counter() - start
+        base = faiss.downcast_index(index.index)
+
+        for value in values:
+            if knob == "efSearch":
+                base.hnsw.efSearch = value
+            elif knob == "nprobe":
+                base.nprobe = min(value, base.nlist)
+            found, ms = timed_search(index, queries, args.k)
+            if truth is None:
+                truth = found
+            label = kind if knob is None else f"{kind} {knob}={value}"
+            print(f"{label:<22}{build_seconds:>10.2f}{recall_at_k(found, truth):>10.3f}{ms:>10.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+# src/config/chat.py
+
+class ChatConfig:
+    """
+    Settings for assembling and answering a chat turn.
+    """
+    # Each context source gets its own budget (seconds); the answer is generated
+    # with whatever finished in time, and late fetches are left to finish in the background.
+    RETRIEVAL_TIMEOUT_S: float = 5.0
+    WEB_SEARCH_TIMEOUT_S: float = 4.0
+    # Threads shared by every session for context fetches. Retrieval and web search
+    # have separate pools, so hung web requests can never delay document retrieval.
+    RETRIEVAL_FETCH_WORKERS: int = 4
+    WEB_SEARCH_WORKERS: int = 4
+    # Web searches still running past their timeout; while this many are outstanding,
+    # new turns skip web search instead of queueing behind them.
+    MAX_PENDING_WEB_SEARCHES: int = 8
+
+    # Conversation history: the newest turns (a user message and its reply) are sent
+    # verbatim within a token budget; older ones are folded into a rolling summary.
+    HISTORY_MAX_TURNS: int = 6
+    HISTORY_TOKEN_BUDGET: int = 4000
+    SUMMARY_TOKEN_BUDGET: int = 500
+    # Rough characters per token for English text, used to estimate token counts locally.
+    CHARS_PER_TOKEN: float = 4.0
+
+    # Chat sessions kept between turns per client (one per chat, least recently used evicted).
+    SESSION_POOL_SIZE: int = 32
+
+    # Response cache: an exact tier keyed on everything that shapes an answer, and a
+    # semantic tier that reuses the answer to a near-identical standalone question
+    # asked against the same document corpus. Entries expire after the TTL (seconds).
+    RESPONSE_CACHE_SIZE: int = 256
+    RESPONSE_CACHE_TTL_S: float = 3600.0
+    SEMANTIC_CACHE_ENABLED: bool = True
+    # Minimum cosine similarity between query embeddings for a semantic hit.
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95
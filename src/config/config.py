@@ -48,7 +48,9 @@ class AppConfig:
     """
     Configuration for the Streamlit application settings.
     """
-    MAX_FILE_SIZE_MB: int = 20
+    # Uploads are read in place rather than copied, so memory per upload is roughly
+    # its size once; keep .streamlit/config.toml's server.maxUploadSize at least this.
+    MAX_FILE_SIZE_MB: int = 100
     ALLOWED_FILE_TYPES: List[str] = ["pdf", "docx", "txt", "pptx", "png", "jpg", "jpeg"]
 
 # --- Initialize all configurations on startup ---
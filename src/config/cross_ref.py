@@ -0,0 +1,34 @@
+# src/config/cross_ref.py
+
+class CrossRefConfig:
+    """
+    Settings for comparing documents pairwise with CrossReferencer.
+    """
+    # Pairs compared at once; the shared request scheduler still caps API concurrency.
+    MAX_WORKERS: int = 4
+    # A comparison still running this long (seconds) after it started is reported as
+    # timed out and its late result is discarded. Pairs still waiting for a worker
+    # once the run has taken PAIR_TIMEOUT_S per round of MAX_WORKERS pairs time out too.
+    PAIR_TIMEOUT_S: float = 90.0
+
+    # Pair pruning: with n documents, only about LLM_PAIRS_PER_DOCUMENT * n pairs get
+    # an LLM comparison; the rest are scored from their embeddings. Every document
+    # is first given its best-ranked partner, then the highest-ranked pairs fill the rest.
+    LLM_PAIRS_PER_DOCUMENT: float = 2.0
+    # Chunks embedded per document (evenly spaced through it) to build its vectors.
+    PRUNE_CHUNKS_PER_DOCUMENT: int = 32
+    # The query-conditioned vector of a document averages its chunks closest to the query.
+    PRUNE_FOCUS_CHUNKS: int = 4
+    # Pair ranking: this weight on the pair's relevance to the query, the rest on
+    # how similar the two documents are.
+    PRUNE_RELEVANCE_WEIGHT: float = 0.5
+
+    # Each document is represented in a comparison prompt by its passages most
+    # relevant to the query, taken from the retrieval index and packed best-first
+    # into this many (estimated) tokens. Unindexed documents send their opening text.
+    EXCERPT_TOKEN_BUDGET: int = 450
+    # Candidate passages retrieved per document.
+    EXCERPT_MAX_CHUNKS: int = 4
+    # A passage that only fits partially is cut to the remaining budget, unless
+    # fewer than this many tokens would remain.
+    EXCERPT_MIN_TOKENS: int = 40
@@ -0,0 +1,36 @@
+# src/config/ingest.py
+
+import os
+
+class IngestConfig:
+    """
+    Settings for extracting text from uploaded files.
+    """
+    # PDFs with at least this many pages are extracted in parallel across processes.
+    PDF_PARALLEL_MIN_PAGES: int = 16
+    # Extraction worker processes, shared by every session in the process; 1 disables
+    # parallel extraction.
+    PDF_MAX_WORKERS: int = min(4, os.cpu_count() or 1)
+    # Each worker extracts one contiguous page range of at least this many pages, so
+    # a PDF is parsed once per worker and small PDFs use fewer workers.
+    PDF_MIN_PAGES_PER_WORKER: int = 8
+
+    # Concurrent tesseract processes used for OCR.
+    OCR_MAX_WORKERS: int = os.cpu_count() or 1
+    OCR_LANGUAGE: str = "eng"
+    OCR_TESSERACT_CONFIG: str = ""
+    # Scans above this resolution are downscaled to it; tesseract is most accurate around 300 DPI.
+    OCR_TARGET_DPI: int = 300
+    # Images without DPI metadata are capped at this many pixels on their longest side.
+    OCR_MAX_SIDE: int = 4000
+    OCR_DESKEW: bool = True
+    OCR_MAX_SKEW_DEGREES: float = 5.0
+    # Pages taller than this (in pixels, after scaling) are OCR'd as separate strips in parallel.
+    OCR_TILE_HEIGHT: int = 1600
+
+    # Extracted text is cached by file content so repeat uploads skip parsing and OCR.
+    EXTRACTION_CACHE_DIR: str = ".cache/extraction"
+    EXTRACTION_CACHE_MAX_MB: int = 512
+
+    # Uploads that arrive as generic streams are spooled to disk (and memory-mapped) past this size.
+    SPOOL_MAX_MEMORY_MB: int = 16
@@ -0,0 +1,61 @@
+# src/config/retrieval.py
+
+class RetrievalConfig:
+    """
+    Settings for the FAISS vector index used by VectorRetriever.
+
+    Embeddings are L2-normalized, so every index uses the inner-product metric and
+    scores are cosine similarities in [-1, 1]. Tune these with
+    scripts/benchmark_index.py.
+    """
+    # "auto" picks a backend from the corpus size; "flat", "hnsw" or "ivf" forces one.
+    INDEX_KIND: str = "auto"
+
+    # Exact search is fast enough (and has perfect recall) below this many chunks.
+    FLAT_MAX_VECTORS: int = 20_000
+    # HNSW gives the best recall/latency up to here; IVF uses less memory beyond it.
+    HNSW_MAX_VECTORS: int = 500_000
+
+    HNSW_M: int = 32
+    HNSW_EF_CONSTRUCTION: int = 80
+    HNSW_EF_SEARCH: int = 64
+
+    # nlist is IVF_LISTS_PER_SQRT_N * sqrt(N), capped so every list gets enough training points.
+    IVF_LISTS_PER_SQRT_N: int = 4
+    IVF_MIN_POINTS_PER_LIST: int = 39
+    IVF_NPROBE: int = 16
+
+    # HNSW cannot delete vectors in place; removed chunks are skipped at query time
+    # and the index is rebuilt from cached embeddings once they exceed this fraction.
+    MAX_TOMBSTONE_FRACTION: float = 0.25
+
+    # Saved indexes live under INDEX_DIR/<corpus fingerprint>/; the oldest are pruned
+    # beyond MAX_SAVED_INDEXES. Set INDEX_DIR to None to disable persistence.
+    INDEX_DIR: str = ".cache/faiss"
+    MAX_SAVED_INDEXES: int = 20
+
+    # Query embeddings are cached process-wide, keyed by model and normalized query text.
+    QUERY_CACHE_SIZE: int = 1024
+    # Per-retriever results cache; entries are dropped whenever the index changes. 0 disables it.
+    RESULT_CACHE_SIZE: int = 256
+
+    # "hybrid" fuses BM25 and vector rankings with reciprocal rank fusion; "vector" is dense only.
+    SEARCH_MODE: str = "hybrid"
+    BM25_K1: float = 1.5
+    BM25_B: float = 0.75
+    RRF_K: int = 60
+    # Each ranking contributes this many times k candidates to the fusion.
+    HYBRID_CANDIDATE_MULTIPLIER: int = 4
+    # Queries whose content words are mostly exact citations ("Form 1099", "Section 123 ABC",
+    # "OSHA") are answered from the lexical index alone, skipping the embedding model.
+    LEXICAL_ONLY_CITATION_SHARE: float = 0.6
+    # A BM25 match is only returned (in hybrid mode and for citation queries) if it scores
+    # at least this fraction of an average-length chunk holding every query term the
+    # index knows once, so chunks sharing a single common word with the query are dropped.
+    BM25_MIN_SCORE_SHARE: float = 0.3
+
+    # Chunking: target chunk length and overlap between neighbouring chunks, in characters.
+    CHUNK_SIZE: int = 1000
+    CHUNK_OVERLAP: int = 200
+    # Streaming ingest embeds and indexes chunks in batches of this size as they are split.
+    INGEST_BATCH_SIZE: int = 64
@@ -0,0 +1,20 @@
+# src/config/scheduler.py
+
+class SchedulerConfig:
+    """
+    Settings for the scheduler that every Gemini request in the process goes through.
+
+    The limits should match the API key's quota; the defaults are the free tier of
+    gemini-1.5-flash.
+    """
+    REQUESTS_PER_MINUTE: int = 15
+    # Estimated prompt tokens (prompt, context and history) per minute.
+    TOKENS_PER_MINUTE: int = 1_000_000
+    # Requests in flight at once, across every session.
+    MAX_CONCURRENT_REQUESTS: int = 4
+
+    # Retries for rate-limit, overload and transient network errors, with
+    # exponential backoff (full jitter) between attempts.
+    MAX_RETRIES: int = 4
+    RETRY_BASE_DELAY_S: float = 1.0
+    RETRY_MAX_DELAY_S: float = 30.0
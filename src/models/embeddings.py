@@ -1,21 +1,226 @@
 from sentence_transformers import SentenceTransformer
-from typing import List, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from concurrent.futures import Future
+from contextlib import contextmanager
 import numpy as np
 import logging
 import os
 import hashlib
+import queue
+import threading
+import time
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+DEFAULT_MODEL_NAME = 'all-MiniLM-L6-v2'
+
+def _load_sentence_transformer(model_name: str):
+    """Loads a fast, general-purpose model suitable for web deployment."""
+    logging.info(f"Loading '{model_name}' model for deployment.")
+    return SentenceTransformer(model_name)
+
+def _rss_bytes() -> int:
+    """Returns the current resident set size of this process in bytes, or 0 where unknown."""
+    # /proc is Linux-only; elsewhere the RSS growth of a model load is reported as 0.
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0
+
+class _EncodeRequest:
+    """One queued `encode` call and the embeddings computed for it so far."""
+    def __init__(self, texts: List[str], batch_size: int, future: Future):
+        self.texts = texts
+        self.batch_size = batch_size
+        self.future = future
+        self.done = 0  # Texts encoded so far
+        self.parts: List[np.ndarray] = []
+
+class SharedModel:
+    """
+    A single loaded model plus the inference queue that all sessions share.
+
+    Concurrent `encode` calls are put on one queue and served by a single worker
+    thread. Each forward pass takes at most `max_batch_texts` texts, split fairly
+    across the waiting requests, so a large document is encoded slice by slice and
+    a short query queued behind it is served by the next pass instead of waiting
+    for the whole document.
+    """
+    def __init__(self, model_name: str, model: Any, load_seconds: float, rss_delta_bytes: int, max_batch_texts: int = 256):
+        self.model_name = model_name
+        self.model = model
+        self.load_seconds = load_seconds
+        self.rss_delta_bytes = rss_delta_bytes
+        self.max_batch_texts = max(1, max_batch_texts)
+        self.requests_served = 0
+        self.batches_run = 0
+        self.texts_encoded = 0
+        self._requests: "queue.Queue[_EncodeRequest]" = queue.Queue()
+        self._worker = threading.Thread(
+            target=self._run, name=f"embedder-{model_name}", daemon=True
+        )
+        self._worker.start()
+
+    @property
+    def param_bytes(self) -> int:
+        """Returns the size of the model weights in bytes, if the model exposes them."""
+        try:
+            return sum(p.numel() * p.element_size() for p in self.model.parameters())
+        except Exception:
+            return 0
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """Queues texts for encoding and blocks until their embeddings are ready."""
+        future: Future = Future()
+        self._requests.put(_EncodeRequest(list(texts), batch_size, future))
+        return future.result()
+
+    def _run(self) -> None:
+        active: List[_EncodeRequest] = []
+        while True:
+            if not active:
+                active.append(self._requests.get())
+            # Pick up whatever else is waiting, so it shares the next forward pass.
+            while True:
+                try:
+                    active.append(self._requests.get_nowait())
+                except queue.Empty:
+                    break
+
+            batch = self._next_batch(active)
+            texts = [text for request, start, stop in batch for text in request.texts[start:stop]]
+            try:
+                vectors = self._forward(texts, max(request.batch_size for request, _, _ in batch))
+                offset = 0
+                for request, start, stop in batch:
+                    request.parts.append(vectors[offset:offset + stop - start])
+                    request.done = stop
+                    offset += stop - start
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0][0].future.set_exception(e)
+                    active.remove(batch[0][0])
+                else:
+                    # One bad input must not fail every request it was batched with.
+                    logging.warning(f"Batched encode failed ({e}); retrying its requests one by one.")
+                    self._retry_separately(batch, active)
+
+            for request in [request for request in active if request.done == len(request.texts)]:
+                active.remove(request)
+                self.requests_served += 1
+                request.future.set_result(request.parts[0] if len(request.parts) == 1 else np.concatenate(request.parts))
+
+    def _next_batch(self, active: List[_EncodeRequest]) -> List[Tuple[_EncodeRequest, int, int]]:
+        """
+        Chooses the next forward pass as (request, start, stop) slices: every request
+        gets an equal share of `max_batch_texts`, and any share left unused by short
+        requests goes to the longer ones, oldest first.
+        """
+        budget = self.max_batch_texts
+        share = max(1, budget // len(active))
+        stops = []
+        for request in active:
+            take = min(len(request.texts) - request.done, share, budget)
+            stops.append(request.done + take)
+            budget -= take
+        for i, request in enumerate(active):
+            take = min(len(request.texts) - stops[i], budget)
+            stops[i] += take
+            budget -= take
+        return [
+            (request, request.done, stop) for request, stop in zip(active, stops)
+            if stop > request.done or not request.texts
+        ]
+
+    def _retry_separately(self, batch: List[Tuple[_EncodeRequest, int, int]], active: List[_EncodeRequest]) -> None:
+        """Re-encodes each request's slice on its own, failing only the requests that still fail."""
+        for request, start, stop in batch:
+            try:
+                request.parts.append(self._forward(request.texts[start:stop], request.batch_size))
+                request.done = stop
+            except Exception as e:
+                request.future.set_exception(e)
+                active.remove(request)
+
+    def _forward(self, texts: List[str], batch_size: int) -> np.ndarray:
+        vectors = self.model.encode(
+            texts,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True  # Normalize for cosine similarity
+        )
+        self.batches_run += 1
+        self.texts_encoded += len(texts)
+        return vectors
+
+class EmbedderRegistry:
+    """
+    Process-wide, thread-safe registry that loads each embedding model exactly once.
+
+    Every `LegalEmbedder` (and therefore every `VectorRetriever` and `EmbeddingCache`)
+    in the process resolves its model through this registry, so new Streamlit
+    sessions reuse the already-loaded weights instead of loading their own copy.
+    """
+    def __init__(self, loader: Callable[[str], Any] = _load_sentence_transformer):
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._models: Dict[str, SharedModel] = {}
+
+    def get(self, model_name: str = DEFAULT_MODEL_NAME) -> SharedModel:
+        """Returns the shared model for `model_name`, loading it on first use."""
+        shared = self._models.get(model_name)
+        if shared is not None:
+            return shared
+
+        with self._lock:
+            shared = self._models.get(model_name)
+            if shared is None:
+                rss_before = _rss_bytes()
+                start_time = time.perf_counter()
+                model = self._loader(model_name)
+                load_seconds = time.perf_counter() - start_time
+                shared = SharedModel(model_name, model, load_seconds, max(0, _rss_bytes() - rss_before))
+                self._models[model_name] = shared
+                logging.info(
+                    f"Loaded embedding model '{model_name}' in {load_seconds:.2f}s "
+                    f"(weights: {shared.param_bytes / 1e6:.1f} MB, "
+                    f"RSS growth: {shared.rss_delta_bytes / 1e6:.1f} MB)"
+                )
+        return shared
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Reports load time, memory and queue counters for every loaded model."""
+        return {
+            name: {
+                "load_seconds": shared.load_seconds,
+                "param_bytes": shared.param_bytes,
+                "rss_delta_bytes": shared.rss_delta_bytes,
+                "requests_served": shared.requests_served,
+                "batches_run": shared.batches_run,
+                "texts_encoded": shared.texts_encoded,
+            }
+            for name, shared in list(self._models.items())
+        }
+
+# Create global instance shared by every session in this process
+embedder_registry = EmbedderRegistry()
+
 class LegalEmbedder:
-    def __init__(self):
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, registry: Optional[EmbedderRegistry] = None):
+        self.model_name = model_name
+        self.registry = registry or embedder_registry
         self.model = self._load_model()
         
     def _load_model(self):
-        """Loads a fast, general-purpose model suitable for web deployment."""
-        # This model is small, fast, and works well for this environment.
-        model_name = 'all-MiniLM-L6-v2'
-        logging.info(f"Loading '{model_name}' model for deployment.")
-        return SentenceTransformer(model_name)
+        """Fetches the process-wide shared model instead of loading a private copy."""
+        self._shared = self.registry.get(self.model_name)
+        return self._shared.model
     
     def embed(
         self, 
@@ -34,13 +239,10 @@ class LegalEmbedder:
         """
         if isinstance(texts, str):
             texts = [texts]
+        if not texts:
+            return np.empty((0, self.dim), dtype=np.float32)
             
-        return self.model.encode(
-            texts, 
-            batch_size=batch_size,
-            convert_to_numpy=True,
-            normalize_embeddings=True  # Normalize for cosine similarity
-        )
+        return self._shared.encode(list(texts), batch_size=batch_size)
     
     @property
     def dim(self) -> int:
@@ -49,13 +251,38 @@ class LegalEmbedder:
 
 class EmbeddingCache:
     """
-    A persistent, file-based caching layer for text embeddings to avoid re-computation.
+    A persistent, content-addressed store for text embeddings to avoid re-computation.
+
+    All vectors for a model live in a single append-only float32 matrix file that is
+    memory-mapped for reads, next to an append-only log mapping SHA-256(text) to a row.
+    Instances pointing at the same directory can be used from many sessions (and
+    processes) at once.
     """
-    def __init__(self, embedder: LegalEmbedder, cache_dir: str = ".cache/embeddings"):
-        self.embedder = embedder
-        self.cache_dir = Path(cache_dir)
+    _path_locks: Dict[str, threading.Lock] = {}
+    _path_locks_guard = threading.Lock()
+
+    def __init__(self, embedder: Optional[LegalEmbedder] = None, cache_dir: str = ".cache/embeddings"):
+        self.embedder = embedder or LegalEmbedder()
+        self.cache_dir = Path(cache_dir) / self.embedder.model_name.replace("/", "_")
         self.cache_dir.mkdir(parents=True, exist_ok=True)
-    
+        self.dim = self.embedder.dim
+        self.vectors_path = self.cache_dir / "vectors.f32"
+        self.keys_path = self.cache_dir / "keys.log"
+        self.lock_path = self.cache_dir / ".lock"
+        self.rows: Dict[str, int] = {}  # {sha256 hex: row in the matrix file}
+        self.hits = 0
+        self.misses = 0
+        self._keys_offset = 0
+        self._matrix: Optional[np.memmap] = None
+
+        with self._path_locks_guard:
+            self._lock = self._path_locks.setdefault(str(self.cache_dir.resolve()), threading.Lock())
+
+    def __len__(self) -> int:
+        with self._locked():
+            self._refresh()
+            return len(self.rows)
+
     def get_embedding(self, text: str) -> np.ndarray:
         """
         Retrieves an embedding from the cache or generates and saves a new one.
@@ -66,26 +293,94 @@ class EmbeddingCache:
         Returns:
             The numpy array for the embedding.
         """
-        # Create a unique, stable filename from the hash of the text
-        text_hash = hashlib.sha256(text.encode()).hexdigest()
-        cache_file = self.cache_dir / f"{text_hash}.npy"
-        
-        # 1. Check cache: If the file exists, load the embedding from it.
-        if cache_file.exists():
+        return self.get_many([text])[0]
+
+    def get_many(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """
+        Retrieves embeddings for many texts, embedding all cache misses in one call.
+
+        Args:
+            texts: The texts to get embeddings for.
+            batch_size: The batch size used when encoding the misses.
+
+        Returns:
+            A (len(texts), dim) float32 array, in the same order as `texts`.
+        """
+        if not texts:
+            return np.empty((0, self.dim), dtype=np.float32)
+
+        hashes = [hashlib.sha256(text.encode()).hexdigest() for text in texts]
+        with self._locked():
+            self._refresh()
+            missing = {h: t for h, t in zip(hashes, texts) if h not in self.rows}
+
+        if missing:
+            # Embed outside the lock so other sessions can keep reading the store.
+            logging.info(f"Embedding cache MISS for {len(missing)} of {len(texts)} texts. Generating new embeddings.")
+            vectors = self.embedder.embed(list(missing.values()), batch_size=batch_size).astype(np.float32)
+
+        with self._locked():
+            self._refresh()
+            if missing:
+                missing_hashes = list(missing)
+                # Another session may have stored some of these while we were embedding.
+                new = [i for i, h in enumerate(missing_hashes) if h not in self.rows]
+                if new:
+                    self._append([missing_hashes[i] for i in new], vectors[new])
+            result = np.array(self._mapped()[[self.rows[h] for h in hashes]], dtype=np.float32)
+
+        self.misses += len(missing)
+        self.hits += len(texts) - len(missing)
+        return result
+
+    @contextmanager
+    def _locked(self):
+        """Serializes access across threads, and across processes where fcntl is available."""
+        with self._lock, open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
             try:
-                logging.info(f"Cache HIT for text hash: {text_hash[:10]}...")
-                return np.load(cache_file)
-            except Exception as e:
-                logging.warning(f"Could not load cached file {cache_file}. Regenerating. Error: {e}")
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
 
-        # 2. Cache miss: If the file doesn't exist, generate the embedding.
-        logging.info(f"Cache MISS for text hash: {text_hash[:10]}.... Generating new embedding.")
-        embedding = self.embedder.embed(text)
-        
-        # 3. Save the new embedding to the cache for future use.
-        try:
-            np.save(cache_file, embedding)
-        except Exception as e:
-            logging.error(f"Could not save cache file {cache_file}. Error: {e}")
-            
-        return embedding
\ No newline at end of file
+    def _refresh(self) -> None:
+        """Reads any key log entries appended since the last refresh (possibly by other processes)."""
+        if not self.keys_path.exists():
+            return
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            data = f.read()
+        # Only consume complete lines; a torn final line is picked up on a later refresh.
+        complete = data[:data.rfind(b"\n") + 1]
+        for line in complete.decode().splitlines():
+            text_hash, row = line.split()
+            self.rows[text_hash] = int(row)
+        self._keys_offset += len(complete)
+
+    def _append(self, hashes: List[str], vectors: np.ndarray) -> None:
+        """Appends vectors to the matrix file, then records their rows in the key log."""
+        row_bytes = self.dim * 4
+        with open(self.vectors_path, "ab") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size % row_bytes:
+                # Drop a partially written row left behind by an interrupted writer.
+                f.truncate(size - size % row_bytes)
+                size -= size % row_bytes
+            first_row = size // row_bytes
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+
+        lines = "".join(f"{h} {first_row + i}\n" for i, h in enumerate(hashes))
+        with open(self.keys_path, "a") as f:
+            f.write(lines)
+        self._refresh()
+
+    def _mapped(self) -> np.memmap:
+        """Returns a read-only memory map covering every row currently in the matrix file."""
+        rows = os.path.getsize(self.vectors_path) // (self.dim * 4) if self.vectors_path.exists() else 0
+        if self._matrix is None or self._matrix.shape[0] < rows:
+            if rows == 0:
+                return np.empty((0, self.dim), dtype=np.float32)
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+        return self._matrix
@@ -0,0 +1,121 @@
+import logging
+import math
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.config.chat import ChatConfig
+
+def estimate_tokens(text: str) -> int:
+    """Approximates a text's token count locally, without a tokenizer round trip."""
+    return math.ceil(len(text) / ChatConfig.CHARS_PER_TOKEN) if text else 0
+
+def _first_sentence(text: str, max_chars: int = 200) -> str:
+    text = re.sub(r"\s+", " ", text).strip()
+    match = re.match(r"(.+?[.!?])(\s|$)", text)
+    sentence = match.group(1) if match else text
+    return sentence if len(sentence) <= max_chars else sentence[:max_chars].rstrip() + "..."
+
+def summarize_turns(
+    previous_summary: Optional[str],
+    messages: List[Dict[str, str]],
+    max_tokens: int = ChatConfig.SUMMARY_TOKEN_BUDGET
+) -> str:
+    """
+    Extends a rolling summary with messages that just left the verbatim window.
+
+    Each message contributes one line (the question, or the first sentence of the
+    answer); the oldest lines are dropped once the summary exceeds `max_tokens`.
+    """
+    lines = previous_summary.split("\n") if previous_summary else []
+    for message in messages:
+        speaker = "User asked" if message["role"] == "user" else "Assistant answered"
+        lines.append(f"- {speaker}: {_first_sentence(message['content'])}")
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+class HistoryManager:
+    """
+    Builds the history sent with each chat turn within a token budget.
+
+    The newest turns are kept verbatim (at most `max_turns`, and only as many as
+    fit in `token_budget`); everything older is folded into a rolling summary.
+    Summaries are cached per chat and only extended when the verbatim window moves.
+    """
+    def __init__(
+        self,
+        max_turns: int = ChatConfig.HISTORY_MAX_TURNS,
+        token_budget: int = ChatConfig.HISTORY_TOKEN_BUDGET,
+        summarizer: Callable[[Optional[str], List[Dict[str, str]]], str] = summarize_turns
+    ):
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.summarizer = summarizer
+        self._summaries: Dict[str, Tuple[int, str]] = {}  # {chat_id: (messages summarized, summary)}
+        self.tokens_sent = 0
+        self.tokens_saved = 0
+
+    def build(self, chat_id: str, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """
+        Selects the history for the next turn of a chat.
+
+        Args:
+            chat_id: The chat's ID, under which its summary is cached.
+            messages: The chat's earlier messages ({"role", "content"}), oldest
+                first, without the prompt being answered.
+
+        Returns:
+            A dict with "history" (Gemini-format contents), "summary" (text or None),
+            and the estimated "tokens_sent" and "tokens_full" for this turn.
+        """
+        start = self._window_start(messages)
+        summary = self._summary(chat_id, messages, start)
+
+        history = [
+            {"role": "model" if m["role"] == "assistant" else "user", "parts": [{"text": m["content"]}]}
+            for m in messages[start:]
+        ]
+        tokens_full = sum(estimate_tokens(m["content"]) for m in messages)
+        tokens_sent = sum(estimate_tokens(m["content"]) for m in messages[start:]) + estimate_tokens(summary or "")
+        self.tokens_sent += tokens_sent
+        self.tokens_saved += max(0, tokens_full - tokens_sent)
+        if start:
+            logging.info(
+                f"History for '{chat_id}': {len(messages) - start} messages verbatim + summary of {start}, "
+                f"~{tokens_sent} of ~{tokens_full} tokens."
+            )
+        return {"history": history, "summary": summary, "tokens_sent": tokens_sent, "tokens_full": tokens_full}
+
+    def forget(self, chat_id: str) -> None:
+        """Drops a chat's cached summary, e.g. when the chat is deleted."""
+        self._summaries.pop(chat_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Cumulative estimated tokens sent as history, and saved by summarizing."""
+        return {"tokens_sent": self.tokens_sent, "tokens_saved": self.tokens_saved}
+
+    def _window_start(self, messages: List[Dict[str, str]]) -> int:
+        """Index of the first message kept verbatim."""
+        start, used = len(messages), 0
+        while start > 0 and len(messages) - start < 2 * self.max_turns:
+            cost = estimate_tokens(messages[start - 1]["content"])
+            if used + cost > self.token_budget:
+                break
+            used += cost
+            start -= 1
+        # The verbatim history has to open with a user message.
+        while start < len(messages) and messages[start]["role"] != "user":
+            start += 1
+        return start
+
+    def _summary(self, chat_id: str, messages: List[Dict[str, str]], start: int) -> Optional[str]:
+        if start == 0:
+            return None
+        summarized, summary = self._summaries.get(chat_id, (0, None))
+        if summarized > start:
+            # The window moved back (history edited or budget changed): start over.
+            summarized, summary = 0, None
+        if summarized < start:
+            summary = self.summarizer(summary, messages[summarized:start])
+            self._summaries[chat_id] = (start, summary)
+        return summary
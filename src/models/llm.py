@@ -1,13 +1,61 @@
 # --- IMPORT UPDATED FOR STANDARD PROJECT STRUCTURE ---
 from src.config.config import GeminiConfig
+from src.config.chat import ChatConfig
+from src.models.history import estimate_tokens
+from src.models.response_cache import CacheRequest, ResponseCache
+from src.utils.scheduler import INTERACTIVE, RequestScheduler, gemini_scheduler
+from src.utils.cache import LRUCache
 import google.generativeai as genai
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, Iterator, List, Tuple
+import hashlib
 import logging
+import time
 from datetime import datetime
 
+def _content_text(content: Any) -> Tuple[str, str]:
+    """The role and text of a history entry ({"role", "parts"} dict or SDK Content)."""
+    if isinstance(content, dict):
+        parts = content.get("parts", [])
+        return content.get("role", ""), "".join(p.get("text", "") if isinstance(p, dict) else str(p) for p in parts)
+    return content.role, "".join(part.text for part in content.parts)
+
+def _content_key(content: Any) -> str:
+    """Identifies a history entry by role and text."""
+    role, text = _content_text(content)
+    return hashlib.sha1(f"{role}\0{text}".encode()).hexdigest()
+
+class PooledSession:
+    """A chat session kept between turns, with the history entries it currently holds."""
+    def __init__(self, session: Any, signature: Tuple, keys: List[str]):
+        self.session = session
+        self.signature = signature
+        self.keys = keys
+
 class GeminiClient:
-    def __init__(self):
-        """Initialize the Gemini client with proper configuration"""
+    def __init__(
+        self,
+        model: Optional[Any] = None,
+        response_cache: Optional[ResponseCache] = None,
+        scheduler: Optional[RequestScheduler] = None
+    ):
+        """
+        Initialize the Gemini client with proper configuration.
+
+        Args:
+            model: A model exposing `start_chat(history=...)`, used instead of the
+                Gemini API (e.g. a local fake in tests).
+            response_cache: Answers repeated questions without calling the model.
+            scheduler: Rate-limits and retries requests; defaults to the scheduler
+                shared by every client in the process.
+        """
+        self.last_stream_metrics: Dict[str, float] = {}
+        self.response_cache = response_cache
+        self.scheduler = scheduler or gemini_scheduler
+        # Chat sessions are reused across turns, keyed by chat ID.
+        self.sessions = LRUCache(ChatConfig.SESSION_POOL_SIZE)
+        if model is not None:
+            self.model = model
+            return
         try:
             self.model = genai.GenerativeModel(
                 model_name=GeminiConfig.MODEL_NAME,
@@ -23,30 +71,208 @@ class GeminiClient:
         prompt: str,
         history: List[Dict[str, str]],
         context: Optional[Dict[str, Any]] = None,
+        chat_id: Optional[str] = None,
+        priority: int = INTERACTIVE,
     ) -> str:
-        """Generates a response using the provided history and context."""
+        """
+        Generates a response using the provided history and context.
+
+        With a `chat_id`, the chat's session is reused from the previous turn when it
+        already holds `history`, so only the new turn is added. Answers found in the
+        response cache are returned without calling the model. The request goes
+        through the scheduler at `priority`, which retries transient API errors.
+        """
         try:
             start_time = datetime.now()
             
-            generation_config = context.get("generation_config", GeminiConfig.GENERATION_CONFIG)
-            chat_session = self.model.start_chat(history=history)
-            full_prompt = self._build_full_prompt(prompt, context)
+            cache_request, cached_text = self._cached(prompt, history, context, chat_id, priority)
+            if cached_text is not None:
+                return cached_text
+
+            chat_session, full_prompt, generation_config = self._prepare(prompt, history, context, chat_id)
             
-            response = chat_session.send_message(
-                content=full_prompt,
-                generation_config=generation_config
+            response = self.scheduler.call(
+                lambda: chat_session.send_message(content=full_prompt, generation_config=generation_config),
+                priority=priority,
+                tokens=self._estimate_tokens(full_prompt, history),
             )
             
             duration = (datetime.now() - start_time).total_seconds()
             logging.info(f"Generated response in {duration:.2f}s")
             
+            self._commit_turn(chat_id, prompt, response.text)
+            if cache_request is not None:
+                self.response_cache.put(cache_request, response.text, duration)
             return response.text
             
         except Exception as e:
+            if chat_id is not None:
+                self.sessions.pop(chat_id)
             error_msg = f"Generation failed: {e}"
             logging.error(error_msg, exc_info=True)
             return f"⚠️ Error: {error_msg}"
 
+    def generate_stream(
+        self,
+        prompt: str,
+        history: List[Dict[str, str]],
+        context: Optional[Dict[str, Any]] = None,
+        chat_id: Optional[str] = None,
+        priority: int = INTERACTIVE,
+    ) -> Iterator[str]:
+        """
+        Generates a response like `generate`, yielding text deltas as they arrive.
+
+        Time to first token (including any wait for the rate limit) and total
+        generation time are logged, and kept in `last_stream_metrics` for the most
+        recent stream.
+        """
+        start_time = time.perf_counter()
+        first_token_s: Optional[float] = None
+        self.last_stream_metrics = {}
+        deltas: List[str] = []
+        completed = False
+        cached = False
+        try:
+            cache_request, cached_text = self._cached(prompt, history, context, chat_id, priority)
+            if cached_text is not None:
+                cached = completed = True
+                first_token_s = time.perf_counter() - start_time
+                yield cached_text
+                return
+
+            chat_session, full_prompt, generation_config = self._prepare(prompt, history, context, chat_id)
+            response = self.scheduler.stream(
+                lambda: chat_session.send_message(
+                    content=full_prompt, generation_config=generation_config, stream=True
+                ),
+                priority=priority,
+                tokens=self._estimate_tokens(full_prompt, history),
+            )
+            for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:  # A chunk without text parts, e.g. the final safety verdict
+                    continue
+                if not text:
+                    continue
+                if first_token_s is None:
+                    first_token_s = time.perf_counter() - start_time
+                    logging.info(f"Time to first token: {first_token_s:.2f}s")
+                deltas.append(text)
+                yield text
+            self._commit_turn(chat_id, prompt, "".join(deltas))
+            completed = True
+            if cache_request is not None:
+                self.response_cache.put(cache_request, "".join(deltas), time.perf_counter() - start_time)
+        except Exception as e:
+            error_msg = f"Generation failed: {e}"
+            logging.error(error_msg, exc_info=True)
+            yield f"⚠️ Error: {error_msg}"
+        finally:
+            if not completed and chat_id is not None:
+                # A failed or abandoned stream leaves the session's history uncertain.
+                self.sessions.pop(chat_id)
+            duration = time.perf_counter() - start_time
+            self.last_stream_metrics = {"time_to_first_token_s": first_token_s, "total_s": duration, "cached": cached}
+            logging.info(f"Streamed response in {duration:.2f}s")
+
+    def _prepare(
+        self,
+        prompt: str,
+        history: List[Dict[str, str]],
+        context: Optional[Dict[str, Any]],
+        chat_id: Optional[str] = None
+    ) -> Tuple[Any, str, Dict[str, Any]]:
+        """Gets a chat session holding the history and builds the prompt and generation config for a turn."""
+        context = context or {}
+        generation_config = context.get("generation_config", GeminiConfig.GENERATION_CONFIG)
+        chat_session = self._session(chat_id, history, context)
+        return chat_session, self._build_full_prompt(prompt, context), generation_config
+
+    def _session(self, chat_id: Optional[str], history: List[Dict[str, str]], context: Dict[str, Any]) -> Any:
+        """
+        Returns the chat's pooled session when it can serve `history`, else a new one.
+
+        A pooled session is reused as is when it holds exactly `history`, or after
+        dropping its oldest entries when `history` is its tail (the history window
+        moved forward). A persona or mode change starts a fresh session.
+        """
+        if chat_id is None:
+            return self.model.start_chat(history=history)
+
+        signature = (
+            context.get("persona_prompt"), context.get("mode_instruction"), context.get("response_mode_instruction")
+        )
+        keys = [_content_key(content) for content in history]
+        pooled = self.sessions.get(chat_id)
+        if pooled is not None and pooled.signature == signature:
+            dropped = len(pooled.keys) - len(keys)
+            if dropped >= 0 and pooled.keys[dropped:] == keys:
+                if dropped:
+                    pooled.session.history = pooled.session.history[dropped:]
+                    pooled.keys = keys
+                return pooled.session
+
+        pooled = PooledSession(self.model.start_chat(history=history), signature, keys)
+        self.sessions.put(chat_id, pooled)
+        return pooled.session
+
+    @staticmethod
+    def _estimate_tokens(full_prompt: str, history: List[Dict[str, str]]) -> int:
+        """Approximate input tokens of a request, charged against the scheduler's token quota."""
+        return estimate_tokens(full_prompt) + sum(estimate_tokens(_content_text(c)[1]) for c in history)
+
+    def _cached(
+        self,
+        prompt: str,
+        history: List[Dict[str, str]],
+        context: Optional[Dict[str, Any]],
+        chat_id: Optional[str],
+        priority: int = INTERACTIVE
+    ) -> Tuple[Optional[CacheRequest], Optional[str]]:
+        """
+        Looks a turn up in the response cache, returning its request (for storing
+        the answer later) and the cached answer, if any. A hit is recorded in the
+        chat's session as though the model had answered it. Only interactive chat
+        turns use the semantic tier: bulk and structured (e.g. JSON) requests are
+        matched exactly.
+        """
+        if self.response_cache is None:
+            return None, None
+        context = context or {}
+        generation_config = context.get("generation_config", GeminiConfig.GENERATION_CONFIG)
+        structured = generation_config.get("response_mime_type", "text/plain") != "text/plain"
+        semantic = priority == INTERACTIVE and not structured
+        request = self.response_cache.request(prompt, history, context, generation_config, semantic)
+        entry = self.response_cache.get(request)
+        if entry is None:
+            return request, None
+        if chat_id is not None:
+            self._session(chat_id, history, context)
+            self._commit_turn(chat_id, prompt, entry.text, sent=False)
+        return request, entry.text
+
+    def _commit_turn(self, chat_id: Optional[str], prompt: str, reply: str, sent: bool = True) -> None:
+        """
+        Records a completed turn in the chat's pooled session.
+
+        When the turn was `sent`, the session saw the full prompt, with its
+        instructions and retrieved context; that entry is replaced with the bare
+        user prompt, so the session mirrors the chat's messages and context is not
+        re-sent on later turns. Otherwise (a cached answer) the turn is appended.
+        """
+        pooled = self.sessions.get(chat_id) if chat_id is not None else None
+        if pooled is None:
+            return
+        user_turn = {"role": "user", "parts": [{"text": prompt}]}
+        model_turn = {"role": "model", "parts": [{"text": reply}]}
+        history = list(pooled.session.history)
+        if sent:
+            history, model_turn = history[:-2], history[-1]
+        pooled.session.history = history + [user_turn, model_turn]
+        pooled.keys = pooled.keys + [_content_key(user_turn), _content_key(model_turn)]
+
     def _build_full_prompt(
         self, 
         prompt: str, 
@@ -67,6 +293,9 @@ class GeminiClient:
         if response_mode_instruction := context.get("response_mode_instruction"):
             prompt_parts.append(f"Your response style: {response_mode_instruction}")
 
+        if conversation_summary := context.get("conversation_summary"):
+            prompt_parts.append(f"Summary of the earlier conversation:\n{conversation_summary}")
+
         if retrieved_context := context.get("retrieved_context"):
             prompt_parts.append(
                 "Please answer the user's query. Prioritize information from the context provided below. "
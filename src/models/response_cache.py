@@ -0,0 +1,187 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, List, Optional
+
+import numpy as np
+
+from src.config.chat import ChatConfig
+
+# Context keys that only steer how an answer is written, not what it is about.
+INSTRUCTION_KEYS = ("persona_prompt", "mode_instruction", "response_mode_instruction")
+
+def _digest(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+def normalize_prompt(prompt: str) -> str:
+    """Case and whitespace folding, so trivially different phrasings share an exact key."""
+    return " ".join(prompt.lower().split())
+
+def _numbers(prompt: str) -> FrozenSet[str]:
+    # Form numbers, years and amounts: "1099 deadline" and "1040 deadline" embed
+    # almost identically but must never share an answer.
+    return frozenset(re.findall(r"\d[\d,.\-/]*", prompt))
+
+class CacheRequest:
+    """
+    The cache's view of one chat turn: its exact key and, for standalone questions,
+    what the semantic tier matches on. The query embedding is computed lazily and
+    reused between lookup and store. With `semantic=False` (bulk or structured
+    requests, whose answers must match their prompt exactly) the turn only uses
+    the exact tier.
+    """
+    def __init__(
+        self,
+        prompt: str,
+        history: List[Any],
+        context: Dict[str, Any],
+        generation_config: Dict[str, Any],
+        semantic: bool = True,
+    ):
+        self.prompt = prompt
+        self.key = _digest([normalize_prompt(prompt), history, context, generation_config])
+        # The semantic tier ignores the retrieved context (it differs for every
+        # phrasing) and relies on the corpus version (a content hash of the indexed
+        # documents, shared by every session holding them) instead; follow-up questions
+        # depend on earlier turns, so only standalone questions take part.
+        self.semantic = semantic and not history and not context.get("conversation_summary")
+        self.signature = _digest([
+            [context.get(key) for key in INSTRUCTION_KEYS], generation_config, context.get("corpus_version")
+        ])
+        self.numbers = _numbers(prompt)
+        self.vector: Optional[np.ndarray] = None
+
+class CachedResponse:
+    """A generated answer and what it cost to produce."""
+    def __init__(self, text: str, seconds: float, created_at: float, request: CacheRequest):
+        self.text = text
+        self.seconds = seconds
+        self.created_at = created_at
+        self.signature = request.signature
+        self.numbers = request.numbers
+        self.vector = request.vector if request.semantic else None
+
+class ResponseCache:
+    """
+    Reuses answers to repeated questions instead of calling the model again.
+
+    The exact tier matches on the normalized prompt, history, full context (retrieved
+    documents, instructions, summary) and generation config. The optional semantic
+    tier, enabled by passing an embedder, reuses the answer to a standalone question
+    whose embedding is within `similarity_threshold` (cosine) of the new one, asked
+    with the same instructions against the same corpus version. Entries expire
+    after `ttl` seconds, and the least recently used are evicted beyond `max_size`.
+    """
+    def __init__(
+        self,
+        max_size: int = ChatConfig.RESPONSE_CACHE_SIZE,
+        ttl: float = ChatConfig.RESPONSE_CACHE_TTL_S,
+        embedder=None,
+        similarity_threshold: float = ChatConfig.SEMANTIC_CACHE_THRESHOLD,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.embedder = embedder if ChatConfig.SEMANTIC_CACHE_ENABLED else None
+        self.similarity_threshold = similarity_threshold
+        self.clock = clock
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def request(
+        self,
+        prompt: str,
+        history: List[Any],
+        context: Dict[str, Any],
+        generation_config: Dict[str, Any],
+        semantic: bool = True,
+    ) -> CacheRequest:
+        return CacheRequest(prompt, history, context, generation_config, semantic)
+
+    def get(self, request: CacheRequest) -> Optional[CachedResponse]:
+        """Returns a cached answer for the turn, trying the exact tier first, or None."""
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(request.key)
+            if entry is not None:
+                self._entries.move_to_end(request.key)
+                self.exact_hits += 1
+                self.saved_seconds += entry.seconds
+                logging.info(f"Response cache hit (exact), saved ~{entry.seconds:.2f}s.")
+                return entry
+            candidates = [
+                (key, e) for key, e in self._entries.items()
+                if e.vector is not None and e.signature == request.signature and e.numbers == request.numbers
+            ]
+
+        if self.embedder is not None and request.semantic and candidates:
+            vector = self._embed(request)
+            similarities = np.stack([e.vector for _, e in candidates]) @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.similarity_threshold:
+                key, entry = candidates[best]
+                with self._lock:
+                    if key in self._entries:
+                        self._entries.move_to_end(key)
+                    self.semantic_hits += 1
+                    self.saved_seconds += entry.seconds
+                logging.info(
+                    f"Response cache hit (semantic, similarity {similarities[best]:.3f}), saved ~{entry.seconds:.2f}s."
+                )
+                return entry
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, request: CacheRequest, text: str, seconds: float) -> None:
+        """Stores a freshly generated answer along with how long it took to generate."""
+        if self.max_size <= 0 or not text:
+            return
+        if self.embedder is not None and request.semantic:
+            self._embed(request)
+        entry = CachedResponse(text, seconds, self.clock(), request)
+        with self._lock:
+            self._entries[request.key] = entry
+            self._entries.move_to_end(request.key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Reports hits per tier, hit rate and the generation time saved by hits."""
+        hits = self.exact_hits + self.semantic_hits
+        total = hits + self.misses
+        return {
+            "size": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else 0.0,
+            "saved_seconds": self.saved_seconds,
+        }
+
+    def _embed(self, request: CacheRequest) -> np.ndarray:
+        if request.vector is None:
+            request.vector = np.asarray(self.embedder.embed(request.prompt)[0], dtype=np.float32)
+        return request.vector
+
+    def _expire(self) -> None:
+        """Drops entries older than the TTL (entries are in least recently used order, not age)."""
+        deadline = self.clock() - self.ttl
+        for key in [key for key, e in self._entries.items() if e.created_at < deadline]:
+            del self._entries[key]
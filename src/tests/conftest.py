@@ -0,0 +1,104 @@
+import re
+import time
+import zlib
+import numpy as np
+import pytest
+from src.models.embeddings import EmbedderRegistry, EmbeddingCache, LegalEmbedder
+
+class HashingModel:
+    """
+    Deterministic stand-in for SentenceTransformer: a normalized bag-of-words
+    vector, so texts sharing words score as similar. Records every forward pass.
+    """
+    dim = 64
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=True):
+        self.calls.append(list(texts))
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in re.findall(r"\w+", text.lower()):
+                vectors[row, zlib.crc32(word.encode()) % self.dim] += 1.0
+            vectors[row, -1] += 1e-3  # keep empty texts non-zero
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+@pytest.fixture
+def fake_registry():
+    return EmbedderRegistry(loader=lambda name: HashingModel())
+
+@pytest.fixture
+def fake_embedder(fake_registry):
+    return LegalEmbedder(registry=fake_registry)
+
+@pytest.fixture
+def fake_cache(fake_embedder, tmp_path):
+    return EmbeddingCache(fake_embedder, cache_dir=str(tmp_path / "embeddings"))
+
+@pytest.fixture(autouse=True)
+def clear_query_vector_cache():
+    from src.utils.retrieval import query_vector_cache
+    query_vector_cache.clear()
+    yield
+    query_vector_cache.clear()
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+class FakeChatSession:
+    """Chat session of FakeGenerativeModel, mirroring the SDK's `send_message`."""
+    def __init__(self, model, history):
+        self.model = model
+        self.history = list(history)
+
+    def send_message(self, content, generation_config=None, stream=False):
+        self.model.prompts.append(content)
+        if self.model.failures:
+            raise self.model.failures.pop(0)
+        if self.model.error is not None:
+            raise self.model.error
+        reply = self.model.reply
+        chunks = [reply[i:i + self.model.chunk_size] for i in range(0, len(reply), self.model.chunk_size)]
+        if not stream:
+            self._record(content, reply)
+            return FakeChunk(reply)
+        return self._stream(content, chunks)
+
+    def _stream(self, content, chunks):
+        for chunk in chunks:
+            time.sleep(self.model.delay)
+            yield FakeChunk(chunk)
+        self._record(content, "".join(chunks))
+
+    def _record(self, content, reply):
+        # Like the SDK, the exchange joins the session's history once the reply is complete.
+        self.history += [{"role": "user", "parts": [{"text": content}]}, {"role": "model", "parts": [{"text": reply}]}]
+
+class FakeGenerativeModel:
+    """
+    Local stand-in for `genai.GenerativeModel`: replies with a fixed text, streamed
+    in fixed-size chunks with an optional per-chunk delay. Records every prompt.
+    `failures` are raised by the next requests, one each; `error` by every request.
+    """
+    def __init__(self, reply="Form 1099 is due January 31.", chunk_size=8, delay=0.0, error=None):
+        self.reply = reply
+        self.chunk_size = chunk_size
+        self.delay = delay
+        self.error = error
+        self.failures = []
+        self.prompts = []
+        self.sessions = []
+
+    def start_chat(self, history=None):
+        session = FakeChatSession(self, history or [])
+        self.sessions.append(session)
+        return session
+
+@pytest.fixture
+def fake_model():
+    return FakeGenerativeModel()
@@ -0,0 +1,47 @@
+import os
+
+from src.utils.cache import LRUCache, PersistentCache
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert cache.stats()["hits"] == 1
+
+
+def test_persistent_cache_survives_new_instances(tmp_path):
+    PersistentCache(str(tmp_path), max_bytes=1 << 20).put("doc", {"text": "Section 1"})
+
+    cache = PersistentCache(str(tmp_path), max_bytes=1 << 20)
+    assert cache.get("doc") == {"text": "Section 1"}
+    assert cache.get("missing") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_persistent_cache_evicts_least_recently_used_past_size_bound(tmp_path):
+    probe = PersistentCache(str(tmp_path / "probe"), max_bytes=1 << 20)
+    probe.put("x", {"text": "a" * 50})
+    entry_size = os.path.getsize(tmp_path / "probe" / "x.json.gz")
+
+    cache = PersistentCache(str(tmp_path / "cache"), max_bytes=entry_size * 2)
+    for age, key in enumerate(["old", "newer"]):
+        cache.put(key, {"text": "a" * 50})
+        os.utime(tmp_path / "cache" / f"{key}.json.gz", (1000 + age, 1000 + age))
+    cache.get("old")  # reading refreshes recency
+    cache.put("newest", {"text": "a" * 50})
+
+    assert cache.get("newer") is None
+    assert cache.get("old") is not None and cache.get("newest") is not None
+
+
+def test_persistent_cache_drops_corrupt_entries(tmp_path):
+    cache = PersistentCache(str(tmp_path), max_bytes=1 << 20)
+    (tmp_path / "bad.json.gz").write_bytes(b"not gzip")
+
+    assert cache.get("bad") is None
+    assert not (tmp_path / "bad.json.gz").exists()
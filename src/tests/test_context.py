@@ -0,0 +1,91 @@
+import threading
+import time
+
+from src.utils.context import ContextGatherer
+
+
+class SlowRetriever:
+    def __init__(self, delay=0.0, error=None):
+        self.delay, self.error = delay, error
+
+    def retrieve(self, query):
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return [("From document 'handbook.pdf':\nOvertime is paid at 1.5x.", 0.9)]
+
+
+class SlowSearcher:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.finished = threading.Event()
+
+    def search(self, query):
+        time.sleep(self.delay)
+        self.finished.set()
+        return [{"snippet": "The FLSA sets overtime rules.", "url": "https://dol.gov"}]
+
+
+def test_sources_are_fetched_concurrently():
+    gatherer = ContextGatherer(retrieval_timeout=2, web_timeout=2)
+
+    start = time.perf_counter()
+    gathered = gatherer.gather("overtime", SlowRetriever(delay=0.2), SlowSearcher(delay=0.2))
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.35
+    assert gathered["timed_out"] == []
+    assert set(gathered["seconds"]) == {"retrieval", "web_search"}
+    assert gatherer.format_context(gathered) == (
+        "From document 'handbook.pdf':\nOvertime is paid at 1.5x.\n\n"
+        "Based on a web search:\n- The FLSA sets overtime rules."
+    )
+
+
+def test_slow_source_is_dropped_after_its_timeout():
+    gatherer = ContextGatherer(retrieval_timeout=2, web_timeout=0.05)
+    searcher = SlowSearcher(delay=0.3)
+
+    start = time.perf_counter()
+    gathered = gatherer.gather("overtime", SlowRetriever(), searcher)
+
+    assert time.perf_counter() - start < 0.25
+    assert gathered["timed_out"] == ["web_search"]
+    assert gathered["search_results"] == [] and len(gathered["retrieved_docs"]) == 1
+    assert "web search" not in gatherer.format_context(gathered)
+    assert searcher.finished.wait(1)  # the late fetch still completes (and fills the web cache)
+
+
+def test_failed_or_skipped_sources_leave_no_context():
+    gatherer = ContextGatherer()
+
+    gathered = gatherer.gather("overtime", SlowRetriever(error=RuntimeError("index busy")), None)
+
+    assert gathered["retrieved_docs"] == [] and gathered["timed_out"] == []
+    assert gatherer.format_context(gathered) is None
+
+
+class HungSearcher:
+    """A web search that blocks until released, like a request stuck on a dead connection."""
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = 0
+
+    def search(self, query):
+        self.calls += 1
+        self.release.wait(5)
+        return [{"snippet": "Late result.", "url": "https://example.com"}]
+
+
+def test_hung_web_searches_neither_delay_retrieval_nor_pile_up():
+    gatherer = ContextGatherer(retrieval_timeout=1, web_timeout=0.05, retrieval_workers=1, web_workers=1, max_pending_web=2)
+    searcher = HungSearcher()
+
+    turns = [gatherer.gather("overtime", SlowRetriever(), searcher) for _ in range(3)]
+
+    assert all(len(turn["retrieved_docs"]) == 1 for turn in turns)
+    assert [turn["timed_out"] for turn in turns] == [["web_search"], ["web_search"], []]
+    assert searcher.calls == 1  # the second search is still queued; the third was never sent
+    searcher.release.set()
+    gatherer._executors["web_search"].submit(lambda: None).result(1)  # the pending searches have finished
+    assert gatherer.gather("overtime", None, SlowSearcher())["search_results"]
@@ -0,0 +1,252 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+pytest.importorskip("google.generativeai")
+
+from src.models.embeddings import EmbeddingCache  # noqa: E402
+from src.models.llm import GeminiClient  # noqa: E402
+from src.utils.cross_ref import CrossReferencer  # noqa: E402
+from src.utils.scheduler import RequestScheduler  # noqa: E402
+
+NAMES = ["handbook.pdf", "policy.docx", "contract.pdf", "memo.txt"]
+TEXTS = [f"Text of {name}" for name in NAMES]
+
+
+@pytest.fixture
+def client(fake_model):
+    scheduler = RequestScheduler(requests_per_minute=10**6, tokens_per_minute=10**9, sleep=lambda s: None)
+    return GeminiClient(model=fake_model, scheduler=scheduler)
+
+
+class SlowReferencer(CrossReferencer):
+    """Compares pairs with a per-pair delay and score instead of calling the model."""
+    def __init__(self, client, delays=None):
+        super().__init__(client)
+        self.delays = delays or {}
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def _llm_compare(self, text1, text2, name1, name2, query):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delays.get((name1, name2), 0.05))
+        with self._lock:
+            self.active -= 1
+        return {"doc1": name1, "doc2": name2, "similarity_score": len(name1) + len(name2)}
+
+
+def test_compare_documents_parses_llm_json(client, fake_model):
+    fake_model.reply = json.dumps({"doc1": "a", "doc2": "b", "similarities": [], "differences": [], "similarity_score": 7})
+    results = CrossReferencer(client).compare_documents(TEXTS[:2], NAMES[:2], "overtime")
+
+    assert results[0]["similarity_score"] == 7
+    assert "handbook.pdf" in fake_model.prompts[0] and "overtime" in fake_model.prompts[0]
+
+
+def test_pairs_run_concurrently_within_the_worker_limit(client):
+    referencer = SlowReferencer(client)
+
+    start = time.perf_counter()
+    results = referencer.compare_documents(TEXTS, NAMES, "overtime", max_workers=3)
+    elapsed = time.perf_counter() - start
+
+    assert len(results) == 6
+    assert referencer.peak == 3
+    assert elapsed < 6 * 0.05
+    scores = [r["similarity_score"] for r in results]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_results_arrive_incrementally_in_completion_order(client):
+    referencer = SlowReferencer(client, delays={("handbook.pdf", "policy.docx"): 0.3})
+    seen = []
+
+    results = referencer.compare_documents(TEXTS[:3], NAMES[:3], "q", max_workers=3, on_result=seen.append)
+
+    assert len(seen) == 3
+    assert (seen[-1]["doc1"], seen[-1]["doc2"]) == ("handbook.pdf", "policy.docx")
+    assert sorted(map(id, seen)) == sorted(map(id, results))
+
+
+def test_slow_pairs_time_out_without_holding_up_the_rest(client):
+    referencer = SlowReferencer(client, delays={("handbook.pdf", "policy.docx"): 1.0})
+
+    start = time.perf_counter()
+    results = list(referencer.iter_comparisons(TEXTS[:3], NAMES[:3], "q", max_workers=3, pair_timeout=0.2))
+
+    assert time.perf_counter() - start < 0.6
+    errors = [r for r in results if "error" in r]
+    assert [(r["doc1"], r["doc2"]) for r in errors] == [("handbook.pdf", "policy.docx")]
+    assert "Timed out" in errors[0]["error"]
+    assert len(results) == 3
+
+
+def test_pairs_queued_behind_a_hung_call_time_out_with_the_run(client):
+    referencer = SlowReferencer(client, delays={("handbook.pdf", "policy.docx"): 3.0})
+
+    start = time.perf_counter()
+    results = list(referencer.iter_comparisons(TEXTS[:3], NAMES[:3], "q", max_workers=1, pair_timeout=0.3))
+
+    # Three rounds of one worker at 0.3s each, not the 3s of the hung call.
+    assert time.perf_counter() - start < 1.5
+    assert [r["error"] for r in results] == [
+        "Timed out after 0.3s.", "Timed out waiting for a worker.", "Timed out waiting for a worker."
+    ]
+
+
+def test_failed_pairs_are_reported_per_pair(client):
+    class FailingReferencer(SlowReferencer):
+        def _llm_compare(self, text1, text2, name1, name2, query):
+            if name2 == "contract.pdf":
+                raise RuntimeError("boom")
+            return super()._llm_compare(text1, text2, name1, name2, query)
+
+    results = FailingReferencer(client).compare_documents(TEXTS[:3], NAMES[:3], "q")
+
+    assert sum("error" in r for r in results) == 2
+    assert results[0]["similarity_score"] == len("handbook.pdf") + len("policy.docx")
+
+
+def test_non_object_json_is_reported_for_its_pair(client, fake_model):
+    fake_model.reply = json.dumps(["not", "an", "object"])
+    results = CrossReferencer(client).compare_documents(TEXTS[:3], NAMES[:3], "overtime")
+
+    assert len(results) == 3
+    assert all("JSON object" in r["error"] and r["method"] == "llm" for r in results)
+
+
+class BagOfWordsEmbedder:
+    """Embeds texts as word counts over a small vocabulary, so similarities are predictable."""
+    VOCAB = ["overtime", "leave", "salary", "privacy", "travel", "safety"]
+    model_name = "bag-of-words"
+    dim = len(VOCAB)
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed(self, texts, batch_size=32):
+        self.calls += 1
+        texts = [texts] if isinstance(texts, str) else texts
+        return np.array([[t.lower().count(w) + 0.01 for w in self.VOCAB] for t in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def bow_cache(tmp_path):
+    return EmbeddingCache(BagOfWordsEmbedder(), cache_dir=str(tmp_path / "embeddings"))
+
+
+TOPICS = ["overtime", "leave", "salary", "privacy", "travel", "safety"]
+
+
+def test_llm_calls_are_pruned_to_a_linear_budget(client, bow_cache):
+    names = [f"policy-{k}.pdf" for k in range(10)]
+    texts = [f"This policy covers {TOPICS[k % len(TOPICS)]} rules." for k in range(10)]
+    referencer = SlowReferencer(client, delays={})
+    referencer.embedding_cache = bow_cache
+
+    results = referencer.compare_documents(texts, names, "overtime", max_workers=8)
+
+    llm = [r for r in results if r["method"] == "llm"]
+    assert len(results) == 45
+    assert len(llm) == 20  # CrossRefConfig.LLM_PAIRS_PER_DOCUMENT per document
+    assert {r["doc1"] for r in llm} | {r["doc2"] for r in llm} == set(names)
+    assert bow_cache.embedder.calls == 1
+
+    # Embedding estimates are labelled as such and ranked after every LLM comparison.
+    assert results[:20] == llm
+    estimated = results[20:]
+    assert all("similarity_score" not in r and 1 <= r["estimated_similarity_score"] <= 10 for r in estimated)
+    scores = [r["estimated_similarity_score"] for r in estimated]
+    assert scores == sorted(scores, reverse=True)
+
+    referencer.compare_documents(texts, names, "overtime", max_workers=8)
+    assert bow_cache.embedder.calls == 1  # Chunk and query vectors come from the cache
+
+
+def test_the_most_relevant_pair_gets_the_llm_comparison(client, bow_cache):
+    texts = ["Overtime is paid at 1.5x.", "Leave accrues monthly.", "Overtime needs approval.", "Travel is reimbursed."]
+    referencer = CrossReferencer(client, embedding_cache=bow_cache)
+
+    selected, scored = referencer.select_pairs(texts, "overtime", max_llm_pairs=1)
+
+    assert selected == [(0, 2)]
+    assert (0, 2) not in scored and len(scored) == 5
+    assert scored[(1, 3)] < 0.1  # unrelated topics
+
+
+def test_no_embeddings_when_every_pair_fits_the_budget(client):
+    referencer = SlowReferencer(client)
+    referencer.embedder = None
+
+    results = referencer.compare_documents(TEXTS, NAMES, "q", max_llm_pairs=6)
+
+    assert all(r["method"] == "llm" for r in results)
+    assert referencer.embedding_cache is None
+
+
+def test_pair_selection_reuses_the_retrievers_chunk_vectors(client, fake_embedder, fake_cache):
+    from src.utils.retrieval import VectorRetriever
+    from src.utils.text_splitter import RecursiveTextSplitter
+
+    retriever = VectorRetriever(embedder=fake_embedder, embedding_cache=fake_cache)
+    texts = ["".join(long_document(topic, f"The {topic} covers overtime.")) for topic in ("handbook", "contract", "memo")]
+    for k, text in enumerate(texts):
+        retriever.add_document(f"doc-{k}", text, spans=RecursiveTextSplitter().split_spans(text))
+    misses = fake_cache.misses
+
+    CrossReferencer(client, retriever=retriever).select_pairs(texts, "overtime pay", max_llm_pairs=1)
+
+    assert fake_cache.misses == misses + 1  # Only the query is new
+
+
+def long_document(topic, clause):
+    """A document whose clause on the query topic sits far below a long preamble."""
+    filler = [f"Section {k} of the {topic} sets out definitions and general provisions. " * 8 for k in range(12)]
+    return filler[:9] + [clause] + filler[9:]
+
+
+def test_comparisons_send_query_relevant_passages_within_the_budget(client, fake_model, fake_embedder, fake_cache):
+    from src.utils.retrieval import VectorRetriever
+
+    retriever = VectorRetriever(embedder=fake_embedder, embedding_cache=fake_cache)
+    chunks = {
+        "handbook": long_document("handbook", "Overtime hours are paid at one and a half times the hourly rate."),
+        "contract": long_document("contract", "Overtime hours require written approval and are paid double."),
+    }
+    for doc_id, doc_chunks in chunks.items():
+        retriever.add_document(doc_id, doc_chunks, metadata={"name": f"{doc_id}.pdf"})
+    texts = [retriever.store.texts[doc_id] for doc_id in chunks]
+    fake_model.reply = json.dumps({"similarity_score": 6})
+    referencer = CrossReferencer(client, retriever=retriever)
+
+    referencer.compare_documents(texts, ["handbook.pdf", "contract.pdf"], "overtime hours pay", doc_ids=list(chunks))
+
+    prompt = fake_model.prompts[0]
+    assert "one and a half times" in prompt and "written approval" in prompt
+    stats = referencer.last_run_stats
+    assert stats["llm_pairs"] == 1
+    assert stats["tokens_per_pair"] < stats["leading_excerpt_tokens_per_pair"]
+
+
+def test_excerpts_keep_document_order_and_fall_back_to_opening_text(client, fake_embedder, fake_cache):
+    from src.config.chat import ChatConfig
+    from src.config.cross_ref import CrossRefConfig
+    from src.utils.retrieval import VectorRetriever
+
+    retriever = VectorRetriever(embedder=fake_embedder, embedding_cache=fake_cache)
+    retriever.add_document("memo", ["Remote work needs approval.", "Leave policy text.", "Remote work equipment is provided."])
+    referencer = CrossReferencer(client, retriever=retriever)
+
+    excerpt = referencer.excerpt(retriever.store.texts["memo"], "remote work", doc_id="memo")
+    assert excerpt.index("needs approval") < excerpt.index("equipment")
+
+    text = "x" * 10_000
+    assert referencer.excerpt(text, "remote work") == text[:int(CrossRefConfig.EXCERPT_TOKEN_BUDGET * ChatConfig.CHARS_PER_TOKEN)]
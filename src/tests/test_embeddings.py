@@ -0,0 +1,125 @@
+import threading
+import numpy as np
+from src.models.embeddings import EmbedderRegistry, LegalEmbedder, SharedModel
+from conftest import HashingModel
+
+def make_registry():
+    loads = []
+    def loader(name):
+        loads.append(name)
+        return HashingModel()
+    return EmbedderRegistry(loader=loader), loads
+
+def test_model_loaded_once_per_process():
+    registry, loads = make_registry()
+    embedders = [LegalEmbedder(registry=registry) for _ in range(5)]
+    assert loads == ["all-MiniLM-L6-v2"]
+    assert all(e.model is embedders[0].model for e in embedders)
+
+def test_concurrent_load_is_thread_safe():
+    registry, loads = make_registry()
+    threads = [threading.Thread(target=registry.get) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(loads) == 1
+
+def test_embed_results_match_inputs(fake_embedder):
+    texts = ["alpha", "b", "banana"]
+    vectors = fake_embedder.embed(texts)
+    assert vectors.shape == (3, HashingModel.dim)
+    assert np.allclose(vectors, fake_embedder.model.encode(texts))
+    assert fake_embedder.embed([]).shape == (0, HashingModel.dim)
+
+def test_stats_reports_load_and_queue_counters(fake_registry, fake_embedder):
+    fake_embedder.embed("hello")
+    stats = fake_registry.stats()["all-MiniLM-L6-v2"]
+    assert stats["load_seconds"] >= 0
+    assert stats["requests_served"] == 1
+    assert stats["texts_encoded"] == 1
+
+class GatedModel(HashingModel):
+    """Blocks its first forward pass until released, and rejects any batch containing "bad"."""
+    def __init__(self):
+        super().__init__()
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def encode(self, texts, **kwargs):
+        self.entered.set()
+        self.release.wait(5)
+        if "bad" in texts:
+            self.calls.append(list(texts))
+            raise ValueError("bad input")
+        return super().encode(texts, **kwargs)
+
+def run_in_thread(fn, *args):
+    result = {}
+    def target():
+        try:
+            result["value"] = fn(*args)
+        except Exception as e:
+            result["error"] = e
+    thread = threading.Thread(target=target)
+    thread.start()
+    return thread, result
+
+def test_small_request_is_served_between_slices_of_a_large_one():
+    model = GatedModel()
+    shared = SharedModel("gated", model, 0.0, 0, max_batch_texts=4)
+    document = [f"chunk {i}" for i in range(12)]
+    large, large_result = run_in_thread(shared.encode, document)
+    assert model.entered.wait(5)
+    small, small_result = run_in_thread(shared.encode, ["query"])
+    while shared._requests.empty():
+        pass  # wait until the query is queued behind the first slice
+    model.release.set()
+    large.join(5)
+    small.join(5)
+
+    assert model.calls[0] == document[:4]
+    assert "query" in model.calls[1] and len(model.calls[1]) <= 4
+    assert len(model.calls) == 4
+    assert np.allclose(large_result["value"], HashingModel().encode(document))
+    assert np.allclose(small_result["value"], HashingModel().encode(["query"]))
+
+def test_failed_batch_only_fails_the_request_with_the_bad_input():
+    model = GatedModel()
+    shared = SharedModel("gated", model, 0.0, 0)
+    first, first_result = run_in_thread(shared.encode, ["warm up"])
+    assert model.entered.wait(5)
+    good, good_result = run_in_thread(shared.encode, ["fine"])
+    while shared._requests.qsize() < 1:
+        pass  # queue the requests in a known order behind the first pass
+    bad, bad_result = run_in_thread(shared.encode, ["bad"])
+    while shared._requests.qsize() < 2:
+        pass
+    model.release.set()
+    for thread in (first, good, bad):
+        thread.join(5)
+
+    assert model.calls[1] == ["fine", "bad"]
+    assert isinstance(bad_result["error"], ValueError)
+    assert np.allclose(good_result["value"], HashingModel().encode(["fine"]))
+    assert first_result["value"].shape == (1, HashingModel.dim)
+
+def test_cache_get_many_embeds_misses_in_one_call(fake_cache, fake_embedder):
+    calls = fake_embedder.model.calls
+    first = fake_cache.get_many(["a b", "c d", "a b"])
+    assert calls == [["a b", "c d"]]
+    second = fake_cache.get_many(["c d", "e f", "a b"])
+    assert calls[-1] == ["e f"]
+    assert np.allclose(second[0], first[1])
+    assert np.allclose(second[2], first[0])
+    assert len(fake_cache) == 3
+    assert (fake_cache.hits, fake_cache.misses) == (3, 3)
+
+def test_cache_persists_across_instances(fake_cache, fake_embedder):
+    from src.models.embeddings import EmbeddingCache
+    expected = fake_cache.get_many(["persist me", "and me"])
+    reopened = EmbeddingCache(fake_embedder, cache_dir=str(fake_cache.cache_dir.parent))
+    calls_before = len(fake_embedder.model.calls)
+    assert np.allclose(reopened.get_many(["and me", "persist me"]), expected[::-1])
+    assert len(fake_embedder.model.calls) == calls_before
+    assert np.allclose(reopened.get_embedding("persist me"), expected[0])
@@ -0,0 +1,262 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from src.config.ingest import IngestConfig
+from src.utils import file_processor, ocr
+from src.utils.cache import PersistentCache
+from src.utils.file_processor import FileProcessor, UploadBuffer
+from src.utils.ocr import OCREngine
+
+
+def make_pdf(pages):
+    """
+    Builds a minimal PDF without a PDF writer library. Each page is either a string
+    (one Helvetica line) or a PIL image (a scanned page with no text layer).
+    """
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in pages:
+        if isinstance(page, Image.Image):
+            jpeg = io.BytesIO()
+            page.convert("L").save(jpeg, format="JPEG")
+            objects.append(
+                f"<< /Type /XObject /Subtype /Image /Width {page.width} /Height {page.height} "
+                f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /DCTDecode /Length {len(jpeg.getvalue())} >>"
+                f"\nstream\n{jpeg.getvalue().decode('latin-1')}\nendstream"
+            )
+            stream = f"q 612 0 0 792 0 0 cm /Im1 Do Q"
+            resources = f"/XObject << /Im1 {len(objects)} 0 R >>"
+        else:
+            stream = f"BT /F1 12 Tf 72 720 Td ({page}) Tj ET"
+            resources = "/Font << /F1 3 0 R >>"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << {resources} >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1"))
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode("latin-1"))
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1"))
+    return out.getvalue()
+
+
+@pytest.fixture
+def small_pdf_tasks(monkeypatch):
+    monkeypatch.setattr(IngestConfig, "PDF_PARALLEL_MIN_PAGES", 4)
+    monkeypatch.setattr(IngestConfig, "PDF_MIN_PAGES_PER_WORKER", 3)
+
+
+def test_parallel_pdf_extraction_matches_serial(small_pdf_tasks):
+    pdf = make_pdf([f"Clause {i} governs payment terms" for i in range(11)])
+
+    serial = FileProcessor(pdf_workers=1)._process_pdf(io.BytesIO(pdf))
+    parallel = FileProcessor(pdf_workers=3)._process_pdf(io.BytesIO(pdf))
+
+    assert "Clause 0 governs" in serial["text"] and "Clause 10 governs" in serial["text"]
+    assert parallel["text"] == serial["text"]
+    assert parallel["preview"] == serial["preview"]
+    assert len(parallel["page_timings"]) == len(serial["page_timings"]) == 11
+
+
+def test_parallel_pdf_stream_keeps_page_order(small_pdf_tasks):
+    pdf = make_pdf([f"Page {i}" for i in range(10)])
+
+    pieces = list(FileProcessor(pdf_workers=2)._iter_pdf_text(io.BytesIO(pdf)))
+
+    assert len(pieces) == 10
+    assert [piece.strip() for piece in pieces] == [f"Page {i}" for i in range(10)]
+    assert all(piece.startswith("\n") for piece in pieces[1:])
+
+
+def test_parallel_pdf_workers_get_a_file_path_and_one_page_range_each(small_pdf_tasks, monkeypatch):
+    pool = file_processor._pdf_process_pool()
+    submitted = []
+
+    class RecordingPool:
+        def submit(self, fn, *args):
+            submitted.append(args)
+            return pool.submit(fn, *args)
+
+    monkeypatch.setattr(file_processor, "_pdf_process_pool", RecordingPool)
+    pdf = make_pdf([f"Page {i}" for i in range(12)])
+
+    text = FileProcessor(pdf_workers=3)._process_pdf(io.BytesIO(pdf))["text"]
+
+    assert text.split("\n") == [f"Page {i}" for i in range(12)]
+    assert [args[1:] for args in submitted] == [(0, 4), (4, 8), (8, 12)]
+    assert len({args[0] for args in submitted}) == 1 and not os.path.exists(submitted[0][0])
+
+
+def test_pdf_pool_is_shared_and_spawned():
+    pool = file_processor._pdf_process_pool()
+    assert file_processor._pdf_process_pool() is pool
+    assert pool._mp_context.get_start_method() == "spawn"
+
+
+@pytest.fixture
+def fake_tesseract(monkeypatch):
+    """Replaces tesseract with a reader that 'recognizes' a tile by its width."""
+    calls = []
+
+    def image_to_string(tile, lang="eng", config=""):
+        calls.append(tile.size)
+        return f"scanned page {tile.width}\n\f"
+
+    monkeypatch.setattr(ocr.pytesseract, "image_to_string", image_to_string)
+    return calls
+
+
+def test_scanned_pdf_pages_are_ocrd_in_order(fake_tesseract):
+    scans = [Image.new("L", (100 + i, 140), 255) for i in range(3)]
+    pdf = make_pdf(["Cover letter", scans[0], "Signature page", scans[1], scans[2]])
+
+    processor = FileProcessor(pdf_workers=1, ocr=OCREngine(max_workers=2))
+    result = processor._process_pdf(io.BytesIO(pdf))
+
+    assert result["text"].split("\n") == [
+        "Cover letter", "scanned page 100", "Signature page", "scanned page 101", "scanned page 102",
+    ]
+    assert len(fake_tesseract) == 3
+    assert len(result["page_timings"]) == 5
+
+
+def test_ocr_failure_keeps_the_text_layer_pages(monkeypatch):
+    def image_to_string(tile, lang="eng", config=""):
+        raise ocr.pytesseract.TesseractNotFoundError()
+
+    monkeypatch.setattr(ocr.pytesseract, "image_to_string", image_to_string)
+    pdf = make_pdf(["Terms of service", Image.new("L", (100, 140), 255), "Signed by both parties"])
+
+    result = FileProcessor(pdf_workers=1, ocr=OCREngine(max_workers=1))._process_pdf(io.BytesIO(pdf))
+
+    assert result["text"].split("\n") == ["Terms of service", "", "Signed by both parties"]
+
+
+def test_image_upload_uses_ocr_engine(fake_tesseract):
+    image = io.BytesIO()
+    Image.new("RGB", (120, 80), "white").save(image, format="PNG")
+    image.seek(0)
+
+    text = "".join(FileProcessor(ocr=OCREngine(max_workers=1))._iter_image_text(image))
+
+    assert text == "scanned page 120"
+    assert fake_tesseract == [(120, 80)]
+
+
+def test_multi_page_images_are_ocrd_frame_by_frame_in_a_bounded_window(fake_tesseract):
+    image = io.BytesIO()
+    frames = [Image.new("L", (100 + i, 140), 255) for i in range(5)]
+    frames[0].save(image, format="TIFF", save_all=True, append_images=frames[1:])
+    image.seek(0)
+
+    class CountingEngine(OCREngine):
+        submitted = 0
+
+        def submit(self, images):
+            self.submitted += 1
+            return super().submit(images)
+
+    engine = CountingEngine(max_workers=2)
+    pieces = FileProcessor(ocr=engine)._iter_image_text(image)
+
+    assert next(pieces) == "scanned page 100"
+    assert engine.submitted <= 3
+    assert [next(pieces) for _ in range(4)] == [f"\nscanned page {100 + i}" for i in range(1, 5)]
+    assert engine.submitted == 5
+
+
+class Upload(io.BytesIO):
+    """Stands in for a Streamlit UploadedFile."""
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+@pytest.fixture
+def extraction_cache(tmp_path):
+    return PersistentCache(str(tmp_path / "extraction"), max_bytes=1 << 20)
+
+
+def test_identical_upload_is_served_from_extraction_cache(fake_tesseract, extraction_cache):
+    image = io.BytesIO()
+    Image.new("RGB", (120, 80), "white").save(image, format="PNG")
+    processor = FileProcessor(ocr=OCREngine(max_workers=1), cache=extraction_cache)
+
+    first = processor.process_uploaded_file(Upload(image.getvalue(), "scan.png"))
+    second = FileProcessor(cache=extraction_cache).process_uploaded_file(Upload(image.getvalue(), "copy.png"))
+
+    assert len(fake_tesseract) == 1
+    assert second["cached"] and "cached" not in first
+    assert second["name"] == "copy.png"
+    for key in ("type", "text", "preview", "page_map"):
+        assert second[key] == first[key]
+
+
+def test_streamed_pdf_is_cached_with_its_page_map(extraction_cache):
+    pdf = make_pdf(["Employee handbook", "Leave policy", "Code of conduct"])
+    processor = FileProcessor(pdf_workers=1, cache=extraction_cache)
+
+    info, pieces = processor.stream_uploaded_file(Upload(pdf, "handbook.pdf"))
+    fresh_pieces = list(pieces)
+    text = "".join(fresh_pieces)
+    cached_info, cached_pieces = processor.stream_uploaded_file(Upload(pdf, "handbook.pdf"))
+
+    assert list(cached_pieces) == fresh_pieces
+    assert cached_info["cached"] and cached_info["page_map"] == info["page_map"]
+    assert [text[start:end].strip() for start, end in info["page_map"]] == [
+        "Employee handbook", "Leave policy", "Code of conduct",
+    ]
+    assert processor.process_uploaded_file(Upload(pdf, "handbook.pdf"))["page_map"] == info["page_map"]
+
+
+def test_failed_stream_is_not_cached(extraction_cache):
+    processor = FileProcessor(pdf_workers=1, cache=extraction_cache)
+
+    info, pieces = processor.stream_uploaded_file(Upload(b"%PDF-1.4 truncated", "broken.pdf"))
+    with pytest.raises(Exception):
+        list(pieces)
+
+    assert len(extraction_cache) == 0
+
+
+
+def test_upload_buffer_is_released_after_streaming(extraction_cache):
+    upload = Upload(b"Employee handbook text", "handbook.txt")
+
+    info, pieces = FileProcessor(cache=extraction_cache).stream_uploaded_file(upload)
+    with pytest.raises(BufferError):
+        upload.write(b"!")  # the processor is reading the upload's buffer in place
+    assert "".join(pieces) == "Employee handbook text"
+
+    upload.seek(0, io.SEEK_END)
+    upload.write(b"!")  # no views remain once extraction finishes
+
+
+@pytest.mark.parametrize("spool_mb", [16, 0])
+def test_upload_buffer_spools_generic_streams(monkeypatch, tmp_path, spool_mb):
+    monkeypatch.setattr(IngestConfig, "SPOOL_MAX_MEMORY_MB", spool_mb)
+    pdf = make_pdf(["Statute text"])
+    path = tmp_path / "statute.pdf"
+    path.write_bytes(pdf)
+
+    with open(path, "rb") as stream, UploadBuffer(stream) as buffer:
+        assert len(buffer) == len(pdf)
+        assert buffer.read(5) == b"%PDF-"
+        assert buffer.seek(-6, io.SEEK_END) == len(pdf) - 6
+        assert buffer.read() == b"%%EOF\n"
+        buffer.seek(0)
+        assert FileProcessor(pdf_workers=1)._process_pdf(buffer)["text"].strip() == "Statute text"
@@ -0,0 +1,81 @@
+from src.models.history import HistoryManager, estimate_tokens, summarize_turns
+
+
+def conversation(turns, answer_words=20):
+    messages = []
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"Question {i} about overtime rules?"})
+        messages.append({"role": "assistant", "content": f"Answer {i}. " + "detail " * answer_words})
+    return messages
+
+
+class CountingSummarizer:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, previous, messages):
+        self.calls.append((previous, len(messages)))
+        return summarize_turns(previous, messages)
+
+
+def test_short_chats_are_sent_verbatim():
+    manager = HistoryManager(max_turns=4, token_budget=10_000)
+    messages = conversation(3)
+
+    turn = manager.build("chat", messages)
+
+    assert turn["summary"] is None
+    assert [c["parts"][0]["text"] for c in turn["history"]] == [m["content"] for m in messages]
+    assert turn["history"][1]["role"] == "model"
+    assert turn["tokens_sent"] == turn["tokens_full"]
+
+
+def test_older_turns_are_summarized_beyond_max_turns():
+    manager = HistoryManager(max_turns=2, token_budget=10_000)
+    messages = conversation(5)
+
+    turn = manager.build("chat", messages)
+
+    assert len(turn["history"]) == 4
+    assert turn["history"][0]["parts"][0]["text"] == "Question 3 about overtime rules?"
+    assert "User asked: Question 0 about overtime rules?" in turn["summary"]
+    assert "Assistant answered: Answer 2." in turn["summary"]
+    assert turn["tokens_sent"] < turn["tokens_full"]
+    assert manager.stats()["tokens_saved"] == turn["tokens_full"] - turn["tokens_sent"]
+
+
+def test_token_budget_shrinks_the_window_and_keeps_it_user_first():
+    messages = conversation(4, answer_words=100)
+    budget = estimate_tokens(messages[-1]["content"]) + estimate_tokens(messages[-2]["content"]) + 10
+
+    turn = HistoryManager(max_turns=10, token_budget=budget).build("chat", messages)
+
+    assert [c["role"] for c in turn["history"]] == ["user", "model"]
+    assert turn["summary"].count("User asked") == 3
+
+
+def test_summary_is_cached_and_only_extended_when_the_window_moves():
+    summarizer = CountingSummarizer()
+    manager = HistoryManager(max_turns=2, token_budget=10_000, summarizer=summarizer)
+    messages = conversation(4)
+
+    first = manager.build("chat", messages)
+    again = manager.build("chat", messages)
+    assert summarizer.calls == [(None, 4)]
+    assert again["summary"] == first["summary"]
+
+    messages += conversation(5)[8:]  # one more turn
+    moved = manager.build("chat", messages)
+    assert summarizer.calls[1] == (first["summary"], 2)
+    assert moved["history"][0]["parts"][0]["text"] == "Question 3 about overtime rules?"
+
+    manager.forget("chat")
+    manager.build("chat", messages)
+    assert summarizer.calls[-1] == (None, 6)
+
+
+def test_summary_respects_its_token_budget():
+    summary = summarize_turns(None, conversation(50), max_tokens=100)
+
+    assert estimate_tokens(summary) <= 100
+    assert "Answer 49." in summary and "Question 0 " not in summary
@@ -0,0 +1,137 @@
+import io
+import threading
+import time
+
+import pytest
+
+from src.utils.cache import PersistentCache
+from src.utils.file_processor import FileProcessor
+from src.utils.ingest import IngestWorker
+from src.utils.retrieval import VectorRetriever
+
+
+class Upload(io.BytesIO):
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+class GatedProcessor:
+    """A file processor whose extraction pauses after the first page until released."""
+    def __init__(self):
+        self.first_page_read = threading.Event()
+        self.release = threading.Event()
+
+    def stream_uploaded_file(self, file):
+        def pages():
+            yield "OSHA requires safety training for all new employees. "
+            self.first_page_read.set()
+            self.release.wait(5)
+            yield "OSHA inspections can happen without notice."
+        return {"name": file.name, "type": "txt", "size": "1 KB"}, pages()
+
+    def result_from_text(self, info, text):
+        return {**info, "status": "success", "text": text}
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out waiting for the ingestion worker"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def retriever(fake_embedder, fake_cache):
+    return VectorRetriever(embedder=fake_embedder, embedding_cache=fake_cache, index_dir=None)
+
+
+def test_worker_indexes_files_in_the_background(retriever, tmp_path):
+    processor = FileProcessor(cache=PersistentCache(str(tmp_path / "extraction"), max_bytes=1 << 20))
+    worker = IngestWorker(processor, retriever)
+
+    jobs = [
+        worker.submit("llc.txt-1", "llc.txt", Upload(b"The LLC filing deadline is March 15 for most states", "llc.txt")),
+        worker.submit("1099.txt-1", "1099.txt", Upload(b"Form 1099 must be filed by January 31 each year", "1099.txt")),
+    ]
+    wait_for(lambda: not worker.busy)
+
+    assert [job.status for job in jobs] == ["done", "done"]
+    assert all(job.file is None and job.chunks == 1 for job in jobs)
+    assert jobs[1].result["text"] == "Form 1099 must be filed by January 31 each year"
+    assert retriever.document_ids == ["llc.txt-1", "1099.txt-1"]
+    assert "ready" in jobs[0].describe()
+
+
+def saved_snapshots(index_dir):
+    return sorted(p for p in index_dir.glob("*") if not p.name.startswith(".")) if index_dir.exists() else []
+
+
+def test_worker_saves_one_snapshot_once_its_queue_is_idle(fake_embedder, fake_cache, tmp_path):
+    retriever = VectorRetriever(embedder=fake_embedder, embedding_cache=fake_cache, index_dir=str(tmp_path / "faiss"))
+    processor = GatedProcessor()
+    worker = IngestWorker(processor, retriever)
+
+    jobs = [worker.submit("osha.txt-1", "osha.txt", Upload(b"", "osha.txt"))]
+    assert processor.first_page_read.wait(5)
+    jobs += [worker.submit(f"osha.txt-{i}", "osha.txt", Upload(b"", "osha.txt")) for i in (2, 3)]
+    processor.release.set()
+    wait_for(lambda: saved_snapshots(tmp_path / "faiss"))
+
+    assert [job.status for job in jobs] == ["done", "done", "done"]
+    snapshots = saved_snapshots(tmp_path / "faiss")
+    assert len(snapshots) == 1
+    loaded = VectorRetriever(embedder=fake_embedder, embedding_cache=fake_cache, index_dir=str(tmp_path / "faiss"))
+    assert loaded.load(snapshots[0].name)
+    assert sorted(loaded.document_ids) == ["osha.txt-1", "osha.txt-2", "osha.txt-3"]
+
+
+def test_cached_upload_reuses_the_index_saved_after_streaming(fake_embedder, fake_cache, tmp_path):
+    processor = FileProcessor(cache=PersistentCache(str(tmp_path / "extraction"), max_bytes=1 << 20))
+    data = b"The LLC filing deadline is March 15 for most states"
+
+    first = VectorRetriever(embedder=fake_embedder, embedding_cache=fake_cache, index_dir=str(tmp_path / "faiss"))
+    job = IngestWorker(processor, first).submit("llc.txt-1", "llc.txt", Upload(data, "llc.txt"))
+    wait_for(lambda: saved_snapshots(tmp_path / "faiss"))
+    assert job.status == "done"
+
+    second = VectorRetriever(embedder=fake_embedder, embedding_cache=fake_cache, index_dir=str(tmp_path / "faiss"))
+    job = IngestWorker(processor, second).submit("llc.txt-1", "llc.txt", Upload(data, "llc.txt"))
+    wait_for(lambda: job.finished)
+
+    assert job.status == "done" and job.chunks == 1
+    assert job.result["text"] == data.decode()
+    assert second._mapped_from is not None  # Loaded from the snapshot, not streamed in
+    assert second.retrieve("LLC filing deadline", threshold=0.0)
+
+
+def test_search_works_while_a_document_is_being_ingested(retriever):
+    retriever.add_document("llc.pdf", ["The LLC filing deadline is March 15 for most states"])
+    processor = GatedProcessor()
+    worker = IngestWorker(processor, retriever)
+
+    job = worker.submit("osha.txt-1", "osha.txt", Upload(b"", "osha.txt"))
+    assert processor.first_page_read.wait(5)
+
+    assert job.status == "running" and job.pages == 1
+    assert retriever.retrieve("LLC filing deadline", threshold=0.0)
+    processor.release.set()
+    wait_for(lambda: job.finished)
+    assert job.status == "done"
+    assert "OSHA inspections" in retriever.store.texts["osha.txt-1"]
+
+
+def test_cancelling_a_running_job_removes_its_document(retriever):
+    processor = GatedProcessor()
+    worker = IngestWorker(processor, retriever)
+
+    job = worker.submit("osha.txt-1", "osha.txt", Upload(b"", "osha.txt"))
+    assert processor.first_page_read.wait(5)
+    assert worker.cancel("osha.txt-1")
+    processor.release.set()
+    wait_for(lambda: job.finished)
+
+    assert job.status == "cancelled"
+    assert worker.job("osha.txt-1") is None
+    assert not retriever.has_document("osha.txt-1")
+    assert not worker.busy
@@ -0,0 +1,187 @@
+import os
+
+import pytest
+
+# The config module configures the SDK on import, which needs a (syntactically valid) key.
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+pytest.importorskip("google.generativeai")
+
+from src.models.llm import GeminiClient  # noqa: E402
+from src.models.response_cache import ResponseCache  # noqa: E402
+from src.utils.scheduler import RequestScheduler  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def unlimited_scheduler(monkeypatch):
+    """Keeps tests clear of the shared scheduler's real API quota."""
+    scheduler = RequestScheduler(requests_per_minute=10**6, tokens_per_minute=10**9, sleep=lambda s: None)
+    monkeypatch.setattr("src.models.llm.gemini_scheduler", scheduler)
+    return scheduler
+
+
+def test_generate_stream_yields_deltas_that_add_up_to_the_reply(fake_model):
+    client = GeminiClient(model=fake_model)
+
+    deltas = list(client.generate_stream("When is Form 1099 due?", history=[], context={}))
+
+    assert len(deltas) > 1
+    assert "".join(deltas) == fake_model.reply
+    assert "User Query: When is Form 1099 due?" in fake_model.prompts[0]
+
+
+def test_generate_stream_records_time_to_first_token(fake_model):
+    fake_model.delay = 0.02
+    client = GeminiClient(model=fake_model)
+
+    stream = client.generate_stream("When is Form 1099 due?", history=[])
+    next(stream)
+    list(stream)
+
+    metrics = client.last_stream_metrics
+    assert 0.02 <= metrics["time_to_first_token_s"] < metrics["total_s"]
+
+
+def test_generate_stream_reports_errors_as_text(fake_model):
+    fake_model.error = RuntimeError("quota exceeded")
+    client = GeminiClient(model=fake_model)
+
+    deltas = list(client.generate_stream("hi", history=[]))
+
+    assert deltas == ["⚠️ Error: Generation failed: quota exceeded"]
+
+
+def test_generate_and_generate_stream_agree(fake_model):
+    client = GeminiClient(model=fake_model)
+    history = [{"role": "user", "parts": [{"text": "hello"}]}]
+
+    assert client.generate("Deadline?", history, {}) == "".join(client.generate_stream("Deadline?", history, {}))
+    assert fake_model.sessions[0].history[:1] == history
+
+
+def chat_turn(client, messages, prompt, context=None, chat_id="chat-1", stream=True):
+    """Runs one turn the way app.py does and records it in `messages`."""
+    history = [{"role": "model" if m["role"] == "assistant" else "user", "parts": [{"text": m["content"]}]} for m in messages]
+    if stream:
+        reply = "".join(client.generate_stream(prompt, history, context or {}, chat_id=chat_id))
+    else:
+        reply = client.generate(prompt, history, context or {}, chat_id=chat_id)
+    messages += [{"role": "user", "content": prompt}, {"role": "assistant", "content": reply}]
+    return reply
+
+
+def test_chat_session_is_reused_across_turns(fake_model):
+    client = GeminiClient(model=fake_model)
+    messages = []
+
+    chat_turn(client, messages, "When is Form 1099 due?", {"retrieved_context": "IRS guidance text"})
+    chat_turn(client, messages, "And Form W-2?", stream=False)
+    chat_turn(client, messages, "Any penalties?")
+
+    assert len(fake_model.sessions) == 1
+    session_history = fake_model.sessions[0].history
+    assert [h["parts"][0]["text"] for h in session_history] == [m["content"] for m in messages]
+    # Retrieved context was sent with its turn only, not kept in the session.
+    assert "IRS guidance text" in fake_model.prompts[0]
+    assert all("IRS guidance text" not in h["parts"][0]["text"] for h in session_history)
+
+
+def test_session_is_trimmed_when_the_history_window_moves(fake_model):
+    client = GeminiClient(model=fake_model)
+    messages = []
+    for i in range(3):
+        chat_turn(client, messages, f"Question {i}")
+
+    history = [{"role": "model" if m["role"] == "assistant" else "user", "parts": [{"text": m["content"]}]} for m in messages[2:]]
+    list(client.generate_stream("Question 3", history, {}, chat_id="chat-1"))
+
+    assert len(fake_model.sessions) == 1
+    assert fake_model.sessions[0].history[0]["parts"][0]["text"] == "Question 1"
+
+
+def test_persona_or_mode_change_and_edited_history_start_new_sessions(fake_model):
+    client = GeminiClient(model=fake_model)
+    messages = []
+
+    chat_turn(client, messages, "Hi", {"mode_instruction": "Answer as a tax advisor."})
+    chat_turn(client, messages, "Hi again", {"mode_instruction": "Answer as an HR advisor."})
+    assert len(fake_model.sessions) == 2
+
+    messages[-1]["content"] = "edited reply"
+    chat_turn(client, messages, "Third", {"mode_instruction": "Answer as an HR advisor."})
+    assert len(fake_model.sessions) == 3
+
+
+def test_session_pool_is_bounded_and_drops_failed_sessions(fake_model, monkeypatch):
+    client = GeminiClient(model=fake_model)
+    client.sessions.max_size = 2
+    for chat_id in ("a", "b", "c"):
+        chat_turn(client, [], "Hi", chat_id=chat_id)
+    assert "a" not in client.sessions and "c" in client.sessions
+
+    fake_model.error = RuntimeError("quota exceeded")
+    chat_turn(client, [], "Hi", chat_id="c")
+    assert "c" not in client.sessions
+
+
+def test_response_cache_answers_repeated_questions_without_the_model(fake_model):
+    client = GeminiClient(model=fake_model, response_cache=ResponseCache())
+    messages = []
+    context = {"retrieved_context": "IRS guidance text", "corpus_version": 1}
+
+    first = chat_turn(client, messages, "When is Form 1099 due?", context)
+    second = client.generate("When is Form 1099 due?", [], context)
+    third = "".join(client.generate_stream("When is Form 1099 due?", [], context, chat_id="chat-2"))
+
+    assert first == second == third == fake_model.reply
+    assert len(fake_model.prompts) == 1
+    assert client.last_stream_metrics["cached"] is True
+    assert client.response_cache.stats()["exact_hits"] == 2
+    # The cached turn is recorded in chat-2's session, so its next turn reuses it.
+    chat_turn(client, [{"role": "user", "content": "When is Form 1099 due?"},
+                       {"role": "assistant", "content": third}], "And W-2?", chat_id="chat-2")
+    assert len(fake_model.sessions) == 2
+
+
+def test_only_interactive_chat_turns_use_the_semantic_cache(fake_model):
+    from src.utils.scheduler import BULK
+
+    class SameVectorEmbedder:
+        def embed(self, texts):
+            return [[1.0, 0.0]]
+
+    client = GeminiClient(model=fake_model, response_cache=ResponseCache(embedder=SameVectorEmbedder()))
+    json_config = {"generation_config": {"response_mime_type": "application/json"}}
+
+    client.generate("Compare handbook.pdf and policy.docx", [], json_config, priority=BULK)
+    client.generate("Compare handbook.pdf and contract.pdf", [], json_config, priority=BULK)
+    client.generate("Compare memo.txt and policy.docx", [], priority=BULK)
+    client.generate("Compare memo.txt and contract.pdf", [], priority=BULK)
+    assert len(fake_model.prompts) == 4
+
+    client.generate("What is the LLC filing date?", [])
+    client.generate("When do I file for my LLC?", [])
+    assert len(fake_model.prompts) == 5
+    assert client.response_cache.stats()["semantic_hits"] == 1
+
+
+def test_errors_are_not_cached(fake_model):
+    client = GeminiClient(model=fake_model, response_cache=ResponseCache())
+    fake_model.error = RuntimeError("quota exceeded")
+    client.generate("hi", [])
+    fake_model.error = None
+
+    assert client.generate("hi", []) == fake_model.reply
+    assert len(client.response_cache) == 1
+
+
+def test_transient_api_errors_are_retried(fake_model, unlimited_scheduler):
+    class QuotaError(Exception):
+        code = 429
+
+    client = GeminiClient(model=fake_model)
+    fake_model.failures = [QuotaError("quota exceeded")]
+    assert client.generate("hi", []) == fake_model.reply
+
+    fake_model.failures = [QuotaError("quota exceeded")]
+    assert "".join(client.generate_stream("hi", [], chat_id="chat-1")) == fake_model.reply
+    assert unlimited_scheduler.stats()["retries"] == 2
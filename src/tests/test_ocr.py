@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from src.config.ingest import IngestConfig
+from src.utils import ocr
+from src.utils.ocr import OCREngine
+
+
+def text_lines_page(width=600, height=800, line_gap=40):
+    """A white page with black horizontal bars standing in for lines of text."""
+    page = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    for top in range(40, height - 40, line_gap):
+        draw.rectangle((40, top, width - 40, top + 12), fill=0)
+    return page
+
+
+@pytest.fixture
+def fake_tesseract(monkeypatch):
+    calls = []
+
+    def image_to_string(tile, lang="eng", config=""):
+        calls.append(tile.size)
+        return f"tile {len(calls)}\n\f"
+
+    monkeypatch.setattr(ocr.pytesseract, "image_to_string", image_to_string)
+    return calls
+
+
+def test_preprocess_converts_to_grayscale_and_downscales_by_dpi(monkeypatch):
+    monkeypatch.setattr(IngestConfig, "OCR_DESKEW", False)
+    image = Image.new("RGB", (1200, 600), "white")
+    image.info["dpi"] = (600, 600)
+
+    processed = OCREngine(max_workers=1).preprocess(image)
+
+    assert processed.mode == "L"
+    assert processed.size == (600, 300)
+
+
+def test_preprocess_caps_images_without_dpi(monkeypatch):
+    monkeypatch.setattr(IngestConfig, "OCR_DESKEW", False)
+    monkeypatch.setattr(IngestConfig, "OCR_MAX_SIDE", 500)
+
+    processed = OCREngine(max_workers=1).preprocess(Image.new("L", (1000, 400), 255))
+
+    assert processed.size == (500, 200)
+
+
+def test_estimate_skew_recovers_rotation():
+    engine = OCREngine(max_workers=1)
+    page = text_lines_page()
+    assert engine.estimate_skew(page) == 0.0
+
+    skewed = page.rotate(-3, resample=Image.BICUBIC, expand=True, fillcolor=255)
+    assert engine.estimate_skew(skewed) == pytest.approx(3.0, abs=0.5)
+
+
+def test_tiles_cut_between_text_lines(monkeypatch):
+    monkeypatch.setattr(IngestConfig, "OCR_TILE_HEIGHT", 200)
+    page = text_lines_page(height=1000)
+
+    tiles = OCREngine(max_workers=1).tiles(page)
+
+    assert len(tiles) > 1
+    assert sum(tile.height for tile in tiles) == page.height
+    for tile in tiles[1:]:
+        # Each cut lands on a blank row, so no bar is split across tiles.
+        assert (np.asarray(tile)[0] == 255).all()
+
+
+def test_recognize_joins_tiles_in_reading_order(monkeypatch, fake_tesseract):
+    monkeypatch.setattr(IngestConfig, "OCR_TILE_HEIGHT", 200)
+    monkeypatch.setattr(IngestConfig, "OCR_DESKEW", False)
+
+    text = OCREngine(max_workers=4).recognize([text_lines_page(height=1000), text_lines_page(height=100)])
+
+    tile_count = len(fake_tesseract)
+    assert tile_count > 2
+    assert sorted(text.split("\n")) == sorted(f"tile {i}" for i in range(1, tile_count + 1))
+    assert "\f" not in text
@@ -0,0 +1,142 @@
+import io
+import zipfile
+
+import docx
+
+from src.utils.cache import PersistentCache
+from src.utils.file_processor import FileProcessor
+from src.utils.ooxml import iter_docx_text, iter_pptx_slides
+
+W_NS = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+MC_NS = 'xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006"'
+A_NS = 'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main"'
+P_NS = 'xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main"'
+R_NS = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+RELS_NS = 'xmlns="http://schemas.openxmlformats.org/package/2006/relationships"'
+NOTES_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/notesSlide"
+SLIDE_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/slide"
+
+
+def make_zip(parts):
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w") as archive:
+        for name, xml in parts.items():
+            archive.writestr(name, xml)
+    return out.getvalue()
+
+
+def w_p(*runs):
+    return "<w:p>" + "".join(f"<w:r>{run}</w:r>" for run in runs) + "</w:p>"
+
+
+def w_row(*cells):
+    return "<w:tr>" + "".join(f"<w:tc>{cell}</w:tc>" for cell in cells) + "</w:tr>"
+
+
+def make_docx():
+    body = "".join([
+        '<w:p><w:pPr><w:tabs><w:tab w:val="left" w:pos="720"/></w:tabs></w:pPr>'
+        '<w:r><w:t>Section 1.</w:t></w:r><w:r><w:tab/><w:t>Scope</w:t></w:r></w:p>',
+        "<w:p/>",
+        "<w:tbl>" + w_row(w_p("<w:t>Leave type</w:t>"), w_p("<w:t>Days</w:t>"))
+        + w_row(w_p("<w:t>Vacation</w:t>"), w_p("<w:t>15</w:t>") + w_p("<w:t>(prorated)</w:t>"))
+        + w_row(w_p("<w:t>Sick</w:t>"), "<w:tbl>" + w_row(w_p("<w:t>5 paid</w:t>"), w_p("<w:t>5 unpaid</w:t>")) + "</w:tbl>")
+        + "</w:tbl>",
+        "<w:p><w:r><mc:AlternateContent><mc:Choice><w:txbxContent>" + w_p("<w:t>Boxed note</w:t>")
+        + "</w:txbxContent></mc:Choice><mc:Fallback><w:txbxContent>" + w_p("<w:t>Boxed note</w:t>")
+        + "</w:txbxContent></mc:Fallback></mc:AlternateContent></w:r></w:p>",
+        w_p("<w:t>Line one</w:t><w:br/><w:t>line two</w:t>", "<w:delText>deleted</w:delText>"),
+    ])
+    footnotes = (
+        '<w:footnote w:type="separator" w:id="-1"><w:p><w:r><w:separator/></w:r></w:p></w:footnote>'
+        '<w:footnote w:id="1">' + w_p("<w:t>See 29 U.S.C. 2612.</w:t>") + "</w:footnote>"
+    )
+    return make_zip({
+        "[Content_Types].xml": "<Types/>",
+        "word/document.xml": f"<w:document {W_NS} {MC_NS}><w:body>{body}</w:body></w:document>",
+        "word/footnotes.xml": f"<w:footnotes {W_NS}>{footnotes}</w:footnotes>",
+        "word/header1.xml": f"<w:hdr {W_NS}>{w_p('<w:t>Confidential</w:t>')}</w:hdr>",
+        "word/header2.xml": f"<w:hdr {W_NS}>{w_p('<w:t>Confidential</w:t>')}</w:hdr>",
+        "word/footer1.xml": f"<w:ftr {W_NS}>{w_p('<w:t>HR Policy v2</w:t>')}</w:ftr>",
+    })
+
+
+def a_sp(*paragraphs):
+    body = "".join(f"<a:p>{p}</a:p>" for p in paragraphs)
+    return f"<p:sp><p:txBody>{body}</p:txBody></p:sp>"
+
+
+def make_pptx():
+    def slide(*shapes):
+        return f"<p:sld {P_NS} {A_NS}><p:cSld><p:spTree>{''.join(shapes)}</p:spTree></p:cSld></p:sld>"
+
+    def rels(*relationships):
+        inner = "".join(f'<Relationship Id="{i}" Type="{t}" Target="{target}"/>' for i, t, target in relationships)
+        return f"<Relationships {RELS_NS}>{inner}</Relationships>"
+
+    notes = (
+        f"<p:notes {P_NS} {A_NS}><p:cSld><p:spTree>"
+        + a_sp("<a:r><a:t>Mention the new overtime rule.</a:t></a:r>")
+        + a_sp('<a:fld type="slidenum"><a:t>2</a:t></a:fld>')
+        + "</p:spTree></p:cSld></p:notes>"
+    )
+    # Slide files are numbered in creation order; the presentation shows slide2 first.
+    return make_zip({
+        "[Content_Types].xml": "<Types/>",
+        "ppt/presentation.xml": f'<p:presentation {P_NS} {R_NS}><p:sldIdLst>'
+                                '<p:sldId id="256" r:id="rId3"/><p:sldId id="257" r:id="rId2"/></p:sldIdLst></p:presentation>',
+        "ppt/_rels/presentation.xml.rels": rels(("rId2", SLIDE_REL, "slides/slide1.xml"), ("rId3", SLIDE_REL, "slides/slide2.xml")),
+        "ppt/slides/slide1.xml": slide(a_sp("<a:r><a:t>Overtime</a:t></a:r>", "<a:r><a:t>1.5x after 40 hours</a:t></a:r><a:br/><a:r><a:t>2x on holidays</a:t></a:r>")),
+        "ppt/slides/_rels/slide1.xml.rels": rels(("rId1", NOTES_REL, "../notesSlides/notesSlide1.xml")),
+        "ppt/notesSlides/notesSlide1.xml": notes,
+        "ppt/slides/slide2.xml": slide(a_sp("<a:r><a:t>Agenda</a:t></a:r>", "")),
+    })
+
+
+def test_docx_extracts_body_tables_notes_and_headers():
+    blocks = list(iter_docx_text(io.BytesIO(make_docx())))
+
+    assert blocks == [
+        "Section 1.\tScope",
+        "",
+        "Leave type | Days",
+        "Vacation | 15 (prorated)",
+        "Sick | 5 paid | 5 unpaid",
+        "Boxed note",
+        "",
+        "Line one\nline two",
+        "See 29 U.S.C. 2612.",
+        "Confidential",
+        "HR Policy v2",
+    ]
+
+
+def test_docx_body_matches_python_docx_paragraphs():
+    document = docx.Document()
+    for i in range(20):
+        document.add_paragraph(f"Policy {i}: employees must file form {i}.")
+    document.add_paragraph("")
+    buffer = io.BytesIO()
+    document.save(buffer)
+
+    assert list(iter_docx_text(io.BytesIO(buffer.getvalue()))) == [p.text for p in document.paragraphs]
+
+
+def test_pptx_slides_follow_presentation_order_with_notes():
+    assert list(iter_pptx_slides(io.BytesIO(make_pptx()))) == [
+        "Slide 1:\nAgenda",
+        "Slide 2:\nOvertime\n1.5x after 40 hours\n2x on holidays\nNotes:\nMention the new overtime rule.",
+    ]
+
+
+def test_pptx_upload_is_streamed_slide_by_slide(tmp_path):
+    processor = FileProcessor(cache=PersistentCache(str(tmp_path), max_bytes=1 << 20))
+    upload = io.BytesIO(make_pptx())
+    upload.name = "training.pptx"
+
+    info, pieces = processor.stream_uploaded_file(upload)
+    text = "".join(pieces)
+
+    assert info["type"] == "pptx"
+    assert [text[start:end] for start, end in info["page_map"]] == list(iter_pptx_slides(io.BytesIO(make_pptx())))
+    assert processor.process_uploaded_file(upload)["text"] == text
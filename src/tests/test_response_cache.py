@@ -0,0 +1,92 @@
+import numpy as np
+
+from src.models.response_cache import ResponseCache
+
+CONFIG = {"temperature": 0.5}
+
+
+class FakeEmbedder:
+    """Embeds texts to fixed unit vectors, so tests control similarities exactly."""
+    def __init__(self, vectors):
+        self.vectors = {text: np.asarray(v, dtype=np.float32) / np.linalg.norm(v) for text, v in vectors.items()}
+        self.calls = 0
+
+    def embed(self, texts):
+        self.calls += 1
+        texts = [texts] if isinstance(texts, str) else texts
+        return np.stack([self.vectors[t] for t in texts])
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def lookup(cache, prompt, history=(), **context):
+    request = cache.request(prompt, list(history), context, CONFIG)
+    return request, cache.get(request)
+
+
+def test_exact_tier_matches_normalized_prompt_and_identical_context():
+    cache = ResponseCache()
+    request, entry = lookup(cache, "When is the 1099 deadline?", retrieved_context="IRS guide")
+    assert entry is None
+    cache.put(request, "January 31.", seconds=2.5)
+
+    assert lookup(cache, "  when is the 1099   DEADLINE? ", retrieved_context="IRS guide")[1].text == "January 31."
+    assert lookup(cache, "When is the 1099 deadline?", retrieved_context="Other guide")[1] is None
+    assert lookup(cache, "When is the 1099 deadline?", retrieved_context="IRS guide",
+                  response_mode_instruction="Be brief.")[1] is None
+
+    stats = cache.stats()
+    assert (stats["exact_hits"], stats["misses"]) == (1, 3)
+    assert stats["hit_rate"] == 0.25
+    assert stats["saved_seconds"] == 2.5
+
+
+def test_entries_expire_after_ttl_and_lru_is_bounded():
+    clock = Clock()
+    cache = ResponseCache(max_size=2, ttl=60, clock=clock)
+    for prompt in ("a", "b"):
+        cache.put(lookup(cache, prompt)[0], prompt.upper(), seconds=1)
+
+    clock.now = 30
+    assert lookup(cache, "a")[1].text == "A"
+    cache.put(lookup(cache, "c")[0], "C", seconds=1)  # evicts "b", the least recently used
+    assert lookup(cache, "b")[1] is None
+
+    clock.now = 61
+    assert lookup(cache, "a")[1] is None
+    assert lookup(cache, "c")[1].text == "C"
+
+
+def test_semantic_tier_reuses_answers_to_close_standalone_questions():
+    embedder = FakeEmbedder({
+        "What's the LLC filing date?": [1.0, 0.0, 0.0],
+        "When do I file for my LLC?": [0.99, 0.1, 0.0],
+        "How do I dissolve an LLC?": [0.6, 0.8, 0.0],
+    })
+    cache = ResponseCache(embedder=embedder, similarity_threshold=0.95)
+    request, _ = lookup(cache, "What's the LLC filing date?", retrieved_context="doc A", corpus_version=3)
+    cache.put(request, "March 15.", seconds=3.0)
+
+    entry = lookup(cache, "When do I file for my LLC?", retrieved_context="doc B", corpus_version=3)[1]
+    assert entry.text == "March 15."
+    assert lookup(cache, "How do I dissolve an LLC?", corpus_version=3)[1] is None
+    # Other documents, or a follow-up that depends on earlier turns, never reuse the answer.
+    assert lookup(cache, "When do I file for my LLC?", corpus_version=4)[1] is None
+    history = [{"role": "user", "parts": [{"text": "I run a partnership."}]}]
+    assert lookup(cache, "When do I file for my LLC?", history, corpus_version=3)[1] is None
+
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_semantic_tier_never_matches_different_form_numbers():
+    embedder = FakeEmbedder({"When is Form 1099 due?": [1.0, 0.0], "When is Form 1040 due?": [1.0, 0.01]})
+    cache = ResponseCache(embedder=embedder, similarity_threshold=0.9)
+    cache.put(lookup(cache, "When is Form 1099 due?")[0], "January 31.", seconds=1)
+
+    assert lookup(cache, "When is Form 1040 due?")[1] is None
@@ -0,0 +1,147 @@
+import threading
+import time
+
+import pytest
+
+from src.utils.scheduler import BULK, INTERACTIVE, RequestScheduler, TokenBucket, is_retryable
+
+
+class QuotaError(Exception):
+    code = 429
+
+
+class FakeBackend:
+    """A local API stand-in that fails its first calls and tracks peak concurrency."""
+    def __init__(self, failures=(), delay=0.0):
+        self.failures = list(failures)
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, name="request"):
+        with self._lock:
+            self.calls.append(name)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            if self.failures:
+                raise self.failures.pop(0)
+            return f"{name} done"
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def unlimited(**kwargs):
+    options = dict(requests_per_minute=10**6, tokens_per_minute=10**9, max_concurrency=4, sleep=lambda s: None)
+    options.update(kwargs)
+    return RequestScheduler(**options)
+
+
+def test_retryable_errors():
+    assert is_retryable(QuotaError()) and is_retryable(TimeoutError()) and is_retryable(ConnectionResetError())
+    assert not is_retryable(ValueError("bad request"))
+
+
+def test_token_bucket_refills_over_time():
+    now = [0.0]
+    bucket = TokenBucket(per_minute=60, clock=lambda: now[0])
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    now[0] = 0.5
+    assert bucket.wait_time(1) == pytest.approx(0.5)
+    assert bucket.wait_time(1000) == pytest.approx(59.5)  # capped at the capacity
+    now[0] = 120
+    assert bucket.wait_time(60) == 0.0
+
+
+def test_transient_errors_are_retried_with_growing_jittered_backoff():
+    delays = []
+    scheduler = unlimited(base_delay=1.0, max_delay=3.0, sleep=delays.append)
+    backend = FakeBackend(failures=[QuotaError(), QuotaError(), QuotaError()])
+
+    assert scheduler.call(backend) == "request done"
+    assert len(backend.calls) == 4
+    assert 0 <= delays[0] <= 1.0 and 0 <= delays[1] <= 2.0 and 0 <= delays[2] <= 3.0
+    assert scheduler.stats()["retries"] == 3
+
+
+def test_permanent_errors_and_exhausted_retries_are_raised():
+    scheduler = unlimited(max_retries=2)
+    with pytest.raises(ValueError):
+        scheduler.call(FakeBackend(failures=[ValueError("bad request")]))
+    backend = FakeBackend(failures=[QuotaError()] * 5)
+    with pytest.raises(QuotaError):
+        scheduler.call(backend)
+    assert len(backend.calls) == 3
+    assert scheduler.stats()["failures"] == 2
+
+
+def test_concurrency_is_bounded():
+    scheduler = unlimited(max_concurrency=2)
+    backend = FakeBackend(delay=0.05)
+    threads = [threading.Thread(target=scheduler.call, args=(backend,)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert backend.peak == 2
+    assert len(backend.calls) == 6
+
+
+def test_token_quota_delays_requests():
+    scheduler = unlimited(tokens_per_minute=600)  # refills 10 tokens per second
+    backend = FakeBackend()
+    scheduler.call(backend, tokens=600)
+
+    start = time.perf_counter()
+    scheduler.call(backend, tokens=2)
+    assert time.perf_counter() - start >= 0.15
+
+
+def test_interactive_requests_go_ahead_of_queued_bulk_work():
+    scheduler = unlimited(max_concurrency=1)
+    release = threading.Event()
+    backend = FakeBackend()
+    blocker = threading.Thread(target=scheduler.call, args=(release.wait,))
+    blocker.start()
+    time.sleep(0.02)
+
+    threads = []
+    for name, priority in (("bulk-1", BULK), ("bulk-2", BULK), ("chat", INTERACTIVE)):
+        threads.append(threading.Thread(target=scheduler.call, args=(lambda n=name: backend(n), priority)))
+        threads[-1].start()
+        time.sleep(0.02)
+    release.set()
+    for thread in [blocker] + threads:
+        thread.join()
+
+    assert backend.calls == ["chat", "bulk-1", "bulk-2"]
+
+
+def test_streams_are_retried_only_before_their_first_item():
+    scheduler = unlimited()
+    attempts = []
+
+    def open_stream(fail_after):
+        attempts.append(fail_after)
+        if len(attempts) == 1:
+            raise QuotaError()
+        yield "a"
+        if fail_after:
+            raise QuotaError()
+        yield "b"
+
+    assert list(scheduler.stream(lambda: open_stream(False))) == ["a", "b"]
+    assert len(attempts) == 2
+
+    stream = scheduler.stream(lambda: open_stream(True))
+    assert next(stream) == "a"
+    with pytest.raises(QuotaError):
+        next(stream)
+    assert len(attempts) == 3
+    assert scheduler.stats()["in_flight"] == 0
@@ -0,0 +1,329 @@
+import pytest
+from src.utils.retrieval import VectorRetriever, is_citation_query
+
+@pytest.fixture
+def retriever(fake_embedder, fake_cache):
+    retriever = VectorRetriever(embedder=fake_embedder, embedding_cache=fake_cache)
+    retriever.add_document("llc.pdf", ["The LLC filing deadline is March 15 for most states"])
+    retriever.add_document("osha.pdf", [
+        "OSHA requires safety training for all new employees",
+        "OSHA inspections can happen without notice",
+    ])
+    return retriever
+
+def test_add_document_only_embeds_new_chunks(retriever, fake_embedder):
+    calls_before = len(fake_embedder.model.calls)
+    retriever.add_document("1099.pdf", ["Form 1099 must be filed by January 31 each year"])
+    assert fake_embedder.model.calls[calls_before:] == [["Form 1099 must be filed by January 31 each year"]]
+    assert retriever.index.ntotal == 4
+    assert retriever.document_ids == ["llc.pdf", "osha.pdf", "1099.pdf"]
+
+def test_remove_document_keeps_other_documents(retriever, fake_embedder):
+    calls_before = len(fake_embedder.model.calls)
+    assert retriever.remove_document("osha.pdf")
+    assert not retriever.remove_document("osha.pdf")
+    assert retriever.index.ntotal == 1
+    assert retriever.documents == ["The LLC filing deadline is March 15 for most states"]
+    assert len(fake_embedder.model.calls) == calls_before
+    results = retriever.retrieve("OSHA safety training", threshold=0.0)
+    assert all("OSHA" not in text for text, _ in results)
+
+def test_re_adding_document_replaces_it(retriever):
+    retriever.add_document("llc.pdf", ["LLC annual report is due April 1"])
+    assert retriever.index.ntotal == 3
+    assert "LLC annual report is due April 1" in retriever.documents
+    assert "The LLC filing deadline is March 15 for most states" not in retriever.documents
+
+def test_retrieve_after_incremental_adds(retriever):
+    results = retriever.retrieve("When is the LLC filing deadline", threshold=0.0)
+    assert "March 15" in results[0][0]
+
+@pytest.mark.parametrize("kind", ["flat", "hnsw", "ivf"])
+def test_backends_return_cosine_scores(fake_embedder, fake_cache, kind):
+    retriever = VectorRetriever(embedder=fake_embedder, embedding_cache=fake_cache, index_kind=kind)
+    retriever.add_document("a.pdf", [f"clause {i} about topic {i % 7}" for i in range(100)])
+    retriever.add_document("b.pdf", ["Form 1099 must be filed by January 31 each year"])
+    assert retriever.active_kind == kind
+    text, score = retriever.retrieve("Form 1099 must be filed by January 31 each year", k=1)[0]
+    assert "Form 1099" in text
+    assert score == pytest.approx(1.0, abs=1e-4)
+
+def test_hnsw_removal_skips_and_compacts(fake_embedder, fake_cache):
+    retriever = VectorRetriever(embedder=fake_embedder, embedding_cache=fake_cache, index_kind="hnsw")
+    retriever.add_document("keep.pdf", [f"keep clause {i}" for i in range(10)])
+    retriever.add_document("drop.pdf", ["drop clause one"])
+    retriever.remove_document("drop.pdf")
+    assert all("drop" not in text for text, _ in retriever.retrieve("drop clause one", k=3, threshold=-1))
+    retriever.remove_document("keep.pdf")
+    assert retriever.index is None
+
+def test_auto_kind_switches_with_corpus_size(fake_embedder, fake_cache, monkeypatch):
+    from src.config.retrieval import RetrievalConfig
+    monkeypatch.setattr(RetrievalConfig, "FLAT_MAX_VECTORS", 5)
+    retriever = VectorRetriever(embedder=fake_embedder, embedding_cache=fake_cache)
+    retriever.add_document("small.pdf", ["one", "two"])
+    assert retriever.active_kind == "flat"
+    calls_before = len(fake_embedder.model.calls)
+    retriever.add_document("big.pdf", [f"chunk {i}" for i in range(10)])
+    assert retriever.active_kind == "hnsw"
+    assert retriever.index.ntotal == 12
+    # Switching backends re-reads cached vectors rather than re-encoding.
+    assert fake_embedder.model.calls[calls_before:] == [[f"chunk {i}" for i in range(10)]]
+
+def test_saved_index_is_reloaded_without_embedding(fake_embedder, fake_cache, tmp_path):
+    documents = {"llc.pdf": ["The LLC filing deadline is March 15"], "osha.pdf": ["OSHA requires safety training"]}
+    first = VectorRetriever(embedder=fake_embedder, embedding_cache=fake_cache, index_dir=str(tmp_path / "faiss"))
+    first.add_documents(documents)
+    assert len(list((tmp_path / "faiss").iterdir())) == 1
+
+    calls_before, hits_before = len(fake_embedder.model.calls), fake_cache.hits
+    second = VectorRetriever(embedder=fake_embedder, embedding_cache=fake_cache, index_dir=str(tmp_path / "faiss"))
+    second.add_documents(dict(reversed(documents.items())))
+    assert len(fake_embedder.model.calls) == calls_before
+    assert fake_cache.hits == hits_before  # Vectors came from the saved index, not the embedding store
+    assert second.document_ids == ["llc.pdf", "osha.pdf"]
+    assert "March 15" in second.retrieve("LLC filing deadline", threshold=0.0)[0][0]
+
+    # A loaded index can still be modified.
+    second.remove_document("llc.pdf")
+    second.add_document("1099.pdf", ["Form 1099 is due January 31"])
+    assert second.index.ntotal == 2
+
+def test_retrieve_many_matches_retrieve_in_one_batch(retriever, fake_embedder):
+    queries = ["LLC filing deadline", "OSHA safety training", "nothing relevant here"]
+    calls_before = len(fake_embedder.model.calls)
+    batched = retriever.retrieve_many(queries, k=2, threshold=0.2)
+    assert fake_embedder.model.calls[calls_before:] == [[q.lower() for q in queries]]
+    assert batched == [retriever.retrieve(q, k=2, threshold=0.2) for q in queries]
+    assert retriever.retrieve_many([]) == []
+
+def test_query_vectors_and_results_are_cached(retriever, fake_embedder):
+    calls_before = len(fake_embedder.model.calls)
+    first = retriever.retrieve("LLC filing deadline", threshold=0.0)
+    assert retriever.retrieve("  llc   FILING deadline ", threshold=0.0) == first
+    assert len(fake_embedder.model.calls) == calls_before + 1
+    assert retriever.cache_stats()["results"]["hits"] == 1
+
+    # A different k misses the results cache but reuses the query vector.
+    retriever.retrieve("LLC filing deadline", k=1, threshold=0.0)
+    assert len(fake_embedder.model.calls) == calls_before + 1
+    assert retriever.cache_stats()["query_vectors"]["hits"] >= 1
+
+def test_result_cache_invalidated_when_index_changes(retriever):
+    before = retriever.retrieve("Form 1099 deadline", threshold=0.0)
+    retriever.add_document("1099.pdf", ["Form 1099 deadline is January 31"])
+    after = retriever.retrieve("Form 1099 deadline", threshold=0.0)
+    assert after != before
+    assert "January 31" in after[0][0]
+
+def test_citation_query_answered_lexically_without_embedding(retriever, fake_embedder):
+    retriever.add_document("1099.pdf", ["Form 1099 must be filed by January 31 each year"])
+    calls_before = len(fake_embedder.model.calls)
+    results = retriever.retrieve("Form 1099", threshold=0.9)
+    assert len(fake_embedder.model.calls) == calls_before
+    assert "January 31" in results[0][0]
+    assert results[0][1] == pytest.approx(1.0)
+
+def test_all_caps_query_is_not_mistaken_for_citations():
+    assert is_citation_query("OSHA and IRS")
+    assert is_citation_query("OSHA")
+    assert not is_citation_query("WHAT DOES OSHA REQUIRE FOR NEW EMPLOYEES")
+
+def test_hybrid_surfaces_exact_tokens_below_vector_threshold(retriever):
+    retriever.add_document("1099.pdf", ["Form 1099 must be filed by January 31 each year"])
+    query = "which paperwork is due about 1099 contractors"
+    assert all("1099" not in text for text, _ in retriever.retrieve(query, threshold=0.9, mode="vector"))
+    assert "1099" in retriever.retrieve(query, threshold=0.9)[0][0]
+
+def test_hybrid_drops_bm25_matches_on_a_common_word_alone(retriever):
+    retriever.add_document("handbook.pdf", [
+        "Employees get paid leave",
+        "Employees must log overtime hours",
+        "Employees receive a parking permit",
+    ])
+    texts = [text for text, _ in retriever.retrieve("overtime employees", threshold=0.99)]
+    assert len(texts) == 1 and "log overtime hours" in texts[0]
+
+def test_lexical_index_tracks_removals_and_loads(retriever, fake_embedder, fake_cache, tmp_path):
+    retriever.remove_document("osha.pdf")
+    assert retriever.retrieve("OSHA", threshold=0.9) == []
+
+    saving = VectorRetriever(embedder=fake_embedder, embedding_cache=fake_cache, index_dir=str(tmp_path / "faiss"))
+    saving.add_documents({"osha.pdf": ["OSHA requires safety training"]})
+    loaded = VectorRetriever(embedder=fake_embedder, embedding_cache=fake_cache, index_dir=str(tmp_path / "faiss"))
+    loaded.add_documents({"osha.pdf": ["OSHA requires safety training"]})
+    assert "OSHA" in loaded.retrieve("OSHA", threshold=0.9)[0][0]
+
+def test_chunk_store_keeps_text_once_and_slices_lazily():
+    from src.utils.chunk_store import ChunkStore
+    store = ChunkStore()
+    text = "Employees must complete OSHA training. Records are kept for five years."
+    ids = store.add("handbook", text, [(0, 38), (39, len(text))], {"name": "handbook.pdf"})
+    assert store.text(ids[1]) == "Records are kept for five years."
+    assert store.labelled(ids[0]) == "From document 'handbook.pdf':\nEmployees must complete OSHA training."
+    store.add("other", "x", [(0, 1)])
+    store.remove("handbook")
+    assert len(store) == 1 and ids[0] not in store and store.ids().tolist() == [2]
+
+def test_extended_document_keeps_segments_until_finished():
+    from src.utils.chunk_store import ChunkStore
+    store = ChunkStore()
+    store.add("contract", "", [])
+    pieces = ["Section 1. Payment is due ", "within 30 days. ", "", "Section 2. Late fees apply."]
+    text = "".join(pieces)
+    offset, ids = 0, []
+    for piece in pieces:
+        offset += len(piece)
+        # Each chunk ends at the new text and starts inside an earlier segment.
+        ids += list(store.extend("contract", piece, [(max(0, offset - 20), offset)] if piece else []))
+
+    assert store.texts["contract"] == ""  # not concatenated while streaming
+    assert [store.text(i) for i in ids] == [text[max(0, end - 20):end] for end in (26, 42, 69)]
+    store.add("next", "x", [(0, 1)])  # adding another document finishes the streamed one
+    assert store.texts["contract"] == text
+    assert [store.text(i) for i in ids] == [text[max(0, end - 20):end] for end in (26, 42, 69)]
+
+def test_split_spans_index_into_text_and_results_are_labelled(fake_embedder, fake_cache):
+    from src.utils.retrieval import DocumentProcessor
+    text = "\n\n".join(f"Paragraph {i}: the LLC must file annual report number {i}." * 8 for i in range(6))
+    spans = DocumentProcessor().split(text)
+    assert len(spans) > 1
+    assert all(text[start:end].strip() for start, end in spans)
+
+    retriever = VectorRetriever(embedder=fake_embedder, embedding_cache=fake_cache)
+    retriever.add_document("llc.txt", text, spans, {"name": "llc.txt"})
+    assert len(retriever.store.texts["llc.txt"]) == len(text)
+    top = retriever.retrieve("annual report number 3", threshold=0.0)[0][0]
+    assert top.startswith("From document 'llc.txt':\n")
+    # Embedded chunks carry no filename boilerplate.
+    assert all("llc.txt" not in t for call in fake_embedder.model.calls for t in call)
+
+def test_ingest_stream_indexes_batches_as_pages_arrive(fake_embedder, fake_cache):
+    pages = [f"Page {i}. " + f"Section {i} covers the payroll filing rules for quarter {i}. " * 30 + "\n" for i in range(10)]
+    retriever = VectorRetriever(embedder=fake_embedder, embedding_cache=fake_cache, index_dir=None)
+    searchable_midway = []
+
+    def pages_with_probe():
+        for i, page in enumerate(pages):
+            if i == 6:
+                searchable_midway.append(bool(retriever.retrieve("payroll filing rules", threshold=0.0)))
+            yield page
+
+    count = retriever.ingest_stream("payroll.txt", pages_with_probe(), {"name": "payroll.txt"}, batch_size=4)
+    assert searchable_midway == [True]
+    assert count == retriever.index.ntotal
+    assert retriever.store.texts["payroll.txt"] == "".join(pages)
+    assert max(len(call) for call in fake_embedder.model.calls) <= 4
+
+def test_ingest_stream_failure_removes_partial_document(fake_embedder, fake_cache):
+    retriever = VectorRetriever(embedder=fake_embedder, embedding_cache=fake_cache, index_dir=None)
+
+    def broken_pages():
+        yield "Some text " * 500
+        raise RuntimeError("corrupt page")
+
+    with pytest.raises(RuntimeError):
+        retriever.ingest_stream("broken.pdf", broken_pages(), batch_size=1)
+    assert not retriever.has_document("broken.pdf")
+    assert retriever.retrieve("Some text", threshold=0.0) == []
+
+def test_retrieve_from_document_ranks_one_documents_chunks(retriever, fake_embedder):
+    calls_before = len(fake_embedder.model.calls)
+
+    results = retriever.retrieve_from_document("osha.pdf", "safety training for employees", k=1)
+
+    assert len(results) == 1
+    start, chunk, score = results[0]
+    assert chunk == "OSHA requires safety training for all new employees" and start == 0
+    assert score > 0.5
+    assert retriever.retrieve_from_document("missing.pdf", "anything") == []
+    # Chunk vectors come from the embedding cache; only the query is embedded.
+    assert fake_embedder.model.calls[calls_before:] == [["safety training for employees"]]
+
+def test_loaded_index_stays_writable_after_its_snapshot_is_pruned(fake_embedder, fake_cache, tmp_path):
+    import shutil
+
+    documents = {"llc.pdf": ["The LLC filing deadline is March 15"], "osha.pdf": ["OSHA requires safety training"]}
+    first = VectorRetriever(embedder=fake_embedder, embedding_cache=fake_cache, index_dir=str(tmp_path / "faiss"))
+    first.add_documents(documents)
+    second = VectorRetriever(embedder=fake_embedder, embedding_cache=fake_cache, index_dir=str(tmp_path / "faiss"))
+    second.add_documents(documents)
+
+    shutil.rmtree(tmp_path / "faiss")  # another session pruned the snapshot
+    second.add_document("1099.pdf", ["Form 1099 is due January 31"])
+    second.remove_document("osha.pdf")
+
+    assert second.index.ntotal == 2 and len(second.store) == 2
+    assert "January 31" in second.retrieve("Form 1099 due", threshold=0.0)[0][0]
+
+def test_fingerprint_identifies_the_corpus_by_content(fake_embedder, fake_cache):
+    first = VectorRetriever(embedder=fake_embedder, embedding_cache=fake_cache, index_dir=None)
+    second = VectorRetriever(embedder=fake_embedder, embedding_cache=fake_cache, index_dir=None)
+    second.add_document("osha.pdf", ["OSHA requires safety training"])
+    second.remove_document("osha.pdf")
+    for retriever in (first, second):
+        retriever.add_document("llc.pdf", ["The LLC filing deadline is March 15"])
+
+    assert first.index_version != second.index_version
+    assert first.fingerprint() == second.fingerprint()
+    before = first.fingerprint()
+    first.add_document("1099.pdf", ["Form 1099 is due January 31"])
+    assert first.fingerprint() != before
+
+def test_query_embedding_and_fingerprint_never_wait_on_the_lock(retriever, fake_embedder, fake_cache):
+    import threading
+    chunks = ["Form 1099 must be filed by January 31 each year"]
+    fake_cache.get_many(chunks)  # cached, so adding it needs no model call
+    embedding, release = threading.Event(), threading.Event()
+    embed = fake_embedder.embed
+
+    def slow_embed(texts, *args, **kwargs):
+        embedding.set()
+        release.wait(5)
+        return embed(texts, *args, **kwargs)
+
+    fake_embedder.embed = slow_embed
+    searcher = threading.Thread(target=retriever.retrieve, args=("payroll question",))
+    searcher.start()
+    assert embedding.wait(5)
+    adder = threading.Thread(target=retriever.add_document, args=("1099.pdf", chunks))
+    adder.start()
+    adder.join(2)
+    assert not adder.is_alive()  # the search's embedding does not hold the lock
+
+    with retriever._lock:
+        reader = threading.Thread(target=retriever.fingerprint)
+        reader.start()
+        reader.join(2)
+        assert not reader.is_alive()
+    release.set()
+    searcher.join(5)
+
+def test_rebuild_runs_outside_the_lock_and_catches_up(fake_embedder, fake_cache, monkeypatch):
+    import threading
+    from src.config.retrieval import RetrievalConfig
+    monkeypatch.setattr(RetrievalConfig, "FLAT_MAX_VECTORS", 5)
+    retriever = VectorRetriever(embedder=fake_embedder, embedding_cache=fake_cache, index_dir=None)
+    retriever.add_document("small.pdf", ["small one", "small two"])
+    building, release = threading.Event(), threading.Event()
+    get_many = fake_cache.get_many
+
+    def slow_get_many(texts, *args, **kwargs):
+        if len(texts) == 12:  # the rebuild reading every live vector back
+            building.set()
+            release.wait(5)
+        return get_many(texts, *args, **kwargs)
+
+    monkeypatch.setattr(fake_cache, "get_many", slow_get_many)
+    adder = threading.Thread(target=retriever.add_document, args=("big.pdf", [f"big chunk {i}" for i in range(10)]))
+    adder.start()
+    assert building.wait(5)
+    assert retriever.active_kind == "flat"
+    assert retriever.retrieve("big chunk 3", threshold=0.0)  # searches use the old index meanwhile
+    assert retriever.remove_document("small.pdf")
+    release.set()
+    adder.join(5)
+
+    assert retriever.active_kind == "hnsw"
+    assert all("small" not in text for text, _ in retriever.retrieve("small one", k=12, threshold=-1))
+    assert len(retriever.retrieve("big chunk", k=12, threshold=-1, mode="vector")) == 10
@@ -0,0 +1,238 @@
+import json
+from bisect import bisect_right
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+
+class ChunkStore:
+    """
+    Compact storage for chunked documents.
+
+    Each document's text is held exactly once; chunks are (document slot, start, end)
+    offsets in NumPy arrays indexed by chunk ID, and chunk text is only sliced out
+    when it is actually needed. Document metadata is kept separately from the text.
+
+    A document being streamed in (see `extend`) keeps its text as a list of
+    segments, joined once by `finish`, so appending stays linear in its size.
+    """
+    def __init__(self):
+        self.texts: Dict[str, str] = {}  # {doc_id: full document text}
+        self.metadata: Dict[str, Dict[str, Any]] = {}  # {doc_id: metadata, e.g. {"name": ...}}
+        self.doc_ranges: Dict[str, range] = {}  # {doc_id: range of chunk_ids}
+        # {doc_id: (text segments, start offset of each)} for a document still being extended
+        self._segments: Dict[str, Tuple[List[str], List[int]]] = {}
+        self._slots: List[Optional[str]] = []  # {slot: doc_id}, None once removed
+        self._doc_slot = np.empty(0, dtype=np.int32)
+        self._starts = np.empty(0, dtype=np.int64)
+        self._ends = np.empty(0, dtype=np.int64)
+        self._size = 0  # Chunk IDs allocated so far; also the next ID
+        self._live = 0
+
+    def __len__(self) -> int:
+        return self._live
+
+    def __contains__(self, chunk_id: int) -> bool:
+        return 0 <= chunk_id < self._size and self._slots[self._doc_slot[chunk_id]] is not None
+
+    @staticmethod
+    def join_chunks(chunks: List[str]) -> Tuple[str, List[Tuple[int, int]]]:
+        """Builds a text and spans from pre-split chunks, for callers that only have the chunks."""
+        spans, offset = [], 0
+        for chunk in chunks:
+            spans.append((offset, offset + len(chunk)))
+            offset += len(chunk) + 1
+        return "\n".join(chunks), spans
+
+    def add(
+        self,
+        doc_id: str,
+        text: str,
+        spans: Sequence[Tuple[int, int]],
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> range:
+        """
+        Stores a document and allocates consecutive chunk IDs for its spans.
+
+        Returns:
+            The range of chunk IDs given to the document's chunks.
+        """
+        if doc_id in self.texts:
+            raise ValueError(f"Document '{doc_id}' is already stored.")
+        self.finish()
+        spans = np.asarray(spans, dtype=np.int64).reshape(-1, 2)
+        self._reserve(self._size + len(spans))
+
+        ids = range(self._size, self._size + len(spans))
+        self._doc_slot[ids.start:ids.stop] = len(self._slots)
+        self._starts[ids.start:ids.stop] = spans[:, 0]
+        self._ends[ids.start:ids.stop] = spans[:, 1]
+        self._slots.append(doc_id)
+        self._size += len(spans)
+        self._live += len(spans)
+
+        self.texts[doc_id] = text
+        self.metadata[doc_id] = dict(metadata or {})
+        self.doc_ranges[doc_id] = ids
+        return ids
+
+    def extend(self, doc_id: str, text: str, spans: Sequence[Tuple[int, int]]) -> range:
+        """
+        Appends more text and chunks to the most recently added document, for streaming ingest.
+
+        The text is kept as a new segment rather than concatenated; `finish` joins the
+        segments once the document is complete.
+
+        Args:
+            doc_id: The document being streamed in; it must be the last one added.
+            text: Text to append to the document.
+            spans: New chunk offsets into the (extended) document text.
+
+        Returns:
+            The range of chunk IDs given to the new chunks.
+        """
+        if not self._slots or self._slots[-1] != doc_id:
+            raise ValueError(f"Only the most recently added document can be extended, not '{doc_id}'.")
+        if text:
+            segments, offsets = self._segments.setdefault(doc_id, ([self.texts[doc_id]], [0]))
+            offsets.append(offsets[-1] + len(segments[-1]))
+            segments.append(text)
+        spans = np.asarray(spans, dtype=np.int64).reshape(-1, 2)
+        self._reserve(self._size + len(spans))
+
+        ids = range(self._size, self._size + len(spans))
+        self._doc_slot[ids.start:ids.stop] = len(self._slots) - 1
+        self._starts[ids.start:ids.stop] = spans[:, 0]
+        self._ends[ids.start:ids.stop] = spans[:, 1]
+        self._size += len(spans)
+        self._live += len(spans)
+        self.doc_ranges[doc_id] = range(self.doc_ranges[doc_id].start, self._size)
+        return ids
+
+    def finish(self, doc_id: Optional[str] = None) -> None:
+        """Joins the text segments of a streamed document (or of every document) into its full text."""
+        for streamed in [doc_id] if doc_id is not None else list(self._segments):
+            if streamed in self._segments:
+                self.texts[streamed] = "".join(self._segments.pop(streamed)[0])
+
+    def remove(self, doc_id: str) -> Optional[range]:
+        """Drops a document's text and metadata; its chunk IDs are never reused."""
+        ids = self.doc_ranges.pop(doc_id, None)
+        if ids is None:
+            return None
+        self._segments.pop(doc_id, None)
+        if len(ids):
+            self._slots[self._doc_slot[ids.start]] = None
+        else:
+            self._slots[self._slots.index(doc_id)] = None
+        del self.texts[doc_id]
+        del self.metadata[doc_id]
+        self._live -= len(ids)
+        return ids
+
+    def text(self, chunk_id: int) -> str:
+        """Slices a chunk's text out of its document."""
+        doc_id = self.doc_id(chunk_id)
+        start, end = self.span(chunk_id)
+        if doc_id not in self._segments:
+            return self.texts[doc_id][start:end]
+        segments, offsets = self._segments[doc_id]
+        parts = []
+        k = max(0, bisect_right(offsets, start) - 1)
+        while k < len(segments) and offsets[k] < end:
+            parts.append(segments[k][max(0, start - offsets[k]):end - offsets[k]])
+            k += 1
+        return "".join(parts)
+
+    def span(self, chunk_id: int) -> Tuple[int, int]:
+        """A chunk's (start, end) offsets into its document's text."""
+        return int(self._starts[chunk_id]), int(self._ends[chunk_id])
+
+    def doc_id(self, chunk_id: int) -> str:
+        return self._slots[self._doc_slot[chunk_id]]
+
+    def labelled(self, chunk_id: int) -> str:
+        """A chunk's text headed with its source document's name, for prompt assembly."""
+        name = self.metadata[self.doc_id(chunk_id)].get("name")
+        if name is None:
+            return self.text(chunk_id)
+        return f"From document '{name}':\n{self.text(chunk_id)}"
+
+    def document_chunks(self, doc_id: str) -> List[str]:
+        return [self.text(chunk_id) for chunk_id in self.doc_ranges[doc_id]]
+
+    def ids(self) -> np.ndarray:
+        """The IDs of all stored chunks, in insertion order."""
+        if not self.doc_ranges:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(r.start, r.stop, dtype=np.int64) for r in self.doc_ranges.values()])
+
+    def items(self) -> Iterator[Tuple[int, str]]:
+        for ids in self.doc_ranges.values():
+            for chunk_id in ids:
+                yield chunk_id, self.text(chunk_id)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by texts and offset arrays."""
+        text_bytes = sum(len(text) for text in self.texts.values())
+        text_bytes += sum(len(segment) for segments, _ in self._segments.values() for segment in segments[1:])
+        return text_bytes + self._doc_slot.nbytes + self._starts.nbytes + self._ends.nbytes
+
+    def copy(self) -> "ChunkStore":
+        """
+        A copy that later changes to this store don't affect, for saving it without
+        holding up writers. Texts are shared, since strings are immutable.
+        """
+        self.finish()
+        store = ChunkStore()
+        store.texts = dict(self.texts)
+        store.metadata = {doc_id: dict(metadata) for doc_id, metadata in self.metadata.items()}
+        store.doc_ranges = dict(self.doc_ranges)
+        store._slots = list(self._slots)
+        store._doc_slot = self._doc_slot[:self._size].copy()
+        store._starts = self._starts[:self._size].copy()
+        store._ends = self._ends[:self._size].copy()
+        store._size = self._size
+        store._live = self._live
+        return store
+
+    def save(self, directory: Path) -> None:
+        """Writes texts and metadata as JSON and the offset arrays as .npy files."""
+        self.finish()
+        with open(directory / "documents.json", "w") as f:
+            json.dump({
+                "slots": self._slots,
+                "texts": self.texts,
+                "metadata": self.metadata,
+                "doc_ranges": {doc_id: [r.start, r.stop] for doc_id, r in self.doc_ranges.items()},
+            }, f)
+        np.save(directory / "doc_slot.npy", self._doc_slot[:self._size])
+        np.save(directory / "starts.npy", self._starts[:self._size])
+        np.save(directory / "ends.npy", self._ends[:self._size])
+
+    @classmethod
+    def load(cls, directory: Path) -> "ChunkStore":
+        with open(directory / "documents.json") as f:
+            state = json.load(f)
+        store = cls()
+        store._slots = state["slots"]
+        store.texts = state["texts"]
+        store.metadata = state["metadata"]
+        store.doc_ranges = {doc_id: range(*bounds) for doc_id, bounds in state["doc_ranges"].items()}
+        store._doc_slot = np.load(directory / "doc_slot.npy")
+        store._starts = np.load(directory / "starts.npy")
+        store._ends = np.load(directory / "ends.npy")
+        store._size = len(store._starts)
+        store._live = sum(len(r) for r in store.doc_ranges.values())
+        return store
+
+    def _reserve(self, capacity: int) -> None:
+        """Grows the offset arrays geometrically so appends stay amortized O(1)."""
+        if capacity <= len(self._starts):
+            return
+        new_capacity = max(capacity, 2 * len(self._starts), 1024)
+        for name in ("_doc_slot", "_starts", "_ends"):
+            old = getattr(self, name)
+            grown = np.empty(new_capacity, dtype=old.dtype)
+            grown[:self._size] = old[:self._size]
+            setattr(self, name, grown)
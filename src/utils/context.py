@@ -0,0 +1,108 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FetchTimeout
+from typing import Any, Callable, Dict, List, Optional
+
+from src.config.chat import ChatConfig
+
+class ContextGatherer:
+    """
+    Fetches a chat turn's context sources concurrently.
+
+    Document retrieval and web search run side by side, each on its own shared
+    thread pool and against its own deadline. Sources that miss their deadline or
+    fail are left out of the turn's context instead of holding up the answer. Web
+    searches that hang keep running in the background, so once `max_pending_web`
+    of them are outstanding, web search is skipped until some finish.
+    """
+    def __init__(
+        self,
+        retrieval_timeout: float = ChatConfig.RETRIEVAL_TIMEOUT_S,
+        web_timeout: float = ChatConfig.WEB_SEARCH_TIMEOUT_S,
+        retrieval_workers: int = ChatConfig.RETRIEVAL_FETCH_WORKERS,
+        web_workers: int = ChatConfig.WEB_SEARCH_WORKERS,
+        max_pending_web: int = ChatConfig.MAX_PENDING_WEB_SEARCHES
+    ):
+        self.retrieval_timeout = retrieval_timeout
+        self.web_timeout = web_timeout
+        self._executors = {
+            "retrieval": ThreadPoolExecutor(max_workers=retrieval_workers, thread_name_prefix="context-retrieval"),
+            "web_search": ThreadPoolExecutor(max_workers=web_workers, thread_name_prefix="context-web"),
+        }
+        self._web_slots = threading.BoundedSemaphore(max_pending_web)
+
+    def gather(self, prompt: str, retriever=None, web_searcher=None) -> Dict[str, Any]:
+        """
+        Runs the available fetches for a prompt concurrently.
+
+        Args:
+            prompt: The user's message.
+            retriever: A VectorRetriever to search, or None to skip document retrieval.
+            web_searcher: A WebSearcher to query, or None to skip web search.
+
+        Returns:
+            A dict with "retrieved_docs" and "search_results" (empty when a source was
+            skipped, failed or timed out), "timed_out" (source names) and "seconds"
+            (per-source wall time, for finished sources).
+        """
+        fetches: Dict[str, Callable[[], List]] = {}
+        timeouts = {"retrieval": self.retrieval_timeout, "web_search": self.web_timeout}
+        if retriever is not None:
+            fetches["retrieval"] = lambda: retriever.retrieve(prompt)
+        if web_searcher is not None:
+            if self._web_slots.acquire(blocking=False):
+                fetches["web_search"] = lambda: self._release_after(self._web_slots, web_searcher.search, prompt)
+            else:
+                logging.warning("Too many web searches still pending; answering without web search.")
+
+        start = time.perf_counter()
+        futures = {name: self._executors[name].submit(self._timed, fetch) for name, fetch in fetches.items()}
+        results: Dict[str, List] = {}
+        seconds: Dict[str, float] = {}
+        timed_out: List[str] = []
+        for name, future in futures.items():
+            remaining = max(0.0, start + timeouts[name] - time.perf_counter())
+            try:
+                results[name], seconds[name] = future.result(timeout=remaining)
+            except FetchTimeout:
+                timed_out.append(name)
+                logging.warning(f"Context source '{name}' timed out after {timeouts[name]:.1f}s; answering without it.")
+            except Exception as e:
+                logging.error(f"Context source '{name}' failed: {e}")
+
+        logging.info(
+            f"Gathered context in {time.perf_counter() - start:.2f}s "
+            f"({', '.join(f'{name} {s:.2f}s' for name, s in seconds.items()) or 'no sources'})."
+        )
+        return {
+            "retrieved_docs": results.get("retrieval") or [],
+            "search_results": results.get("web_search") or [],
+            "timed_out": timed_out,
+            "seconds": seconds,
+        }
+
+    @staticmethod
+    def _release_after(slot: threading.BoundedSemaphore, fetch: Callable[[str], List], prompt: str) -> List:
+        try:
+            return fetch(prompt)
+        finally:
+            slot.release()
+
+    @staticmethod
+    def _timed(fetch: Callable[[], List]):
+        start = time.perf_counter()
+        return fetch(), time.perf_counter() - start
+
+    @staticmethod
+    def format_context(gathered: Dict[str, Any]) -> Optional[str]:
+        """Merges retrieved chunks and web snippets into the prompt's context block."""
+        parts = []
+        if gathered["retrieved_docs"]:
+            parts.append("\n\n".join(r[0] for r in gathered["retrieved_docs"]))
+        if gathered["search_results"]:
+            parts.append("Based on a web search:\n" + "\n".join(f"- {res['snippet']}" for res in gathered["search_results"]))
+        return "\n\n".join(parts) or None
+
+# Global instance; its thread pools are shared by every session.
+context_gatherer = ContextGatherer()
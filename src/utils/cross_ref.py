@@ -1,28 +1,68 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Iterator, Optional, Tuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from src.config.cross_ref import CrossRefConfig
+from src.config.chat import ChatConfig
+from src.models.embeddings import EmbeddingCache, LegalEmbedder
+from src.models.history import estimate_tokens
 from src.models.llm import GeminiClient
+from src.utils.scheduler import BULK
+from src.utils.text_splitter import RecursiveTextSplitter
+import numpy as np
 import logging
 import json
+import math
+import time
+
+# Characters of each document the comparison prompt used to carry; kept to report the saving.
+LEADING_EXCERPT_CHARS = 2000
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
 
 class CrossReferencer:
     """
     Uses an LLM to intelligently compare and contrast multiple documents.
     """
-    def __init__(self, gemini_client: GeminiClient):
+    def __init__(
+        self,
+        gemini_client: GeminiClient,
+        embedder: Optional[LegalEmbedder] = None,
+        retriever=None,
+        embedding_cache: Optional[EmbeddingCache] = None
+    ):
         """
         Initializes the CrossReferencer with a GeminiClient instance.
 
         Args:
             gemini_client: An active instance of the GeminiClient.
+            embedder: Embeds documents to choose which pairs get an LLM comparison
+                when there is neither an embedding cache nor a retriever; loaded on
+                first use when not given.
+            retriever: A VectorRetriever holding the documents, used to pick the
+                passages of each document that are relevant to the query.
+            embedding_cache: Stores the chunk vectors used to choose pairs; defaults to
+                the retriever's, so indexed documents are not embedded again.
         """
         if not isinstance(gemini_client, GeminiClient):
             raise TypeError("gemini_client must be an instance of GeminiClient")
         self.llm = gemini_client
+        self.embedder = embedder
+        self.retriever = retriever
+        self.embedding_cache = embedding_cache
+        # Prompt size of the last run's LLM comparisons, against the old leading-excerpt prompts.
+        self.last_run_stats: Dict[str, Any] = {}
 
     def compare_documents(
         self,
         doc_texts: List[str],
         doc_names: List[str],
-        query: str
+        query: str,
+        max_workers: int = CrossRefConfig.MAX_WORKERS,
+        pair_timeout: float = CrossRefConfig.PAIR_TIMEOUT_S,
+        on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+        max_llm_pairs: Optional[int] = None,
+        doc_ids: Optional[List[str]] = None
     ) -> List[Dict[str, Any]]:
         """
         Compares multiple documents against each other based on a query.
@@ -31,51 +71,266 @@ class CrossReferencer:
             doc_texts: A list of the full text content of the documents.
             doc_names: A list of the names of the documents.
             query: The user's query to focus the comparison.
+            max_workers: Pairs compared concurrently; 1 compares them one by one.
+            pair_timeout: Seconds a single comparison may run before it is reported as
+                timed out. Pairs still queued once every pair could have used its full
+                timeout (e.g. behind a hung call) are reported as timed out too.
+            on_result: Called with each comparison as soon as it finishes, e.g. to show progress.
+            max_llm_pairs: Pairs compared by the LLM; the rest get an embedding-based
+                score. Defaults to CrossRefConfig.LLM_PAIRS_PER_DOCUMENT per document.
+            doc_ids: The documents' IDs in the retriever, to compare their passages
+                most relevant to the query instead of their opening text.
 
         Returns:
             A list of dictionaries, each containing the comparison between two documents.
+            "method" tells whether a comparison came from the LLM or from embeddings.
+            LLM comparisons come first, ranked by their "similarity_score", then the
+            embedding-scored pairs, ranked by their "estimated_similarity_score".
+        """
+        results = []
+        for comparison in self.iter_comparisons(
+            doc_texts, doc_names, query, max_workers, pair_timeout, max_llm_pairs, doc_ids
+        ):
+            results.append(comparison)
+            if on_result is not None:
+                on_result(comparison)
+
+        # The embedding estimates are on the same 1-10 scale but not comparable with the
+        # LLM's scores, so they are ranked separately, after the LLM comparisons.
+        llm = [r for r in results if r.get("method") != "embedding"]
+        estimated = [r for r in results if r.get("method") == "embedding"]
+        return (
+            sorted(llm, key=lambda x: x.get("similarity_score", 0), reverse=True)
+            + sorted(estimated, key=lambda x: x["estimated_similarity_score"], reverse=True)
+        )
+
+    def iter_comparisons(
+        self,
+        doc_texts: List[str],
+        doc_names: List[str],
+        query: str,
+        max_workers: int = CrossRefConfig.MAX_WORKERS,
+        pair_timeout: float = CrossRefConfig.PAIR_TIMEOUT_S,
+        max_llm_pairs: Optional[int] = None,
+        doc_ids: Optional[List[str]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Compares every pair of documents, yielding each comparison as it finishes (in
+        completion order, unsorted). Embedding-scored pairs come first, then the LLM
+        comparisons as they complete. Takes the same arguments as `compare_documents`.
         """
         if len(doc_texts) < 2:
             logging.warning("Cross-referencing requires at least two documents.")
-            return []
+            return
 
-        results = []
-        # Compare each pair of documents
-        for i in range(len(doc_texts)):
-            for j in range(i + 1, len(doc_texts)):
-                try:
-                    comparison = self._llm_compare(
-                        text1=doc_texts[i],
-                        text2=doc_texts[j],
-                        name1=doc_names[i],
-                        name2=doc_names[j],
-                        query=query
-                    )
-                    results.append(comparison)
-                except Exception as e:
-                    logging.error(f"Failed to compare {doc_names[i]} and {doc_names[j]}: {e}")
-                    results.append({
-                        "doc1": doc_names[i],
-                        "doc2": doc_names[j],
-                        "error": str(e)
-                    })
-        
-        # Sort results by the AI-generated similarity score
-        return sorted(results, key=lambda x: x.get("similarity_score", 0), reverse=True)
+        pairs = [(i, j) for i in range(len(doc_texts)) for j in range(i + 1, len(doc_texts))]
+        if max_llm_pairs is None:
+            max_llm_pairs = math.ceil(CrossRefConfig.LLM_PAIRS_PER_DOCUMENT * len(doc_texts))
+        if max_llm_pairs < len(pairs):
+            pairs, scored = self.select_pairs(doc_texts, query, max_llm_pairs)
+            logging.info(f"Comparing {len(pairs)} of {len(pairs) + len(scored)} document pairs with the LLM.")
+            for (i, j), similarity in scored.items():
+                yield {
+                    "doc1": doc_names[i],
+                    "doc2": doc_names[j],
+                    "estimated_similarity_score": round(1 + 9 * min(max(similarity, 0.0), 1.0), 1),
+                    "vector_similarity": similarity,
+                    "method": "embedding",
+                }
 
-    def _llm_compare(
+        excerpts = {
+            doc: self.excerpt(doc_texts[doc], query, doc_ids[doc] if doc_ids else None)
+            for doc in sorted({doc for pair in pairs for doc in pair})
+        }
+        self._measure_prompts(pairs, excerpts, doc_texts, doc_names, query)
+        started_at: Dict[Tuple[int, int], float] = {}
+
+        def compare(pair: Tuple[int, int]) -> Dict[str, Any]:
+            started_at[pair] = time.monotonic()
+            i, j = pair
+            return self._compare_pair(excerpts[i], excerpts[j], doc_names[i], doc_names[j], query)
+
+        workers = max(1, max_workers)
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cross-ref")
+        futures = {executor.submit(compare, pair): pair for pair in pairs}
+        pending = set(futures)
+        # The whole run gets the time its pairs would take if each used its full
+        # timeout, so pairs queued behind a hung call still come back on time.
+        run_deadline = time.monotonic() + pair_timeout * math.ceil(len(pairs) / workers)
+
+        def deadline(future) -> float:
+            pair = futures[future]
+            return min(started_at[pair] + pair_timeout, run_deadline) if pair in started_at else run_deadline
+
+        try:
+            while pending:
+                timeout = max(0.0, min(deadline(f) for f in pending) - time.monotonic())
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+                now = time.monotonic()
+                for future in [f for f in pending if now >= deadline(f)]:
+                    # A running call can't be interrupted; its result is dropped when it arrives.
+                    future.cancel()
+                    pending.discard(future)
+                    i, j = futures[future]
+                    if futures[future] in started_at:
+                        error = f"Timed out after {pair_timeout:g}s."
+                    else:
+                        error = "Timed out waiting for a worker."
+                    logging.error(f"Comparing {doc_names[i]} and {doc_names[j]}: {error}")
+                    yield {"doc1": doc_names[i], "doc2": doc_names[j], "error": error}
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _compare_pair(self, text1: str, text2: str, name1: str, name2: str, query: str) -> Dict[str, Any]:
+        """Compares one pair, turning a failure into an error entry for that pair."""
+        try:
+            comparison = self._llm_compare(text1=text1, text2=text2, name1=name1, name2=name2, query=query)
+            if not isinstance(comparison, dict):
+                raise ValueError(f"expected a JSON object, got {type(comparison).__name__}")
+            comparison["method"] = "llm"
+        except Exception as e:
+            logging.error(f"Failed to compare {name1} and {name2}: {e}")
+            comparison = {"doc1": name1, "doc2": name2, "error": str(e), "method": "llm"}
+        return comparison
+
+    def select_pairs(
         self,
-        text1: str,
-        text2: str,
-        name1: str,
-        name2: str,
-        query: str
-    ) -> Dict[str, Any]:
+        doc_texts: List[str],
+        query: str,
+        max_llm_pairs: int
+    ) -> Tuple[List[Tuple[int, int]], Dict[Tuple[int, int], float]]:
         """
-        Uses the LLM to generate a structured comparison of two texts.
+        Picks the document pairs worth an LLM comparison.
+
+        Each document gets a document-level vector (the mean of its chunks), a
+        query-conditioned vector (the mean of its chunks closest to the query) and a
+        relevance (their mean similarity to the query). A pair's similarity averages
+        the cosines of both vectors, and pairs are ranked by a blend of their
+        relevance and similarity. Every document first gets its best-ranked partner,
+        so none is left without an LLM comparison, then the highest-ranked pairs fill
+        the remaining budget.
+
+        Returns:
+            The (i, j) pairs for the LLM, best first, and the vector similarity of
+            every other pair.
+        """
+        documents, focus, relevance = self._document_vectors(doc_texts, query)
+        similarity = (documents @ documents.T + focus @ focus.T) / 2
+        weight = CrossRefConfig.PRUNE_RELEVANCE_WEIGHT
+        rank = weight * (relevance[:, None] + relevance[None, :]) / 2 + (1 - weight) * similarity
+
+        n = len(doc_texts)
+        by_rank = sorted(
+            ((i, j) for i in range(n) for j in range(i + 1, n)), key=lambda p: rank[p], reverse=True
+        )
+        best_partners = set()
+        for i in range(n):
+            j = max((j for j in range(n) if j != i), key=lambda j: rank[i, j])
+            best_partners.add((min(i, j), max(i, j)))
+        ordered = [p for p in by_rank if p in best_partners] + [p for p in by_rank if p not in best_partners]
+        selected = ordered[:max(0, max_llm_pairs)]
+        chosen = set(selected)
+        return selected, {p: float(similarity[p]) for p in by_rank if p not in chosen}
+
+    def excerpt(self, text: str, query: str, doc_id: Optional[str] = None) -> str:
+        """
+        The part of a document sent for comparison: its passages most relevant to the
+        query, packed best-first into CrossRefConfig.EXCERPT_TOKEN_BUDGET and put back
+        in document order. Documents not in the retriever send their opening text.
         """
+        budget = CrossRefConfig.EXCERPT_TOKEN_BUDGET
+        budget_chars = int(budget * ChatConfig.CHARS_PER_TOKEN)
+        if self.retriever is None or doc_id is None or not self.retriever.has_document(doc_id):
+            return text[:budget_chars]
+
+        passages: List[Tuple[int, str]] = []
+        remaining = budget
+        for start, chunk, _ in self.retriever.retrieve_from_document(doc_id, query, k=CrossRefConfig.EXCERPT_MAX_CHUNKS):
+            tokens = estimate_tokens(chunk)
+            if tokens > remaining:
+                if remaining < CrossRefConfig.EXCERPT_MIN_TOKENS:
+                    break
+                cut = int(remaining * ChatConfig.CHARS_PER_TOKEN)
+                chunk = chunk[:cut].rsplit(" ", 1)[0] if " " in chunk[:cut] else chunk[:cut]
+                tokens = estimate_tokens(chunk)
+            passages.append((start, chunk))
+            remaining -= tokens
+        if not passages:
+            return text[:budget_chars]
+        return "\n[...]\n".join(chunk for _, chunk in sorted(passages))
+
+    def _measure_prompts(
+        self,
+        pairs: List[Tuple[int, int]],
+        excerpts: Dict[int, str],
+        doc_texts: List[str],
+        doc_names: List[str],
+        query: str
+    ) -> None:
+        """Records the estimated prompt tokens per LLM comparison, now and with leading excerpts."""
+        if not pairs:
+            self.last_run_stats = {}
+            return
+        sent = baseline = 0
+        for i, j in pairs:
+            sent += estimate_tokens(self._comparison_prompt(excerpts[i], excerpts[j], doc_names[i], doc_names[j], query))
+            baseline += estimate_tokens(self._comparison_prompt(
+                doc_texts[i][:LEADING_EXCERPT_CHARS], doc_texts[j][:LEADING_EXCERPT_CHARS],
+                doc_names[i], doc_names[j], query
+            ))
+        self.last_run_stats = {
+            "llm_pairs": len(pairs),
+            "tokens_per_pair": sent / len(pairs),
+            "leading_excerpt_tokens_per_pair": baseline / len(pairs),
+        }
+        logging.info(
+            f"Cross-reference prompts: ~{sent / len(pairs):.0f} tokens per pair "
+            f"(~{baseline / len(pairs):.0f} with leading {LEADING_EXCERPT_CHARS}-character excerpts)."
+        )
+
+    def _document_vectors(self, doc_texts: List[str], query: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Document-level and query-conditioned vectors (unit length) and query relevance of each document."""
+        if self.embedding_cache is None:
+            if self.retriever is not None:
+                self.embedding_cache = self.retriever.embedding_cache
+            else:
+                self.embedding_cache = EmbeddingCache(self.embedder)
+        # The retriever's splitter settings, so indexed documents' chunks are cache hits.
+        splitter = RecursiveTextSplitter()
+        chunks: List[str] = []
+        owners: List[int] = []
+        for doc, text in enumerate(doc_texts):
+            spans = splitter.split_spans(text) or [(0, len(text))]
+            limit = CrossRefConfig.PRUNE_CHUNKS_PER_DOCUMENT
+            if len(spans) > limit:
+                spans = [spans[k] for k in np.linspace(0, len(spans) - 1, limit).round().astype(int)]
+            chunks += [text[start:end] for start, end in spans]
+            owners += [doc] * len(spans)
+
+        vectors = _normalize(self.embedding_cache.get_many(chunks + [query]))
+        chunk_vectors, query_vector = vectors[:-1], vectors[-1]
+        scores = chunk_vectors @ query_vector
+        owners = np.asarray(owners)
+
+        documents = np.zeros((len(doc_texts), vectors.shape[1]), dtype=np.float32)
+        focus = np.zeros_like(documents)
+        relevance = np.zeros(len(doc_texts), dtype=np.float32)
+        for doc in range(len(doc_texts)):
+            rows = np.flatnonzero(owners == doc)
+            documents[doc] = chunk_vectors[rows].mean(axis=0)
+            top = rows[np.argsort(-scores[rows])[:CrossRefConfig.PRUNE_FOCUS_CHUNKS]]
+            focus[doc] = chunk_vectors[top].mean(axis=0)
+            relevance[doc] = scores[top].mean()
+        return _normalize(documents), _normalize(focus), relevance
+
+    @staticmethod
+    def _comparison_prompt(text1: str, text2: str, name1: str, name2: str, query: str) -> str:
+        """Builds the comparison prompt for two document excerpts."""
         # This prompt asks the LLM to act as an analyst and return a JSON object.
-        prompt = f"""
+        return f"""
         As a policy analyst, compare the following two documents based on the user's query.
 
         User Query: "{query}"
@@ -83,13 +338,13 @@ class CrossReferencer:
         Document 1 Name: "{name1}"
         Document 1 Content:
         ---
-        {text1[:2000]}
+        {text1}
         ---
 
         Document 2 Name: "{name2}"
         Document 2 Content:
         ---
-        {text2[:2000]}
+        {text2}
         ---
 
         Please provide your analysis in a valid JSON format with the following structure:
@@ -110,17 +365,32 @@ class CrossReferencer:
         }}
         """
 
+    def _llm_compare(
+        self,
+        text1: str,
+        text2: str,
+        name1: str,
+        name2: str,
+        query: str
+    ) -> Dict[str, Any]:
+        """
+        Uses the LLM to generate a structured comparison of two texts.
+        """
+        prompt = self._comparison_prompt(text1, text2, name1, name2, query)
+
         # Use a temporary, specific generation config for this task
         json_gen_config = {
             "temperature": 0.1,
             "response_mime_type": "application/json",
         }
 
-        # We don't need conversation history for this one-off task
+        # We don't need conversation history for this one-off task.
+        # Comparisons are background work, so chat requests are scheduled ahead of them.
         response_text = self.llm.generate(
             prompt=prompt,
             history=[],
-            context={"generation_config": json_gen_config} # Pass a special config
+            context={"generation_config": json_gen_config}, # Pass a special config
+            priority=BULK
         )
 
         try:
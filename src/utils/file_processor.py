@@ -1,14 +1,163 @@
 import os
 import re
-from typing import Dict, Union, List, Optional, Any
+from typing import Dict, Union, List, Optional, Any, Iterator, Tuple
 from PyPDF2 import PdfReader
-from PIL import Image
-import pytesseract
-import docx
+from PIL import Image, ImageSequence
 import logging
 import filetype  # <-- Replaced 'magic' with 'filetype'
+import io
 from io import BytesIO
+import codecs
+import hashlib
+import mmap
+import multiprocessing
+import shutil
+import tempfile
+import threading
+import time
 import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from src.config.ingest import IngestConfig
+from src.utils.cache import PersistentCache
+from src.utils.ocr import OCREngine, OCRJob, ocr_engine
+from src.utils.ooxml import iter_docx_text, iter_pptx_slides
+
+# Part of every extraction cache key: bump it whenever extraction output changes,
+# so results cached by older code are ignored.
+EXTRACTOR_VERSION = "4"
+
+# filetype inspects at most this many leading bytes.
+FILETYPE_HEADER_BYTES = 8192
+
+# Global instance shared by all sessions, keyed by file content.
+extraction_cache = PersistentCache(
+    IngestConfig.EXTRACTION_CACHE_DIR, IngestConfig.EXTRACTION_CACHE_MAX_MB * 1024 * 1024
+)
+
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool_lock = threading.Lock()
+
+def _pdf_process_pool() -> ProcessPoolExecutor:
+    """
+    The PDF extraction pool, shared by every session so that `PDF_MAX_WORKERS`
+    bounds extraction processes overall. Workers are spawned rather than forked:
+    this process holds the embedding model and OCR and ingest threads, which a
+    forked child would inherit in an unknown state.
+    """
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=max(1, IngestConfig.PDF_MAX_WORKERS), mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pdf_pool
+
+def _discard_pdf_pool(pool: ProcessPoolExecutor) -> None:
+    """Drops a broken pool, so the next PDF starts a fresh one."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is pool:
+            _pdf_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _extract_pdf_pages(pdf_path: str, start: int, stop: int) -> List[Tuple[str, float]]:
+    """
+    Extracts the text of pages [start, stop) of a PDF file, timing each page.
+
+    Runs in a worker process, so it must stay a picklable module-level function.
+    """
+    reader = PdfReader(pdf_path)
+    pages = []
+    for page in reader.pages[start:stop]:
+        page_start = time.perf_counter()
+        text = page.extract_text() or ""
+        pages.append((text, time.perf_counter() - page_start))
+    return pages
+
+class UploadBuffer(io.RawIOBase):
+    """
+    A read-only, seekable file object over an upload's bytes that avoids copying them.
+
+    Streamlit uploads (and other BytesIO objects) are read through a memoryview of
+    their own buffer, and raw bytes are wrapped as they are. Any other stream is
+    spooled into a temporary file, which is memory-mapped once it outgrows
+    `IngestConfig.SPOOL_MAX_MEMORY_MB`. Closing the buffer releases the view, so the
+    underlying upload can be freed.
+    """
+    def __init__(self, file):
+        super().__init__()
+        self._spool = None
+        self._mmap = None
+        self._pos = 0
+        if hasattr(file, "getbuffer"):
+            self._view = file.getbuffer()
+        elif isinstance(file, (bytes, bytearray, memoryview)):
+            self._view = memoryview(file)
+        else:
+            self._view = self._spool_stream(file)
+        self._view = self._view.cast("B")
+
+    def _spool_stream(self, stream) -> memoryview:
+        max_memory = IngestConfig.SPOOL_MAX_MEMORY_MB * 1024 * 1024
+        self._spool = tempfile.SpooledTemporaryFile(max_size=max_memory)
+        shutil.copyfileobj(stream, self._spool)
+        size = self._spool.tell()
+        self._spool.seek(0)
+        if size <= max_memory:
+            view = memoryview(self._spool.read())
+            self._spool.close()
+            self._spool = None
+            return view
+        if size == 0:
+            return memoryview(b"")
+        self._mmap = mmap.mmap(self._spool.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._mmap)
+
+    def getbuffer(self) -> memoryview:
+        """The upload's bytes, without a copy."""
+        return self._view
+
+    def getvalue(self) -> bytes:
+        """A copy of the upload's bytes, for consumers that need a `bytes` object."""
+        return bytes(self._view)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        chunk = self._view[self._pos:self._pos + len(b)]
+        n = len(chunk)
+        b[:n] = chunk
+        self._pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def __len__(self) -> int:
+        return len(self._view)
+
+    def close(self) -> None:
+        if not self.closed:
+            try:
+                self._view.release()
+            except BufferError:  # a consumer still holds an export; freed when it is dropped
+                logging.debug("Upload buffer still exported at close.")
+            if self._mmap is not None:
+                self._mmap.close()
+            if self._spool is not None:
+                self._spool.close()
+        super().close()
 
 class FileProcessor:
     """
@@ -16,7 +165,15 @@ class FileProcessor:
     without external dependencies on Windows.
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        pdf_workers: int = IngestConfig.PDF_MAX_WORKERS,
+        ocr: Optional[OCREngine] = None,
+        cache: Optional[PersistentCache] = None,
+    ):
+        self.pdf_workers = pdf_workers
+        self.ocr = ocr if ocr is not None else ocr_engine
+        self.cache = cache if cache is not None else extraction_cache
         # Mapping from detected extension to the appropriate processing method
         self.file_type_map = {
             "pdf": self._process_pdf,
@@ -27,6 +184,18 @@ class FileProcessor:
             "txt": self._process_text,
             "pptx": self._process_pptx
         }
+        # Types whose text can be extracted incrementally, piece by piece
+        self.text_stream_map = {
+            "pdf": self._iter_pdf_text,
+            "docx": self._iter_docx_text,
+            "png": self._iter_image_text,
+            "jpg": self._iter_image_text,
+            "jpeg": self._iter_image_text,
+            "txt": self._iter_plain_text,
+            "pptx": self._iter_pptx_text,
+        }
+        # Paged types stream one page (or slide) per piece, joined by these separators
+        self.page_separators = {"pdf": "\n", "pptx": "\n\n"}
 
     def process_uploaded_file(self, file) -> Dict[str, Any]:
         """
@@ -37,18 +206,27 @@ class FileProcessor:
             A dictionary containing the processed file data.
         """
         try:
-            file_data = file.getvalue() if hasattr(file, 'getvalue') else file
             file_name = getattr(file, 'name', 'uploaded_file')
-            
-            # Detect file type using the new, more reliable method
-            file_type = self._detect_file_type(BytesIO(file_data), file_name)
-            processor = self.file_type_map.get(file_type, self._process_unknown)
-            processed_data = processor(BytesIO(file_data))
-            
+            with UploadBuffer(file) as buffer:
+                file_size = len(buffer)
+                cache_key = self._cache_key(buffer)
+
+                processed_data = self.cache.get(cache_key)
+                if processed_data is not None:
+                    logging.info(f"Extraction cache hit for {file_name}.")
+                    processed_data["cached"] = True
+                else:
+                    # Detect file type using the new, more reliable method
+                    file_type = self._detect_file_type(buffer, file_name)
+                    processor = self.file_type_map.get(file_type, self._process_unknown)
+                    processed_data = {"type": file_type, **processor(buffer)}
+                    processed_data.setdefault("page_map", [[0, len(processed_data["text"])]])
+                    if file_type in self.text_stream_map:
+                        self._cache_extraction(cache_key, processed_data)
+
             return {
                 "name": file_name,
-                "type": file_type,
-                "size": f"{len(file_data) / 1024:.1f} KB",
+                "size": f"{file_size / 1024:.1f} KB",
                 "status": "success",
                 **processed_data
             }
@@ -61,13 +239,111 @@ class FileProcessor:
                 "error": str(e)
             }
 
+    def stream_uploaded_file(self, file) -> Tuple[Dict[str, Any], Iterator[str]]:
+        """
+        Starts incremental text extraction for an uploaded file.
+
+        Args:
+            file: A Streamlit UploadedFile, bytes, or file-like object.
+        Returns:
+            A dictionary with the file's name, type and size, and an iterator over
+            consecutive pieces (e.g. pages) of its text. Extraction happens lazily as
+            the iterator is consumed, and errors are raised from it. Once the iterator
+            is exhausted, the dictionary also holds the text's page map, and the
+            iterator has released its view of the upload's bytes.
+        """
+        file_name = getattr(file, 'name', 'uploaded_file')
+        buffer = UploadBuffer(file)
+        cache_key = self._cache_key(buffer)
+        info = {"name": file_name, "size": f"{len(buffer) / 1024:.1f} KB"}
+
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            buffer.close()
+            logging.info(f"Extraction cache hit for {file_name}.")
+            info.update(type=cached["type"], page_map=cached["page_map"], cached=True)
+            return info, self._iter_cached_text(cached)
+
+        info["type"] = self._detect_file_type(buffer, file_name)
+        if info["type"] not in self.text_stream_map:
+            buffer.close()
+            return info, self._iter_no_text(buffer)
+        streamer = self.text_stream_map[info["type"]]
+        return info, self._iter_and_release(buffer, self._iter_and_cache(cache_key, info, streamer(buffer)))
+
+    def result_from_text(self, info: Dict[str, Any], text: str) -> Dict[str, Any]:
+        """Builds the same result as `process_uploaded_file` once a streamed extraction has finished."""
+        return {
+            **info,
+            "status": "success",
+            "text": text,
+            "preview": self._generate_preview(text),
+        }
+
+    def _cache_key(self, buffer: UploadBuffer) -> str:
+        """Content address of an upload: the SHA-256 of its bytes, plus the extractor version."""
+        return f"{hashlib.sha256(buffer.getbuffer()).hexdigest()}-v{EXTRACTOR_VERSION}"
+
+    def _iter_and_release(self, buffer: UploadBuffer, pieces: Iterator[str]) -> Iterator[str]:
+        """Passes pieces through and releases the upload's bytes when extraction ends or is abandoned."""
+        try:
+            yield from pieces
+        finally:
+            buffer.close()
+
+    def _cache_extraction(self, cache_key: str, processed_data: Dict[str, Any]) -> None:
+        """Stores an extraction result; a cache failure never fails the upload."""
+        entry = {key: processed_data[key] for key in ("type", "text", "preview", "page_map")}
+        try:
+            self.cache.put(cache_key, entry)
+        except OSError as e:
+            logging.warning(f"Could not write extraction cache entry: {e}")
+
+    def _iter_and_cache(self, cache_key: str, info: Dict[str, Any], pieces: Iterator[str]) -> Iterator[str]:
+        """Passes extracted pieces through, then caches the full result once extraction completes."""
+        parts: List[str] = []
+        for piece in pieces:
+            parts.append(piece)
+            yield piece
+        text = "".join(parts)
+        separator = self.page_separators.get(info["type"])
+        if separator is not None:
+            # Each piece is one page; every page after the first starts with the separator.
+            info["page_map"] = self._page_map(
+                (len(part) - (len(separator) if i else 0) for i, part in enumerate(parts)), separator
+            )
+        else:
+            info["page_map"] = [[0, len(text)]]
+        self._cache_extraction(cache_key, {
+            "type": info["type"], "text": text, "preview": self._generate_preview(text), "page_map": info["page_map"],
+        })
+
+    def _iter_cached_text(self, cached: Dict[str, Any]) -> Iterator[str]:
+        """Replays cached text page by page, in the same pieces a fresh extraction would yield."""
+        text, position = cached["text"], 0
+        for _, end in cached["page_map"]:
+            yield text[position:end]
+            position = end
+        if position < len(text):
+            yield text[position:]
+
+    @staticmethod
+    def _page_map(page_lengths, separator: str = "\n") -> List[List[int]]:
+        """[start, end) offsets of each page in text built by joining the pages with `separator`."""
+        page_map, start = [], 0
+        for length in page_lengths:
+            page_map.append([start, start + length])
+            start += length + len(separator)
+        return page_map
+
     def _detect_file_type(self, file_obj: BytesIO, file_name: str = "") -> str:
         """Robust file type detection using 'filetype' with fallback to extension."""
         try:
+            # Guess the file type from its header bytes only
             file_obj.seek(0)
-            # Guess the file type from the first 261 bytes of the file
-            kind = filetype.guess(file_obj)
+            header = file_obj.read(FILETYPE_HEADER_BYTES)
             file_obj.seek(0)
+            kind = filetype.guess(header)
             
             if kind is not None:
                 logging.info(f"Detected file type '{kind.extension}' using filetype library.")
@@ -86,17 +362,18 @@ class FileProcessor:
 
     def _process_pdf(self, file_obj: BytesIO) -> Dict[str, Any]:
         """Process PDF with text extraction."""
-        reader = PdfReader(file_obj)
-        text = "\n".join([page.extract_text() or "" for page in reader.pages])
+        pages = list(self._iter_pdf_pages(file_obj))
+        text = "\n".join(page_text for page_text, _ in pages)
         return {
             "text": text,
             "preview": self._generate_preview(text),
+            "page_map": self._page_map(len(page_text) for page_text, _ in pages),
+            "page_timings": [seconds for _, seconds in pages],
         }
 
     def _process_docx(self, file_obj: BytesIO) -> Dict[str, Any]:
         """Process DOCX documents."""
-        doc = docx.Document(file_obj)
-        text = "\n".join([para.text for para in doc.paragraphs])
+        text = "".join(self._iter_docx_text(file_obj))
         return {
             "text": text,
             "preview": self._generate_preview(text),
@@ -104,8 +381,7 @@ class FileProcessor:
 
     def _process_image(self, file_obj: BytesIO) -> Dict[str, Any]:
         """Process images with OCR."""
-        img = Image.open(file_obj)
-        text = pytesseract.image_to_string(img)
+        text = "".join(self._iter_image_text(file_obj))
         return {
             "text": text,
             "preview": self._generate_preview(text),
@@ -113,17 +389,20 @@ class FileProcessor:
 
     def _process_text(self, file_obj: BytesIO) -> Dict[str, Any]:
         """Process plain text files."""
-        text = file_obj.read().decode('utf-8', errors='replace')
+        text = "".join(self._iter_plain_text(file_obj))
         return {
             "text": text,
             "preview": self._generate_preview(text),
         }
 
     def _process_pptx(self, file_obj: BytesIO) -> Dict[str, Any]:
-        """Placeholder for PPTX processing."""
+        """Process PPTX presentations: slide text followed by speaker notes."""
+        slides = list(iter_pptx_slides(file_obj))
+        text = "\n\n".join(slides)
         return {
-            "text": "[PPTX content extraction is not fully supported yet.]",
-            "preview": "PowerPoint file detected. Full text extraction requires additional libraries.",
+            "text": text,
+            "preview": self._generate_preview(text),
+            "page_map": self._page_map((len(slide) for slide in slides), "\n\n"),
         }
 
     def _process_unknown(self, file_obj: BytesIO) -> Dict[str, Any]:
@@ -133,6 +412,176 @@ class FileProcessor:
             "preview": "Unsupported file type.",
         }
 
+    # --- Incremental extractors: each yields consecutive pieces whose concatenation is the full text ---
+
+    def _iter_pdf_text(self, file_obj: BytesIO) -> Iterator[str]:
+        """Yields PDF text page by page, newline-separated."""
+        for i, (page_text, _) in enumerate(self._iter_pdf_pages(file_obj)):
+            yield ("\n" if i else "") + page_text
+
+    def _iter_pdf_pages(self, file_obj: BytesIO) -> Iterator[Tuple[str, float]]:
+        """
+        Yields (text, seconds) for each PDF page, in page order.
+
+        Pages without a text layer (scans) are OCR'd from their embedded images.
+        OCR jobs run ahead of the page being yielded, so consecutive scanned pages
+        are recognized concurrently while the output stays in page order.
+        """
+        reader = PdfReader(file_obj)
+        timings: List[float] = []
+        start_time = time.perf_counter()
+        pending: "deque[Tuple[Union[str, OCRJob], float]]" = deque()
+        ocr_pages = 0
+
+        def resolve(item: Tuple[Union[str, OCRJob], float]) -> Tuple[str, float]:
+            text, seconds = item
+            if isinstance(text, OCRJob):
+                # A scanned page can only add text; it never fails the rest of the document.
+                try:
+                    return text.result(), seconds + text.seconds
+                except Exception as e:
+                    logging.warning(f"OCR failed for a scanned PDF page, skipping its text: {e}")
+                    return "", seconds
+            return text, seconds
+
+        for index, (page_text, seconds) in enumerate(self._iter_pdf_text_layer(file_obj, reader)):
+            if not page_text.strip() and (images := self._pdf_page_images(reader.pages[index])):
+                pending.append((self.ocr.submit(images), seconds))
+                ocr_pages += 1
+            else:
+                pending.append((page_text, seconds))
+            while pending and (
+                not isinstance(pending[0][0], OCRJob) or pending[0][0].done() or len(pending) > self.ocr.max_workers
+            ):
+                page_text, seconds = resolve(pending.popleft())
+                timings.append(seconds)
+                yield page_text, seconds
+        while pending:
+            page_text, seconds = resolve(pending.popleft())
+            timings.append(seconds)
+            yield page_text, seconds
+
+        if timings:
+            logging.info(
+                f"Extracted {len(timings)} PDF pages ({ocr_pages} via OCR) in {time.perf_counter() - start_time:.2f}s "
+                f"(per page: mean {sum(timings) / len(timings) * 1000:.0f}ms, max {max(timings) * 1000:.0f}ms)."
+            )
+
+    def _iter_pdf_text_layer(self, file_obj: BytesIO, reader: PdfReader) -> Iterator[Tuple[str, float]]:
+        """
+        Yields (text, seconds) from each page's text layer, in page order.
+
+        Large PDFs are split into one contiguous page range per worker, extracted
+        concurrently in the shared process pool (PyPDF2 is pure Python and CPU-bound);
+        the output is identical to extracting the pages one after another.
+        """
+        page_count = len(reader.pages)
+        workers = min(self.pdf_workers, page_count // IngestConfig.PDF_MIN_PAGES_PER_WORKER)
+        if workers < 2 or page_count < IngestConfig.PDF_PARALLEL_MIN_PAGES:
+            yield from self._iter_pdf_pages_serially(reader, 0)
+            return
+
+        # Workers open the PDF from a temporary file, so only its path is pickled.
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as pdf_file:
+            pdf_file.write(file_obj.getbuffer())
+        bounds = [page_count * k // workers for k in range(workers + 1)]
+        pool = _pdf_process_pool()
+        futures = []
+        extracted = 0
+        try:
+            futures = [pool.submit(_extract_pdf_pages, pdf_file.name, start, stop) for start, stop in zip(bounds, bounds[1:])]
+            # Collect in submission order so pages stream out in document order.
+            for future in futures:
+                for page in future.result():
+                    extracted += 1
+                    yield page
+        except BrokenProcessPool as e:
+            logging.warning(f"PDF extraction pool failed ({e}); extracting the remaining pages in-process.")
+            _discard_pdf_pool(pool)
+            yield from self._iter_pdf_pages_serially(reader, extracted)
+        finally:
+            for future in futures:
+                future.cancel()
+            try:
+                os.unlink(pdf_file.name)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _iter_pdf_pages_serially(reader: PdfReader, start: int) -> Iterator[Tuple[str, float]]:
+        for page in reader.pages[start:]:
+            page_start = time.perf_counter()
+            page_text = page.extract_text() or ""
+            yield page_text, time.perf_counter() - page_start
+
+    def _pdf_page_images(self, page) -> List[Image.Image]:
+        """Decodes the images embedded in a PDF page; unreadable images are skipped."""
+        images = []
+        try:
+            for embedded in page.images:
+                try:
+                    images.append(Image.open(BytesIO(embedded.data)))
+                except Exception as e:
+                    logging.warning(f"Skipping undecodable image {embedded.name} in scanned PDF page: {e}")
+        except Exception as e:
+            logging.warning(f"Could not read images from PDF page: {e}")
+        return images
+
+    def _iter_docx_text(self, file_obj: BytesIO) -> Iterator[str]:
+        """Yields DOCX text paragraph by paragraph (tables row by row, then notes, headers and footers), newline-separated."""
+        for i, block in enumerate(iter_docx_text(file_obj)):
+            yield ("\n" if i else "") + block
+
+    def _iter_pptx_text(self, file_obj: BytesIO) -> Iterator[str]:
+        """Yields PPTX text slide by slide, separated by blank lines."""
+        for i, slide in enumerate(iter_pptx_slides(file_obj)):
+            yield ("\n\n" if i else "") + slide
+
+    def _iter_image_text(self, file_obj: BytesIO) -> Iterator[str]:
+        """
+        Yields the OCR text of an image, frame by frame for multi-page images
+        (e.g. TIFF), newline-separated.
+
+        As with scanned PDF pages, frames are decoded and submitted only a few ahead
+        of the one being yielded, so a long multi-page scan is never held in memory
+        at once while consecutive frames are still recognized concurrently.
+        """
+        img = Image.open(file_obj)
+        pending: "deque[OCRJob]" = deque()
+        start_time = time.perf_counter()
+        frames = 0
+        tesseract_seconds = 0.0
+
+        def resolve(job: OCRJob) -> str:
+            nonlocal frames, tesseract_seconds
+            text = ("\n" if frames else "") + job.result()
+            tesseract_seconds += job.seconds
+            frames += 1
+            return text
+
+        for frame in ImageSequence.Iterator(img):
+            pending.append(self.ocr.submit(frame.copy()))
+            while pending and (pending[0].done() or len(pending) > self.ocr.max_workers):
+                yield resolve(pending.popleft())
+        while pending:
+            yield resolve(pending.popleft())
+
+        logging.info(
+            f"OCR'd {frames} image frame(s) in {time.perf_counter() - start_time:.2f}s "
+            f"({tesseract_seconds:.2f}s of tesseract time across {self.ocr.max_workers} worker(s))."
+        )
+
+    def _iter_plain_text(self, file_obj: BytesIO, block_size: int = 1 << 16) -> Iterator[str]:
+        """Yields a UTF-8 text file in fixed-size blocks."""
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        while block := file_obj.read(block_size):
+            yield decoder.decode(block)
+        yield decoder.decode(b"", final=True)
+
+    def _iter_no_text(self, file_obj: BytesIO) -> Iterator[str]:
+        """Unsupported or placeholder types contribute no indexable text."""
+        return iter(())
+
     def _generate_preview(self, text: str, max_len: int = 250) -> str:
         """Generate a clean preview of the text."""
         if not text:
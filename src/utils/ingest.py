@@ -0,0 +1,173 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+class IngestionCancelled(Exception):
+    """Raised inside a running job when its file is removed before ingestion finishes."""
+
+class IngestJob:
+    """
+    One uploaded file's trip through extraction, chunking, embedding and indexing.
+
+    Status moves from "queued" to "running" to "done", "error" or "cancelled". The
+    worker thread updates the counters as it goes, and the UI only reads them.
+    """
+    def __init__(self, doc_id: str, name: str, file: Any):
+        self.doc_id = doc_id
+        self.name = name
+        self.file = file  # Dropped once ingestion ends, so the upload's bytes can be freed
+        self.status = "queued"
+        self.pages = 0  # Extracted pieces (pages, slides, paragraphs or blocks) so far
+        self.chunks = 0  # Chunks indexed so far
+        self.result: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._cancelled = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "error", "cancelled")
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def describe(self) -> str:
+        """A one-line progress summary for the sidebar."""
+        if self.status == "queued":
+            return "queued"
+        if self.status == "running":
+            return f"indexing: {self.pages} parts read, {self.chunks} chunks indexed"
+        if self.status == "done":
+            return f"ready: {self.chunks} chunks in {self.finished_at - self.started_at:.1f}s"
+        if self.status == "error":
+            return f"failed: {self.error}"
+        return "cancelled"
+
+class IngestWorker:
+    """
+    A per-session background ingestion queue.
+
+    Jobs run one at a time on a daemon thread, so the chat stays responsive while
+    files are processed and each document becomes searchable as soon as it is
+    indexed. Jobs are serial because a retriever streams in one document at a time;
+    extraction itself still fans out across processes (PDF pages) and threads (OCR).
+    The thread exits when the queue is empty, and it starts again on the next submit.
+    Before exiting, it saves one snapshot of the retriever's corpus for the whole run
+    of uploads, rather than one per document.
+    """
+    def __init__(self, file_processor, retriever):
+        self.file_processor = file_processor
+        self.retriever = retriever
+        self._jobs: Dict[str, IngestJob] = {}
+        self._queue: "queue.Queue[IngestJob]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def jobs(self) -> List[IngestJob]:
+        """Every submitted job, in submission order."""
+        with self._lock:
+            return list(self._jobs.values())
+
+    @property
+    def busy(self) -> bool:
+        return any(not job.finished for job in self.jobs)
+
+    def job(self, doc_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            return self._jobs.get(doc_id)
+
+    def submit(self, doc_id: str, name: str, file: Any) -> IngestJob:
+        """Queues a file for ingestion under `doc_id` and makes sure the worker thread is running."""
+        job = IngestJob(doc_id, name, file)
+        with self._lock:
+            previous = self._jobs.pop(doc_id, None)
+            if previous is not None:
+                previous.cancel()
+            self._jobs[doc_id] = job
+            self._queue.put(job)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="ingest-worker", daemon=True)
+                self._thread.start()
+        return job
+
+    def cancel(self, doc_id: str) -> bool:
+        """Stops ingesting a document (queued or running) and forgets its job."""
+        with self._lock:
+            job = self._jobs.pop(doc_id, None)
+        if job is None:
+            return False
+        job.cancel()
+        return True
+
+    def _run(self) -> None:
+        indexed = False
+        while True:
+            with self._lock:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    self._thread = None
+                    break
+            indexed = self._process(job) or indexed
+        if indexed:
+            self.retriever.save()
+
+    def _process(self, job: IngestJob) -> bool:
+        """Runs one job, returning True if it indexed a document that no saved snapshot holds."""
+        if job.cancelled:
+            job.status = "cancelled"
+            job.file = None
+            return False
+        indexed = False
+        job.status, job.started_at = "running", time.time()
+        try:
+            info, pieces = self.file_processor.stream_uploaded_file(job.file)
+            if info.get("cached"):
+                # The extraction cache replays text already in memory, so the chunks are
+                # known up front and a saved index of the resulting corpus can be reused.
+                pieces = list(pieces)
+            if info.get("cached") and self.retriever.load_streamed(job.doc_id, pieces):
+                job.pages = len(pieces)
+                job.chunks = len(self.retriever.store.doc_ranges[job.doc_id])
+            else:
+                self.retriever.ingest_stream(
+                    job.doc_id, self._track(job, pieces), {"name": job.name},
+                    on_batch=lambda chunks: setattr(job, "chunks", chunks)
+                )
+                indexed = True
+            text = self.retriever.store.texts.get(job.doc_id, "")
+            job.result = self.file_processor.result_from_text(info, text)
+            job.status = "done"
+        except IngestionCancelled:
+            job.status = "cancelled"
+        except Exception as e:
+            if job.cancelled:
+                job.status = "cancelled"
+            else:
+                logging.error(f"Failed to ingest {job.name}: {e}", exc_info=True)
+                job.error = str(e)
+                job.result = {"name": job.name, "status": "error", "error": str(e)}
+                job.status = "error"
+        finally:
+            job.finished_at = time.time()
+            job.file = None
+        if job.status == "cancelled":
+            # A cancelled document may have finished indexing just before the cancel landed.
+            self.retriever.remove_document(job.doc_id)
+        return indexed and job.status == "done"
+
+    def _track(self, job: IngestJob, pieces: Iterable[str]) -> Iterator[str]:
+        """Counts extracted pieces and stops extraction when the job is cancelled."""
+        for piece in pieces:
+            if job.cancelled:
+                raise IngestionCancelled(job.doc_id)
+            job.pages += 1
+            yield piece
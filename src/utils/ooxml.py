@@ -0,0 +1,178 @@
+"""
+Streaming text extraction for Office Open XML documents (DOCX and PPTX).
+
+Parts are read straight out of the zip container and parsed with
+`ElementTree.iterparse`, emitting text as each paragraph closes and discarding
+parsed elements, so memory stays flat regardless of document size.
+"""
+import posixpath
+import re
+import zipfile
+from typing import IO, Dict, Iterator, List, Optional
+from xml.etree import ElementTree as ET
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+P = "{http://schemas.openxmlformats.org/presentationml/2006/main}"
+R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+# Alternate content repeats its "Choice" markup as a "Fallback" for older readers.
+MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+NOTES_SLIDE_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/notesSlide"
+
+def _part_number(name: str) -> int:
+    match = re.search(r"(\d+)\.xml$", name)
+    return int(match.group(1)) if match else 0
+
+def _iter_word_blocks(stream: IO[bytes], keep_empty: bool) -> Iterator[str]:
+    """
+    Yields the text blocks of one WordprocessingML part: a paragraph, or a table
+    row with its cells joined by " | ". Nested tables are flattened into their cell.
+    """
+    paragraphs: List[List[str]] = []  # open paragraphs (text boxes can nest them)
+    tables: List[List[List[str]]] = []  # open tables: cells of the current row, each a list of paragraphs
+    runs = 0
+    fallback = 0
+
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        tag = elem.tag
+        if tag == MC_FALLBACK:
+            fallback += 1 if event == "start" else -1
+        if fallback:
+            continue
+
+        if event == "start":
+            if tag == W + "p":
+                paragraphs.append([])
+            elif tag == W + "r":
+                runs += 1
+            elif tag == W + "tbl":
+                tables.append([])
+            elif tag == W + "tr":
+                tables[-1] = []
+            elif tag == W + "tc":
+                tables[-1].append([])
+            continue
+
+        if tag == W + "t" and paragraphs:
+            paragraphs[-1].append(elem.text or "")
+        elif tag == W + "r":
+            runs -= 1
+        elif runs and paragraphs and tag == W + "tab":
+            paragraphs[-1].append("\t")
+        elif runs and paragraphs and tag in (W + "br", W + "cr"):
+            paragraphs[-1].append("\n")
+        elif tag == W + "p":
+            text = "".join(paragraphs.pop())
+            if tables and tables[-1]:
+                tables[-1][-1].append(text)
+            elif text or keep_empty:
+                yield text
+        elif tag == W + "tr":
+            cells = [" ".join(p for p in cell if p) for cell in tables[-1]]
+            if any(cells):
+                row = " | ".join(cells)
+                if len(tables) > 1 and tables[-2]:
+                    tables[-2][-1].append(row)
+                else:
+                    yield row
+        elif tag == W + "tbl":
+            tables.pop()
+        elem.clear()
+
+def iter_docx_text(file: IO[bytes]) -> Iterator[str]:
+    """
+    Yields the text blocks of a DOCX file: body paragraphs and table rows in
+    document order, then footnotes and endnotes, then the distinct header and
+    footer lines.
+    """
+    with zipfile.ZipFile(file) as archive:
+        names = set(archive.namelist())
+        with archive.open("word/document.xml") as part:
+            yield from _iter_word_blocks(part, keep_empty=True)
+
+        for name in ("word/footnotes.xml", "word/endnotes.xml"):
+            if name in names:
+                with archive.open(name) as part:
+                    yield from _iter_word_blocks(part, keep_empty=False)
+
+        # Headers and footers repeat across sections; keep each line once.
+        seen = set()
+        for name in sorted(
+            (n for n in names if re.fullmatch(r"word/(header|footer)\d*\.xml", n)),
+            key=lambda n: (not n.startswith("word/header"), _part_number(n)),
+        ):
+            with archive.open(name) as part:
+                for block in _iter_word_blocks(part, keep_empty=False):
+                    if block not in seen:
+                        seen.add(block)
+                        yield block
+
+def _iter_drawing_paragraphs(stream: IO[bytes]) -> Iterator[str]:
+    """Yields the non-empty DrawingML paragraphs of a slide or notes part, skipping slide-number fields."""
+    paragraph: Optional[List[str]] = None
+    slide_number_field = 0
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            if tag == A + "p":
+                paragraph = []
+            elif tag == A + "fld" and elem.get("type") == "slidenum":
+                slide_number_field += 1
+            continue
+        if tag == A + "t" and paragraph is not None and not slide_number_field:
+            paragraph.append(elem.text or "")
+        elif tag == A + "br" and paragraph is not None:
+            paragraph.append("\n")
+        elif tag == A + "fld" and elem.get("type") == "slidenum":
+            slide_number_field -= 1
+        elif tag == A + "p" and paragraph is not None:
+            text = "".join(paragraph).strip()
+            paragraph = None
+            if text:
+                yield text
+        elem.clear()
+
+def _relationships(archive: zipfile.ZipFile, part: str) -> Dict[str, ET.Element]:
+    """Reads a part's relationships, keyed by ID, with targets resolved to archive paths."""
+    rels_name = posixpath.join(posixpath.dirname(part), "_rels", posixpath.basename(part) + ".rels")
+    if rels_name not in archive.namelist():
+        return {}
+    relationships = {}
+    for rel in ET.fromstring(archive.read(rels_name)).iter(PKG_REL + "Relationship"):
+        target = rel.get("Target", "")
+        rel.set("Target", posixpath.normpath(posixpath.join(posixpath.dirname(part), target)).lstrip("/"))
+        relationships[rel.get("Id")] = rel
+    return relationships
+
+def _slide_parts(archive: zipfile.ZipFile) -> List[str]:
+    """Slide part names in presentation order, falling back to slide numbering."""
+    try:
+        relationships = _relationships(archive, "ppt/presentation.xml")
+        presentation = ET.fromstring(archive.read("ppt/presentation.xml"))
+        slides = [relationships[s.get(R + "id")].get("Target") for s in presentation.iter(P + "sldId")]
+        if slides:
+            return slides
+    except (KeyError, ET.ParseError):
+        pass
+    return sorted(
+        (n for n in archive.namelist() if re.fullmatch(r"ppt/slides/slide\d+\.xml", n)), key=_part_number
+    )
+
+def iter_pptx_slides(file: IO[bytes]) -> Iterator[str]:
+    """Yields the text of each PPTX slide in presentation order, followed by its speaker notes."""
+    with zipfile.ZipFile(file) as archive:
+        for number, slide in enumerate(_slide_parts(archive), start=1):
+            with archive.open(slide) as part:
+                lines = [f"Slide {number}:", *_iter_drawing_paragraphs(part)]
+            notes = [
+                rel.get("Target") for rel in _relationships(archive, slide).values()
+                if rel.get("Type") == NOTES_SLIDE_REL
+            ]
+            if notes:
+                with archive.open(notes[0]) as part:
+                    note_lines = list(_iter_drawing_paragraphs(part))
+                if note_lines:
+                    lines += ["Notes:", *note_lines]
+            yield "\n".join(lines)
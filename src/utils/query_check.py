@@ -1,4 +1,4 @@
-from typing import List, Dict, Set
+from typing import List, Dict, Set, Tuple
 import re
 
 class QueryClassifier:
@@ -18,7 +18,8 @@ class QueryClassifier:
             r"Section \d+ [A-Z]{2,10}",  # "Section 123 ABC"
             r"[A-Z]{2,10}-\d{4}",  # "HR-1234"
             r"Article [IVXLCDM]+",  # Roman numeral articles
-            r"\b\d+ [A-Z][a-z]+ Code"  # "42 US Code"
+            r"\b\d+ [A-Z][a-z]+ Code",  # "42 US Code"
+            r"\bForm [A-Z]?-?\d+\b"  # "Form 1099", "Form W-2"
         ]
         
         # Common legal entity patterns
@@ -88,6 +89,26 @@ class QueryClassifier:
             
         return min(5, score)
         
+    def citation_spans(self, query: str) -> List[Tuple[int, int]]:
+        """
+        Finds exact references (priority patterns and acronyms) in a query. Acronyms
+        only count when the query also has lowercase letters or is a single word.
+        
+        Args:
+            query: User input string
+            
+        Returns:
+            List[Tuple[int, int]]: (start, end) character spans, possibly overlapping
+        """
+        if not query:
+            return []
+            
+        patterns = list(self.priority_patterns)
+        # In an all-caps sentence every word looks like an acronym, so capitals say nothing.
+        if any(c.islower() for c in query) or len(query.split()) == 1:
+            patterns.append(self.entity_patterns["acronym"])
+        return [m.span() for p in patterns for m in re.finditer(p, query)]
+        
     def _extract_entities(self, query: str) -> List[str]:
         """
         Extracts key legal/business entities from query
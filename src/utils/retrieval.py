@@ -1,60 +1,925 @@
 import faiss
 import numpy as np
-from typing import List, Dict, Tuple
-from src.models.embeddings import LegalEmbedder
+from typing import Any, Callable, Iterable, List, Dict, Tuple, Optional, Sequence, Union
+from src.config.retrieval import RetrievalConfig
+from src.models.embeddings import LegalEmbedder, EmbeddingCache
+from src.utils.cache import LRUCache
+from src.utils.chunk_store import ChunkStore
+from src.utils.query_check import query_classifier
+from src.utils.text_splitter import RecursiveTextSplitter
+import hashlib
+import json
 import logging
-# Import the new text splitter from langchain
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import math
+from collections import Counter, defaultdict
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from functools import wraps
+from pathlib import Path
+
+# Shared by every retriever in the process; query vectors do not depend on the index.
+query_vector_cache = LRUCache(RetrievalConfig.QUERY_CACHE_SIZE)
+
+def normalize_query(query: str) -> str:
+    """Collapses whitespace and case, which the (uncased) embedding model ignores anyway."""
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i in is it its of on or "
+    "our that the their this to was we what when where which who why will with you your".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens with stopwords removed, for lexical matching."""
+    return [t for t in re.findall(r"\w+", text.lower()) if t not in STOPWORDS]
+
+class BM25Index:
+    """
+    An incrementally maintained inverted index scoring chunks with Okapi BM25.
+
+    Catches the exact tokens (form numbers, section citations, acronyms) that dense
+    embeddings tend to blur.
+    """
+    def __init__(self, k1: float = RetrievalConfig.BM25_K1, b: float = RetrievalConfig.BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)  # {term: {chunk_id: term frequency}}
+        self.lengths: Dict[int, int] = {}  # {chunk_id: token count}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def add(self, chunk_id: int, text: str) -> None:
+        tokens = tokenize(text)
+        for term, tf in Counter(tokens).items():
+            self.postings[term][chunk_id] = tf
+        self.lengths[chunk_id] = len(tokens)
+        self._total_length += len(tokens)
+
+    def remove(self, chunk_id: int, text: str) -> None:
+        """Removes a chunk; `text` must be the text it was added with."""
+        if chunk_id not in self.lengths:
+            return
+        for term in set(tokenize(text)):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self.postings[term]
+        self._total_length -= self.lengths.pop(chunk_id)
+
+    def search(self, query: str, k: int, min_share: float = 0.0) -> List[Tuple[int, float]]:
+        """
+        Returns up to k (chunk_id, BM25 score) pairs with a positive score, best first.
+
+        Chunks scoring below `min_share` of the query's reference score (that of an
+        average-length chunk holding each query term found in the index once) are left out.
+        """
+        if not self.lengths:
+            return []
+        n_chunks = len(self.lengths)
+        avg_length = self._total_length / n_chunks or 1.0
+        scores: Dict[int, float] = defaultdict(float)
+        reference = 0.0
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_chunks - len(postings) + 0.5) / (len(postings) + 0.5))
+            reference += idf
+            for chunk_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[chunk_id] / avg_length)
+                scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        floor = min_share * reference
+        return sorted(((i, s) for i, s in scores.items() if s >= floor), key=lambda x: x[1], reverse=True)[:k]
+
+def is_citation_query(query: str) -> bool:
+    """True when most of a query's content words are exact references, e.g. "Form 1099 deadline"."""
+    words = [(m.start(), m.end()) for m in re.finditer(r"\w+", query) if m.group().lower() not in STOPWORDS]
+    if not words:
+        return False
+    spans = query_classifier.citation_spans(query)
+    covered = sum(1 for start, end in words if any(s <= start and end <= e for s, e in spans))
+    return covered / len(words) >= RetrievalConfig.LEXICAL_ONLY_CITATION_SHARE
+
+def choose_index_kind(n_vectors: int) -> str:
+    """Picks the FAISS backend for a corpus of `n_vectors` chunks."""
+    if n_vectors <= RetrievalConfig.FLAT_MAX_VECTORS:
+        return "flat"
+    if n_vectors <= RetrievalConfig.HNSW_MAX_VECTORS:
+        return "hnsw"
+    return "ivf"
+
+def make_index(
+    dim: int,
+    kind: str = "auto",
+    training_vectors: Optional[np.ndarray] = None
+) -> faiss.Index:
+    """
+    Builds an empty, ID-mapped, inner-product FAISS index.
+
+    Args:
+        dim: The embedding dimension.
+        kind: "flat", "hnsw", "ivf", or "auto" to choose from the training set size.
+        training_vectors: The vectors that will be indexed; required to train IVF.
+
+    Returns:
+        A FAISS index that accepts `add_with_ids`.
+    """
+    n_vectors = 0 if training_vectors is None else len(training_vectors)
+    if kind == "auto":
+        kind = choose_index_kind(n_vectors)
+
+    if kind == "flat":
+        base = faiss.IndexFlatIP(dim)
+    elif kind == "hnsw":
+        base = faiss.IndexHNSWFlat(dim, RetrievalConfig.HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        base.hnsw.efConstruction = RetrievalConfig.HNSW_EF_CONSTRUCTION
+        base.hnsw.efSearch = RetrievalConfig.HNSW_EF_SEARCH
+    elif kind == "ivf":
+        if not n_vectors:
+            raise ValueError("An IVF index needs training vectors.")
+        nlist = max(1, min(
+            int(RetrievalConfig.IVF_LISTS_PER_SQRT_N * math.sqrt(n_vectors)),
+            n_vectors // RetrievalConfig.IVF_MIN_POINTS_PER_LIST
+        ))
+        quantizer = faiss.IndexFlatIP(dim)
+        base = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        base.train(np.ascontiguousarray(training_vectors, dtype=np.float32))
+        base.nprobe = min(RetrievalConfig.IVF_NPROBE, nlist)
+    else:
+        raise ValueError(f"Unknown index kind '{kind}'.")
+
+    return faiss.IndexIDMap2(base)
+
+def _hash_chunks(chunks: Iterable[str], digest: Optional[Any] = None):
+    """Feeds a document's chunk texts, in order, into its running hash (a new one by default)."""
+    if digest is None:
+        digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(b"\0chunk\0" + chunk.encode())
+    return digest
+
+def _combine_digests(digests: Dict[str, str], model_name: str, index_kind: str) -> str:
+    digest = hashlib.sha256(f"{model_name}\0{index_kind}".encode())
+    for doc_id in sorted(digests):
+        digest.update(f"\0doc\0{doc_id}\0{digests[doc_id]}".encode())
+    return digest.hexdigest()
+
+def corpus_fingerprint(documents: Dict[str, List[str]], model_name: str, index_kind: str) -> str:
+    """
+    A stable hash of a corpus: its documents' IDs and chunk texts, plus the embedding
+    model and index setting. Document order does not matter.
+    """
+    digests = {doc_id: _hash_chunks(chunks).hexdigest() for doc_id, chunks in documents.items()}
+    return _combine_digests(digests, model_name, index_kind)
+
+def _synchronized(method):
+    """Runs a VectorRetriever method under the retriever's lock."""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
 
 class VectorRetriever:
-    """Manages the FAISS vector index for efficient semantic search."""
-    def __init__(self):
-        self.embedder = LegalEmbedder()
+    """
+    Manages the FAISS vector index for efficient semantic search.
+
+    Chunks are stored under stable integer IDs in an ID-mapped index, and each
+    document owns a contiguous range of those IDs, so documents can be added or
+    removed without re-embedding the rest of the corpus. Chunk text lives in a
+    ChunkStore as offsets into each document, and is only sliced out for results.
+
+    The retriever is thread-safe: a background ingestion thread can stream a
+    document in while searches run. Embedding (of chunks and queries), rebuilding
+    the index and writing snapshots all happen outside the lock, so searches only
+    wait for the brief index updates and lookups.
+    """
+    def __init__(
+        self,
+        embedder: Optional[LegalEmbedder] = None,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        index_kind: str = RetrievalConfig.INDEX_KIND,
+        index_dir: Optional[str] = RetrievalConfig.INDEX_DIR,
+        result_cache_size: int = RetrievalConfig.RESULT_CACHE_SIZE,
+        search_mode: str = RetrievalConfig.SEARCH_MODE
+    ):
+        # LegalEmbedder resolves to the process-wide shared model, so this is cheap per session.
+        self.embedder = embedder or LegalEmbedder()
+        # Chunk embeddings are read through the persistent store, so documents seen by
+        # any session (or before a restart) are never re-encoded.
+        self.embedding_cache = embedding_cache if embedding_cache is not None else EmbeddingCache(self.embedder)
+        self.index_kind = index_kind
         self.index = None
-        self.documents = []
-        
+        self.active_kind: Optional[str] = None  # The backend the current index was built with
+        self._tombstones = 0  # Removed chunks still present in an HNSW index
+        self._pending_kind: Optional[str] = None  # Set when the index should be rebuilt (see _rebuild_pending)
+        self._rebuilding = False
+        self._unindexed: Dict[int, range] = {}  # Chunks stored but still being embedded, by first ID
+        self.store = ChunkStore()
+        self.index_dir = Path(index_dir) if index_dir else None
+        self._mapped_from: Optional[Path] = None  # Set while the index is a read-only memory map
+        self.search_mode = search_mode
+        self._lexical_index: Optional[BM25Index] = BM25Index()  # None until rebuilt after a load()
+        self.index_version = 0  # Bumped on every change, so cached results never outlive their index
+        self._doc_digests: Dict[str, str] = {}  # {doc_id: hash of its chunk texts}
+        self._streaming_digests: Dict[str, Any] = {}  # Running hashes of documents being streamed in
+        self._fingerprint = _combine_digests({}, self.embedder.model_name, self.index_kind)
+        self.result_cache = LRUCache(result_cache_size)
+        self._lock = threading.RLock()
+
+    @property
+    @_synchronized
+    def documents(self) -> List[str]:
+        """All indexed chunk texts, in insertion order."""
+        return [chunk for _, chunk in self.store.items()]
+
+    @property
+    @_synchronized
+    def document_ids(self) -> List[str]:
+        """IDs of the documents currently in the index."""
+        return list(self.store.doc_ranges.keys())
+
+    def has_document(self, doc_id: str) -> bool:
+        return doc_id in self.store.doc_ranges
+
     def build_index(self, documents: List[str]) -> None:
-        """Creates a FAISS index from a list of document chunks."""
+        """Creates a FAISS index from a list of document chunks, replacing any existing one."""
+        self.clear()
         if not documents:
-            self.index = None
             logging.warning("No documents provided to build index.")
             return
             
-        self.documents = documents
-        logging.info(f"Embedding {len(documents)} document chunks...")
-        embeddings = self.embedder.embed(documents)
-        
-        # Create a FAISS index
-        self.index = faiss.IndexFlatL2(embeddings.shape[1])
-        self.index.add(embeddings.astype(np.float32))
+        self.add_documents({"default": documents})
         logging.info("FAISS index built successfully.")
-        
+
+    @_synchronized
+    def clear(self) -> None:
+        """Drops every document and the index itself."""
+        self.index = None
+        self.active_kind = None
+        self._tombstones = 0
+        self._pending_kind = None
+        self._unindexed = {}
+        self._mapped_from = None
+        self.store = ChunkStore()
+        self._lexical_index = BM25Index()
+        self._doc_digests = {}
+        self._streaming_digests = {}
+        self._update_fingerprint()
+        self._index_changed()
+
+    def add_documents(self, documents: Dict[str, Union[List[str], Dict[str, Any]]]) -> None:
+        """
+        Adds several documents, reusing a saved index when this exact corpus was seen before.
+
+        If an index for the resulting corpus (current documents plus `documents`) is
+        on disk it is loaded instead of embedding anything; otherwise the documents
+        are added incrementally and the result is saved for next time.
+
+        Args:
+            documents: A mapping of stable document ID to either a list of chunks or a
+                dict with "text", "spans" and optional "metadata" (see `add_document`).
+        """
+        documents = {doc_id: self._as_document(doc) for doc_id, doc in documents.items()}
+        digests = {
+            doc_id: _hash_chunks(doc["text"][start:end] for start, end in doc["spans"]).hexdigest()
+            for doc_id, doc in documents.items()
+        }
+        with self._lock:
+            corpus = dict(self._doc_digests)
+        for doc_id, doc in documents.items():
+            # A document without chunks is not added, but still replaces one with its ID.
+            if len(doc["spans"]):
+                corpus[doc_id] = digests[doc_id]
+            else:
+                corpus.pop(doc_id, None)
+        if self.load(_combine_digests(corpus, self.embedder.model_name, self.index_kind)):
+            return
+
+        for doc_id, doc in documents.items():
+            self.add_document(doc_id, doc["text"], doc["spans"], doc["metadata"])
+        self.save()
+
+    def add_document(
+        self,
+        doc_id: str,
+        text: Union[str, List[str]],
+        spans: Optional[Sequence[Tuple[int, int]]] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Embeds and indexes the chunks of a single document.
+
+        Only the new chunks are embedded; an existing document with the same ID is
+        replaced.
+
+        Args:
+            doc_id: A stable identifier for the document (e.g. name and size).
+            text: The document's full text, or a list of already split chunks.
+            spans: (start, end) offsets of each chunk in `text`, e.g. from
+                `DocumentProcessor.split`. Not needed when `text` is a list of chunks.
+            metadata: Document metadata, e.g. {"name": ...} used to label results.
+        """
+        doc = self._as_document({"text": text, "spans": spans, "metadata": metadata})
+        if self.has_document(doc_id):
+            self.remove_document(doc_id)
+        if not len(doc["spans"]):
+            logging.warning(f"No chunks provided for document '{doc_id}'.")
+            return
+
+        chunks = [doc["text"][start:end] for start, end in doc["spans"]]
+        logging.info(f"Embedding {len(chunks)} chunks for document '{doc_id}'...")
+        embeddings = self.embedding_cache.get_many(chunks)
+        digest = _hash_chunks(chunks).hexdigest()
+        with self._lock:
+            # Unmap before touching the store, so a failure can't leave the two out of step.
+            self._writable_index()
+            chunk_ids = self.store.add(doc_id, doc["text"], doc["spans"], doc["metadata"])
+            self._index_chunks(chunk_ids, chunks, embeddings)
+            self._doc_digests[doc_id] = digest
+            self._update_fingerprint()
+        self._rebuild_pending()
+
+    def ingest_stream(
+        self,
+        doc_id: str,
+        pieces: Iterable[str],
+        metadata: Optional[Dict[str, Any]] = None,
+        splitter: Optional[RecursiveTextSplitter] = None,
+        batch_size: int = RetrievalConfig.INGEST_BATCH_SIZE,
+        on_batch: Optional[Callable[[int], None]] = None
+    ) -> int:
+        """
+        Streams a document into the index as its text is extracted.
+
+        Pieces (e.g. pages) are split into chunks as they arrive, chunks are embedded
+        in fixed-size batches, and each batch is indexed immediately, so memory holds
+        at most one batch of chunks and vectors and the document is searchable before
+        it has been fully read. The document is removed again if extraction fails.
+
+        Args:
+            doc_id: A stable identifier for the document; an existing one is replaced.
+            pieces: Consecutive pieces of the document's text.
+            metadata: Document metadata, e.g. {"name": ...} used to label results.
+            splitter: The splitter to use; defaults to the configured chunk size.
+            batch_size: How many chunks to embed and index at a time.
+            on_batch: Called with the document's running chunk count after each batch.
+
+        Returns:
+            The number of chunks indexed.
+        """
+        splitter = splitter or RecursiveTextSplitter()
+        with self._lock:
+            self._remove_document(doc_id)
+            self._writable_index()
+            self.store.add(doc_id, "", [], metadata)
+            self._streaming_digests[doc_id] = _hash_chunks([])
+            self._doc_digests[doc_id] = self._streaming_digests[doc_id].hexdigest()
+            self._update_fingerprint()
+        self._rebuild_pending()
+
+        pending_text: List[str] = []
+        pending_spans: List[Tuple[int, int]] = []
+        try:
+            for text, spans in splitter.split_stream(pieces):
+                pending_text.append(text)
+                pending_spans.extend(spans)
+                while len(pending_spans) >= batch_size:
+                    chunk_count = self._extend_document(doc_id, "".join(pending_text), pending_spans[:batch_size])
+                    pending_text, pending_spans = [], pending_spans[batch_size:]
+                    if on_batch is not None:
+                        on_batch(chunk_count)
+            chunk_count = self._extend_document(doc_id, "".join(pending_text), pending_spans)
+            with self._lock:
+                self.store.finish(doc_id)
+                self._streaming_digests.pop(doc_id, None)
+        except Exception:
+            self.remove_document(doc_id)
+            raise
+
+        if on_batch is not None:
+            on_batch(chunk_count)
+        logging.info(f"Streamed {chunk_count} chunks for document '{doc_id}' into the index.")
+        return chunk_count
+
+    def load_streamed(
+        self,
+        doc_id: str,
+        pieces: Iterable[str],
+        splitter: Optional[RecursiveTextSplitter] = None
+    ) -> bool:
+        """
+        Loads the saved snapshot of the corpus that streaming `pieces` in as `doc_id` would produce.
+
+        For a document whose text is known before ingestion (e.g. from the extraction
+        cache): its chunks are split exactly as `ingest_stream` would split them, but
+        nothing is embedded.
+
+        Returns:
+            True if such a snapshot was found and loaded, so the document needs no ingestion.
+        """
+        if self.index_dir is None:
+            return False
+        splitter = splitter or RecursiveTextSplitter()
+        parts: List[str] = []
+        spans: List[Tuple[int, int]] = []
+        for text, piece_spans in splitter.split_stream(pieces):
+            parts.append(text)
+            spans.extend(piece_spans)
+        text = "".join(parts)
+        with self._lock:
+            corpus = dict(self._doc_digests)
+        corpus[doc_id] = _hash_chunks(text[start:end] for start, end in spans).hexdigest()
+        return self.load(_combine_digests(corpus, self.embedder.model_name, self.index_kind))
+
+    def _extend_document(self, doc_id: str, text: str, spans: List[Tuple[int, int]]) -> int:
+        """Appends text and chunks to a streamed document and indexes them, returning its chunk count."""
+        with self._lock:
+            if not self.has_document(doc_id):
+                raise KeyError(f"Document '{doc_id}' was removed during ingestion.")
+            chunk_ids = self.store.extend(doc_id, text, spans)
+            if not len(chunk_ids):
+                return len(self.store.doc_ranges[doc_id])
+            chunks = [self.store.text(chunk_id) for chunk_id in chunk_ids]
+            self._unindexed[chunk_ids.start] = chunk_ids
+        # Embedding is the slow step, so it runs unlocked.
+        try:
+            embeddings = self.embedding_cache.get_many(chunks)
+        except Exception:
+            with self._lock:
+                self._unindexed.pop(chunk_ids.start, None)
+            raise
+        with self._lock:
+            self._unindexed.pop(chunk_ids.start, None)
+            if chunk_ids.start not in self.store.doc_ranges.get(doc_id, range(0)):
+                raise KeyError(f"Document '{doc_id}' was removed during ingestion.")
+            self._index_chunks(chunk_ids, chunks, embeddings)
+            digest = self._streaming_digests[doc_id]
+            _hash_chunks(chunks, digest)
+            self._doc_digests[doc_id] = digest.hexdigest()
+            self._update_fingerprint()
+            chunk_count = len(self.store.doc_ranges[doc_id])
+        self._rebuild_pending()
+        return chunk_count
+
+    def _index_chunks(self, chunk_ids: range, chunks: List[str], embeddings: np.ndarray) -> None:
+        """Adds freshly stored chunks to the lexical and vector indexes."""
+        if self._lexical_index is not None:
+            for chunk_id, chunk in zip(chunk_ids, chunks):
+                self._lexical_index.add(chunk_id, chunk)
+
+        if self.index is None:
+            # Start with an exact index, which needs no training or graph building;
+            # _rebuild_pending switches to the target backend outside the lock.
+            self.index = make_index(embeddings.shape[1], "flat")
+            self.active_kind = "flat"
+            self._tombstones = 0
+            self._mapped_from = None
+        ids = np.arange(chunk_ids.start, chunk_ids.stop, dtype=np.int64)
+        self._writable_index().add_with_ids(embeddings, ids)
+        if self._target_kind() != self.active_kind:
+            self._pending_kind = self._target_kind()
+        self._index_changed()
+
+    def remove_document(self, doc_id: str) -> bool:
+        """
+        Removes a document's chunks from the index without rebuilding it.
+
+        Returns:
+            True if the document was indexed and has been removed.
+        """
+        with self._lock:
+            removed = self._remove_document(doc_id)
+        self._rebuild_pending()
+        return removed
+
+    def _remove_document(self, doc_id: str) -> bool:
+        """`remove_document` for callers already holding the lock; any rebuild it calls for is left pending."""
+        if not self.has_document(doc_id):
+            return False
+
+        self._writable_index()
+        if self._lexical_index is not None:
+            for chunk_id in self.store.doc_ranges[doc_id]:
+                self._lexical_index.remove(chunk_id, self.store.text(chunk_id))
+        chunk_ids = self.store.remove(doc_id)
+        self._doc_digests.pop(doc_id, None)
+        self._streaming_digests.pop(doc_id, None)
+        self._update_fingerprint()
+        if not len(self.store):
+            self.index = None
+            self.active_kind = None
+            self._tombstones = 0
+            self._pending_kind = None
+            self._mapped_from = None
+        elif self.active_kind == "hnsw":
+            # HNSW graphs cannot delete in place; retrieve() skips IDs with no chunk.
+            self._tombstones += len(chunk_ids)
+            if self._tombstones > RetrievalConfig.MAX_TOMBSTONE_FRACTION * self.index.ntotal:
+                self._pending_kind = self._target_kind()
+        elif self.index is not None:
+            self._writable_index().remove_ids(np.arange(chunk_ids.start, chunk_ids.stop, dtype=np.int64))
+        self._index_changed()
+        logging.info(f"Removed document '{doc_id}' ({len(chunk_ids)} chunks) from the index.")
+        return True
+
+    def save(self, fingerprint: Optional[str] = None) -> Optional[Path]:
+        """
+        Saves the index, chunk texts and document map under `index_dir/<fingerprint>`.
+
+        The state is copied in memory under the lock and written to disk outside it,
+        so searches and ingestion carry on while the snapshot is written.
+
+        Returns:
+            The snapshot directory, or None if persistence is disabled or nothing is indexed.
+        """
+        if self.index_dir is None:
+            return None
+        with self._lock:
+            if self.index is None:
+                return None
+            if fingerprint is None:
+                fingerprint = self.fingerprint()
+            target = self.index_dir / fingerprint
+            if target.exists():
+                return target
+            index_bytes = faiss.serialize_index(self.index)
+            store = self.store.copy()
+            metadata = {
+                "model_name": self.embedder.model_name,
+                "active_kind": self.active_kind,
+                "tombstones": self._tombstones,
+                "digests": dict(self._doc_digests),
+            }
+
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        # Write into a temporary directory and rename, so readers never see a partial snapshot.
+        staging = Path(tempfile.mkdtemp(dir=self.index_dir, prefix=".staging-"))
+        try:
+            index_bytes.tofile(staging / "index.faiss")
+            store.save(staging)
+            with open(staging / "index.json", "w") as f:
+                json.dump(metadata, f)
+            os.replace(staging, target)
+        except OSError as e:
+            # Another thread may have saved the same corpus first.
+            shutil.rmtree(staging, ignore_errors=True)
+            if target.exists():
+                return target
+            logging.warning(f"Could not save FAISS index to {target}: {e}")
+            return None
+
+        logging.info(f"Saved FAISS index for {len(store)} chunks to {target}.")
+        self._prune_saved_indexes()
+        return target
+
+    def load(self, fingerprint: str) -> bool:
+        """
+        Replaces the current state with a saved snapshot, memory-mapping the index where FAISS allows.
+
+        The snapshot is read outside the lock; only the swap holds it.
+
+        Returns:
+            True if a snapshot for `fingerprint` was found and loaded.
+        """
+        if self.index_dir is None:
+            return False
+        source = self.index_dir / fingerprint
+        if not (source / "index.faiss").exists():
+            return False
+
+        start_time = time.perf_counter()
+        try:
+            with open(source / "index.json") as f:
+                metadata = json.load(f)
+            store = ChunkStore.load(source)
+            try:
+                index = faiss.read_index(str(source / "index.faiss"), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+                mapped_from = source
+            except RuntimeError:
+                index = faiss.read_index(str(source / "index.faiss"))
+                mapped_from = None
+        except (OSError, ValueError, RuntimeError) as e:
+            logging.warning(f"Could not load saved FAISS index {source}: {e}")
+            return False
+        digests = metadata.get("digests")
+        if digests is None:
+            digests = {doc_id: _hash_chunks(store.document_chunks(doc_id)).hexdigest() for doc_id in store.doc_ranges}
+
+        with self._lock:
+            self.index = index
+            self._mapped_from = mapped_from
+            self.active_kind = metadata["active_kind"]
+            self._tombstones = metadata["tombstones"]
+            self._pending_kind = None
+            self._unindexed = {}
+            self.store = store
+            self._lexical_index = None  # Rebuilt on the first lexical query, keeping loads fast
+            self._doc_digests = digests
+            self._streaming_digests = {}
+            self._update_fingerprint()
+            self._index_changed()
+        try:
+            os.utime(source)  # Mark as recently used for pruning
+        except OSError:
+            pass  # Pruned by another session meanwhile; the loaded copy is unaffected
+        logging.info(f"Loaded saved FAISS index for {len(store)} chunks in {(time.perf_counter() - start_time) * 1000:.1f}ms.")
+        return True
+
+    def fingerprint(self) -> str:
+        """
+        The indexed corpus's content hash (see `corpus_fingerprint`). Retrievers
+        holding the same documents share it. It is kept up to date as documents
+        change, so reading it never waits for the lock.
+        """
+        return self._fingerprint
+
+    def _update_fingerprint(self) -> None:
+        self._fingerprint = _combine_digests(self._doc_digests, self.embedder.model_name, self.index_kind)
+
+    def _prune_saved_indexes(self) -> None:
+        snapshots = []
+        for path in self.index_dir.iterdir():
+            try:
+                if path.is_dir() and not path.name.startswith("."):
+                    snapshots.append((path.stat().st_mtime, path))
+            except OSError:
+                continue  # Pruned by another session meanwhile
+        snapshots.sort(reverse=True)
+        for _, stale in snapshots[RetrievalConfig.MAX_SAVED_INDEXES:]:
+            shutil.rmtree(stale, ignore_errors=True)
+
+    @staticmethod
+    def _as_document(doc: Union[List[str], Dict[str, Any]]) -> Dict[str, Any]:
+        """Normalizes a list of chunks or a text/spans/metadata dict into the dict form."""
+        if isinstance(doc, list):
+            doc = {"text": doc}
+        text, spans = doc["text"], doc.get("spans")
+        if isinstance(text, list):
+            text, spans = ChunkStore.join_chunks(text)
+        elif spans is None:
+            spans = [(0, len(text))] if text else []
+        return {"text": text, "spans": spans, "metadata": doc.get("metadata") or {}}
+
+    def _writable_index(self) -> Optional[faiss.Index]:
+        """
+        Swaps a read-only memory-mapped index for an in-memory copy before it is modified.
+
+        The copy is taken from the mapping itself: another session may already have
+        pruned the snapshot directory it was loaded from.
+        """
+        if self._mapped_from is not None:
+            self.index = faiss.clone_index(self.index)
+            self._mapped_from = None
+        return self.index
+
+    def cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hit/miss counters for the query-vector and result caches, for tuning their sizes."""
+        return {
+            "query_vectors": query_vector_cache.stats(),
+            "results": self.result_cache.stats(),
+        }
+
+    def _index_changed(self) -> None:
+        self.index_version += 1
+        self.result_cache.clear()
+
+    def _target_kind(self) -> str:
+        if self.index_kind == "auto":
+            return choose_index_kind(len(self.store))
+        return self.index_kind
+
+    def _indexed_ids(self) -> np.ndarray:
+        """IDs of the stored chunks that are in the index, i.e. not still being embedded."""
+        ids = self.store.ids()
+        for pending in self._unindexed.values():
+            ids = ids[(ids < pending.start) | (ids >= pending.stop)]
+        return ids
+
+    def _rebuild_pending(self) -> None:
+        """
+        Rebuilds the index for a pending backend switch or HNSW compaction.
+
+        Must be called without holding the lock. The new index is built outside it
+        while searches keep using the current one; chunks added or removed meanwhile
+        are applied to the new index before it is swapped in.
+        """
+        while True:
+            with self._lock:
+                kind = self._pending_kind
+                if kind is None or self._rebuilding:
+                    return
+                self._pending_kind = None
+                self._rebuilding = True
+                ids = self._indexed_ids()
+                chunks = [self.store.text(chunk_id) for chunk_id in ids.tolist()]
+            try:
+                start_time = time.perf_counter()
+                # Vectors are read back from the embedding store rather than re-encoded.
+                vectors = self.embedding_cache.get_many(chunks)
+                index = make_index(vectors.shape[1], kind, training_vectors=vectors)
+                index.add_with_ids(vectors, ids)
+                with self._lock:
+                    self._swap_in(index, kind, ids)
+                logging.info(
+                    f"Built '{kind}' FAISS index over {len(ids)} chunks in {time.perf_counter() - start_time:.2f}s."
+                )
+            finally:
+                with self._lock:
+                    self._rebuilding = False
+
+    def _swap_in(self, index: faiss.Index, kind: str, built_ids: np.ndarray) -> None:
+        """Replaces the index with a rebuilt one, catching it up with changes made during the build."""
+        if not len(self.store):
+            return  # Everything was removed meanwhile, and the index with it
+        live = self._indexed_ids()
+        added = np.setdiff1d(live, built_ids, assume_unique=True)
+        removed = np.setdiff1d(built_ids, live, assume_unique=True)
+        if len(added):
+            # Just indexed in the old index, so these vectors are already in the embedding store.
+            index.add_with_ids(self.embedding_cache.get_many([self.store.text(i) for i in added.tolist()]), added)
+        tombstones = 0
+        if len(removed):
+            if kind == "hnsw":
+                tombstones = len(removed)
+            else:
+                index.remove_ids(removed)
+        self.index = index
+        self.active_kind = kind
+        self._tombstones = tombstones
+        self._mapped_from = None
+        if self._target_kind() != kind:
+            self._pending_kind = self._target_kind()
+        self._index_changed()
+
     def retrieve(
         self, 
         query: str, 
         k: int = 5, # Increased k to 5 for more context
-        threshold: float = 0.5
+        threshold: float = 0.5,
+        mode: Optional[str] = None
     ) -> List[Tuple[str, float]]:
         """
         Retrieves the most relevant document chunks for a given query.
+
+        Args:
+            query: The query to answer.
+            k: The maximum number of chunks to return.
+            threshold: The minimum cosine similarity for a dense match. It only cuts
+                the dense ranking: in "hybrid" mode BM25 matches are cut by
+                RetrievalConfig.BM25_MIN_SCORE_SHARE instead, so exact terms (form
+                numbers, acronyms) that embed poorly still surface, and citation
+                queries answered from BM25 alone skip it.
+            mode: "hybrid" or "vector"; defaults to the retriever's `search_mode`.
+
+        Returns:
+            (labelled chunk text, score) pairs, best first (see `retrieve_many` for scores).
         """
-        if self.index is None:
-            logging.warning("Cannot retrieve, index is not built.")
+        return self.retrieve_many([query], k=k, threshold=threshold, mode=mode)[0]
+
+    def retrieve_many(
+        self,
+        queries: List[str],
+        k: int = 5,
+        threshold: float = 0.5,
+        mode: Optional[str] = None
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Retrieves the most relevant chunks for several queries with one embedding
+        call and one index search.
+
+        In "vector" mode scores are cosine similarities. In "hybrid" mode the dense
+        ranking (cut at `threshold`) and the BM25 ranking are fused with reciprocal
+        rank fusion, and scores are the fused score scaled so that ranking first in
+        both lists gives 1.0; citation-dominated queries are answered from BM25
+        alone, scaled so the best match gives 1.0.
+
+        Args:
+            queries: The queries to answer.
+            k: The maximum number of chunks to return per query.
+            threshold: The minimum cosine similarity for a dense match to be returned;
+                BM25 matches have their own floor (see `retrieve`).
+            mode: "hybrid" or "vector"; defaults to the retriever's `search_mode`.
+
+        Returns:
+            One result list per query, in order, each with the same semantics as `retrieve`.
+        """
+        if not queries:
             return []
-            
-        query_embedding = self.embedder.embed([query])
-        distances, indices = self.index.search(query_embedding.astype(np.float32), k)
-        
-        # Convert L2 distance to a similarity score (0-1 range)
-        scores = 1 / (1 + distances[0])
-        
-        results = [
-            (self.documents[idx], float(score))
-            for idx, score in zip(indices[0], scores)
-            if score >= threshold and idx < len(self.documents)
-        ]
-            
-        return sorted(results, key=lambda x: x[1], reverse=True)
+        mode = mode or self.search_mode
+        hybrid = mode == "hybrid"
+        citation = [hybrid and is_citation_query(q) for q in queries]
+        normalized = [normalize_query(q) for q in queries]
+
+        with self._lock:
+            if self.index is None or self.index.ntotal == 0:
+                logging.warning("Cannot retrieve, index is not built.")
+                return [[] for _ in queries]
+            version = self.index_version
+            result_keys = [(q, k, threshold, mode, c, version) for q, c in zip(normalized, citation)]
+            all_results = [self.result_cache.get(key) for key in result_keys]
+
+            dense = []
+            for i, results in enumerate(all_results):
+                if results is not None:
+                    continue
+                if citation[i]:
+                    lexical = self._lexical().search(queries[i], k, RetrievalConfig.BM25_MIN_SCORE_SHARE)
+                    if lexical:
+                        # Exact references: skip the embedding forward pass entirely.
+                        top = lexical[0][1]
+                        all_results[i] = [(self.store.labelled(idx), score / top) for idx, score in lexical]
+                        self.result_cache.put(result_keys[i], all_results[i])
+                        continue
+                dense.append(i)
+            if not dense:
+                return [list(results) for results in all_results]
+
+        # Embedding is the slow step, so it runs unlocked; only the search holds the lock.
+        query_embeddings = self._embed_queries([normalized[i] for i in dense])
+        candidates = k * RetrievalConfig.HYBRID_CANDIDATE_MULTIPLIER if hybrid else k
+        with self._lock:
+            if self.index is None or self.index.ntotal == 0:
+                return [list(results or []) for results in all_results]
+            if self.index_version != version:
+                result_keys = [key[:-1] + (self.index_version,) for key in result_keys]
+            # Over-fetch to make up for removed chunks still present in an HNSW index.
+            fetch_k = min(candidates + self._tombstones, self.index.ntotal)
+            scores, indices = self.index.search(query_embeddings, fetch_k)
+            # Inner product of normalized vectors is cosine similarity. A threshold of 0.5
+            # matches the old 1/(1+d) cut-off, since squared L2 distance d = 2 - 2*cos.
+            for i, row_ids, row_scores in zip(dense, indices.tolist(), scores.tolist()):
+                hits = sorted(
+                    ((idx, score) for idx, score in zip(row_ids, row_scores) if score >= threshold and idx in self.store),
+                    key=lambda x: x[1],
+                    reverse=True
+                )
+                if hybrid:
+                    lexical = self._lexical().search(queries[i], candidates, RetrievalConfig.BM25_MIN_SCORE_SHARE)
+                    hits = self._fuse(hits[:candidates], lexical)
+                # Chunk text is only sliced out (and labelled with its document) for the final results.
+                all_results[i] = [(self.store.labelled(idx), score) for idx, score in hits[:k]]
+                self.result_cache.put(result_keys[i], all_results[i])
+            return [list(results) for results in all_results]
+
+    def retrieve_from_document(self, doc_id: str, query: str, k: int = 5) -> List[Tuple[int, str, float]]:
+        """
+        Ranks one document's chunks against a query, for callers that need the best
+        passages of a particular document rather than of the whole corpus.
+
+        Chunk vectors come from the embedding cache (they were cached at ingest), so
+        only the query is embedded.
+
+        Returns:
+            Up to `k` (start offset, chunk text, cosine similarity) tuples, best first.
+        """
+        with self._lock:
+            ids = self.store.doc_ranges.get(doc_id)
+            if not ids:
+                return []
+            chunks = [self.store.text(chunk_id) for chunk_id in ids]
+            starts = [self.store.span(chunk_id)[0] for chunk_id in ids]
+        scores = self.embedding_cache.get_many(chunks) @ self._embed_queries([normalize_query(query)])[0]
+        top = np.argsort(-scores, kind="stable")[:k]
+        return [(starts[t], chunks[t], float(scores[t])) for t in top]
+
+    def _fuse(self, *rankings: List[Tuple[int, float]]) -> List[Tuple[int, float]]:
+        """Reciprocal rank fusion, scaled so that ranking first in every list scores 1.0."""
+        fused: Dict[int, float] = defaultdict(float)
+        for ranking in rankings:
+            for rank, (idx, _) in enumerate(ranking):
+                fused[idx] += 1 / (RetrievalConfig.RRF_K + rank + 1)
+        best = len(rankings) / (RetrievalConfig.RRF_K + 1)
+        return sorted(((idx, score / best) for idx, score in fused.items()), key=lambda x: x[1], reverse=True)
+
+    def _lexical(self) -> BM25Index:
+        """Returns the BM25 index, building it from the chunk texts if a load() left it unbuilt."""
+        if self._lexical_index is None:
+            lexical_index = BM25Index()
+            for chunk_id, chunk in self.store.items():
+                lexical_index.add(chunk_id, chunk)
+            self._lexical_index = lexical_index
+        return self._lexical_index
+
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Embeds normalized queries, reusing cached vectors and batching the misses."""
+        keys = [(self.embedder.model_name, q) for q in queries]
+        vectors = [query_vector_cache.get(key) for key in keys]
+        missing = list(dict.fromkeys(q for q, v in zip(queries, vectors) if v is None))
+        if missing:
+            fresh = dict(zip(missing, self.embedder.embed(missing).astype(np.float32)))
+            for key, q in zip(keys, queries):
+                if q in fresh:
+                    query_vector_cache.put(key, fresh[q])
+            vectors = [v if v is not None else fresh[q] for q, v in zip(queries, vectors)]
+        return np.vstack(vectors)
 
 class DocumentProcessor:
     """
@@ -62,10 +927,9 @@ class DocumentProcessor:
     """
     def __init__(self):
         # This splitter tries to split on paragraphs, then sentences, then words.
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,      # The target size for each chunk
-            chunk_overlap=200,    # Overlap chunks to maintain context
-            length_function=len,
+        self.text_splitter = RecursiveTextSplitter(
+            chunk_size=RetrievalConfig.CHUNK_SIZE,      # The target size for each chunk
+            chunk_overlap=RetrievalConfig.CHUNK_OVERLAP,  # Overlap chunks to maintain context
         )
         
     def process(self, text: str, metadata: Dict) -> List[str]:
@@ -82,9 +946,23 @@ class DocumentProcessor:
         if not text:
             return []
         
-        # The splitter automatically creates the context-aware chunks
-        chunks = self.text_splitter.split_text(text)
-        
         # Optional: Prepend metadata to each chunk for better context
         filename = metadata.get("name", "Unknown Document")
-        return [f"From document '{filename}':\n{chunk}" for chunk in chunks]
+        return [f"From document '{filename}':\n{text[start:end]}" for start, end in self.split(text)]
+
+    def split(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Splits a document into chunks given as (start, end) offsets into `text`.
+
+        Unlike `process`, no chunk text is copied and no filename is prepended, so
+        the text can be stored once (see ChunkStore) and only real content is embedded.
+
+        Args:
+            text: The full text of the document.
+
+        Returns:
+            A list of (start, end) character offsets, one per chunk.
+        """
+        if not text:
+            return []
+        return self.text_splitter.split_spans(text)
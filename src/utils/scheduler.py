@@ -0,0 +1,195 @@
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple, TypeVar
+
+from src.config.scheduler import SchedulerConfig
+
+T = TypeVar("T")
+
+# Request priorities: lower runs first. A user waiting on a chat answer goes ahead
+# of background work such as cross-referencing documents.
+INTERACTIVE = 0
+BULK = 1
+
+# HTTP statuses worth retrying: timeouts, rate limits and server-side overloads.
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+_END = object()
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Whether a failed request may succeed if sent again. API errors from
+    `google.api_core` carry their HTTP status as `code`.
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    try:
+        return int(getattr(error, "code", None)) in RETRYABLE_STATUS_CODES
+    except (TypeError, ValueError):
+        return False
+
+class TokenBucket:
+    """
+    A per-minute quota that refills continuously. Up to a full minute's quota may
+    be spent at once, matching how the API counts usage. Not thread-safe on its
+    own; RequestScheduler guards it.
+    """
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.clock = clock
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be taken (requests larger than the capacity wait for a full bucket)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+class RequestScheduler:
+    """
+    Admits requests to a rate-limited API and retries the transient failures.
+
+    Requests wait in a priority queue (FIFO within a priority) until a concurrency
+    slot is free and both the request and token quotas allow them to start. A
+    request that fails with a retryable error is sent again after an exponential
+    backoff with full jitter, rejoining the queue at its priority.
+    """
+    def __init__(
+        self,
+        requests_per_minute: float = SchedulerConfig.REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = SchedulerConfig.TOKENS_PER_MINUTE,
+        max_concurrency: int = SchedulerConfig.MAX_CONCURRENT_REQUESTS,
+        max_retries: int = SchedulerConfig.MAX_RETRIES,
+        base_delay: float = SchedulerConfig.RETRY_BASE_DELAY_S,
+        max_delay: float = SchedulerConfig.RETRY_MAX_DELAY_S,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._cond = threading.Condition()
+        self._waiting: List[Tuple[int, int]] = []  # heap of (priority, arrival) tickets
+        self._arrivals = itertools.count()
+        self._in_flight = 0
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.queued_seconds = 0.0
+
+    @contextmanager
+    def slot(self, priority: int = INTERACTIVE, tokens: float = 1):
+        """Blocks until a request may start, and holds its concurrency slot for the `with` body."""
+        self._acquire(priority, tokens)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def call(self, fn: Callable[[], T], priority: int = INTERACTIVE, tokens: float = 1) -> T:
+        """Runs `fn` as a scheduled request, retrying it on retryable errors."""
+        for attempt in itertools.count():
+            try:
+                with self.slot(priority, tokens):
+                    return fn()
+            except Exception as e:
+                self._backoff(e, attempt)
+
+    def stream(self, open_stream: Callable[[], Iterable[T]], priority: int = INTERACTIVE, tokens: float = 1) -> Iterator[T]:
+        """
+        Runs a streaming request, holding its slot until the stream is consumed or closed.
+
+        Opening the stream is retried until its first item arrives; after that, errors
+        propagate, since part of the output has already been handed on.
+        """
+        for attempt in itertools.count():
+            started = False
+            try:
+                with self.slot(priority, tokens):
+                    iterator = iter(open_stream())
+                    first = next(iterator, _END)
+                    started = True
+                    if first is not _END:
+                        yield first
+                        yield from iterator
+                return
+            except Exception as e:
+                if started:
+                    raise
+                self._backoff(e, attempt)
+
+    def stats(self) -> Dict[str, Any]:
+        """Reports request, retry and failure counts, and the time requests spent queued."""
+        with self._cond:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "failures": self.failures,
+                "in_flight": self._in_flight,
+                "waiting": len(self._waiting),
+                "queued_seconds": self.queued_seconds,
+            }
+
+    def _acquire(self, priority: int, tokens: float) -> None:
+        start = time.perf_counter()
+        with self._cond:
+            ticket = (priority, next(self._arrivals))
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    if self._waiting[0] != ticket or self._in_flight >= self.max_concurrency:
+                        self._cond.wait()
+                        continue
+                    wait = max(self._requests.wait_time(1), self._tokens.wait_time(tokens))
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+            except BaseException:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+                raise
+            heapq.heappop(self._waiting)
+            self._requests.take(1)
+            self._tokens.take(tokens)
+            self._in_flight += 1
+            self.requests += 1
+            self.queued_seconds += time.perf_counter() - start
+            # The next ticket in line may be able to start too.
+            self._cond.notify_all()
+
+    def _backoff(self, error: Exception, attempt: int) -> None:
+        """Sleeps before the next attempt, or re-raises when the error is final."""
+        if not is_retryable(error) or attempt >= self.max_retries:
+            with self._cond:
+                self.failures += 1
+            raise error
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        with self._cond:
+            self.retries += 1
+        logging.warning(f"Request failed ({error}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s.")
+        self._sleep(delay)
+
+# Global instance: every Gemini request in the process shares the API quota.
+gemini_scheduler = RequestScheduler()
@@ -0,0 +1,104 @@
+from typing import Iterable, Iterator, List, Sequence, Tuple
+from src.config.retrieval import RetrievalConfig
+
+class RecursiveTextSplitter:
+    """
+    A lightweight recursive character splitter that returns (start, end) offsets.
+
+    It tries to split on paragraphs, then lines, then words, then characters, and
+    packs the pieces into chunks of at most `chunk_size` characters that overlap by
+    up to `chunk_overlap` characters, like langchain's RecursiveCharacterTextSplitter
+    but without copying chunk text or importing langchain.
+    """
+    def __init__(
+        self,
+        chunk_size: int = RetrievalConfig.CHUNK_SIZE,
+        chunk_overlap: int = RetrievalConfig.CHUNK_OVERLAP,
+        separators: Sequence[str] = ("\n\n", "\n", " ", "")
+    ):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size.")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = list(separators)
+
+    def split_spans(self, text: str) -> List[Tuple[int, int]]:
+        """Splits `text` into chunk spans, trimmed of surrounding whitespace."""
+        pieces = self._pieces(text, 0, len(text), self.separators)
+        return self._merge(text, pieces)
+
+    def split_stream(self, pieces: Iterable[str]) -> Iterator[Tuple[str, List[Tuple[int, int]]]]:
+        """
+        Splits a document that arrives incrementally.
+
+        Args:
+            pieces: Consecutive pieces of the document text (e.g. pages); their
+                concatenation is the full text.
+
+        Yields:
+            (text, spans) pairs: `text` is the next piece of the document and `spans`
+            are the chunks, as offsets into the full document, that are now final.
+            Only a few chunks' worth of text is buffered at any time.
+        """
+        window = 4 * self.chunk_size
+        buffer, buffer_start = "", 0
+        for piece in pieces:
+            buffer += piece
+            spans: List[Tuple[int, int]] = []
+            if len(buffer) >= window:
+                local = self.split_spans(buffer)
+                if len(local) > 1:
+                    # The last chunk may still grow with the next piece; re-split from its start.
+                    spans = [(start + buffer_start, end + buffer_start) for start, end in local[:-1]]
+                    keep_from = local[-1][0]
+                    buffer, buffer_start = buffer[keep_from:], buffer_start + keep_from
+            yield piece, spans
+        yield "", [(start + buffer_start, end + buffer_start) for start, end in self.split_spans(buffer)]
+
+    def _pieces(self, text: str, start: int, end: int, separators: List[str]) -> List[Tuple[int, int]]:
+        """Cuts text[start:end] on the coarsest separator present, recursing into oversized pieces."""
+        if end - start <= self.chunk_size:
+            return [(start, end)]
+        for i, separator in enumerate(separators):
+            if separator == "":
+                return [(p, min(p + self.chunk_size, end)) for p in range(start, end, self.chunk_size)]
+            if text.find(separator, start, end) != -1:
+                break
+
+        pieces, pos = [], start
+        while pos < end:
+            found = text.find(separator, pos, end)
+            # Keep the separator attached to the piece before it.
+            stop = end if found == -1 else found + len(separator)
+            if stop - pos > self.chunk_size:
+                pieces.extend(self._pieces(text, pos, stop, separators[i + 1:]))
+            else:
+                pieces.append((pos, stop))
+            pos = stop
+        return pieces
+
+    def _merge(self, text: str, pieces: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Greedily packs consecutive pieces into chunks, carrying trailing pieces over as overlap."""
+        spans: List[Tuple[int, int]] = []
+        window: List[Tuple[int, int]] = []
+        for piece in pieces:
+            if window and piece[1] - window[0][0] > self.chunk_size:
+                spans.append((window[0][0], window[-1][1]))
+                while window and (
+                    window[-1][1] - window[0][0] > self.chunk_overlap
+                    or piece[1] - window[0][0] > self.chunk_size
+                ):
+                    window.pop(0)
+            window.append(piece)
+        if window:
+            spans.append((window[0][0], window[-1][1]))
+
+        trimmed = []
+        for start, end in spans:
+            while start < end and text[start].isspace():
+                start += 1
+            while end > start and text[end - 1].isspace():
+                end -= 1
+            if end > start and (not trimmed or trimmed[-1] != (start, end)):
+                trimmed.append((start, end))
+        return trimmed